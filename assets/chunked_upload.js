@@ -0,0 +1,86 @@
+/* ===== UPLOAD EM PARTES PARA ARQUIVOS GRANDES =====
+ * Envia o CSV em blocos para /upload/chunked (gravado em disco no servidor), com progresso,
+ * retomada após falhas de rede e cancelamento. Ao final, avisa o Dash pelo store-spooled-upload.
+ */
+(function () {
+    const CHUNK_SIZE = 8 * 1024 * 1024;
+    const MAX_RETRIES = 3;
+    let current = null;
+
+    function setProgress(text) {
+        const el = document.getElementById('large-upload-progress');
+        if (el) el.textContent = text;
+    }
+
+    async function requestJson(url, options) {
+        const response = await fetch(url, Object.assign({ credentials: 'same-origin' }, options));
+        const body = await response.json();
+        // 409 traz o estado atual do servidor, usado para retomar na posição correta
+        if (!response.ok && response.status !== 409) {
+            throw new Error(body.error || `HTTP ${response.status}`);
+        }
+        return body;
+    }
+
+    async function uploadFile(file) {
+        const controller = new AbortController();
+        const session = await requestJson('/upload/chunked', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        current = { uploadId: session.upload_id, controller: controller };
+
+        let offset = session.received;
+        let retries = 0;
+        while (offset < file.size) {
+            try {
+                const state = await requestJson(`/upload/chunked/${session.upload_id}?offset=${offset}`, {
+                    method: 'PUT',
+                    body: file.slice(offset, offset + CHUNK_SIZE),
+                    signal: controller.signal
+                });
+                offset = state.received;
+                retries = 0;
+            } catch (err) {
+                if (controller.signal.aborted || ++retries > MAX_RETRIES) throw err;
+                const state = await requestJson(`/upload/chunked/${session.upload_id}`);
+                offset = state.received;
+            }
+            setProgress(`Enviando ${file.name}: ${Math.floor((offset / file.size) * 100)}%`);
+        }
+
+        const done = await requestJson(`/upload/chunked/${session.upload_id}/complete`, { method: 'POST', signal: controller.signal });
+        current = null;
+        setProgress(`Arquivo ${file.name} recebido. Processando...`);
+        window.dash_clientside.set_props('store-spooled-upload', { data: { upload_id: done.upload_id, filename: done.filename } });
+    }
+
+    function selectFile() {
+        // O Dash não tem componente de input de arquivo sem leitura em base64; cria um input temporário
+        const input = document.createElement('input');
+        input.type = 'file';
+        input.accept = '.csv';
+        input.addEventListener('change', function () {
+            if (!input.files.length) return;
+            uploadFile(input.files[0]).catch(function (err) {
+                if (err.name === 'AbortError') return;
+                setProgress(`Falha no envio: ${err.message}`);
+            });
+        });
+        input.click();
+    }
+
+    document.addEventListener('click', function (event) {
+        if (event.target.id === 'large-upload-select' && !current) {
+            selectFile();
+            return;
+        }
+        if (event.target.id !== 'large-upload-cancel' || !current) return;
+        const uploadId = current.uploadId;
+        current.controller.abort();
+        current = null;
+        fetch(`/upload/chunked/${uploadId}`, { method: 'DELETE', credentials: 'same-origin' });
+        setProgress('Envio cancelado.');
+    });
+})();
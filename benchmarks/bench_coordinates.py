@@ -0,0 +1,64 @@
+"""
+Benchmark da decodificação de coordenadas DMS: compara df[col].apply(dms_to_dd) com decode_coordinate_columns.
+
+Uso:
+    python benchmarks/bench_coordinates.py --rows 1000000 --unique 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import decode_coordinate_columns, dms_to_dd  # noqa: E402
+
+COORD_COLS = ['latitude_inicial', 'longitude_inicial', 'latitude_final', 'longitude_final']
+
+
+def random_dms(rng, n, degrees, direction):
+    return [f"{degrees}° {m:02d}´ {s:02d}´´ {direction}" for m, s in zip(rng.integers(0, 60, n), rng.integers(0, 60, n))]
+
+
+def build_coordinate_frame(n_rows, n_unique, seed=42):
+    """Gera colunas de coordenadas com poucas strings distintas, como nas exportações reais."""
+    rng = np.random.default_rng(seed)
+    lat_pool = np.array(random_dms(rng, n_unique, 26, 'Sul'))
+    lon_pool = np.array(random_dms(rng, n_unique, 48, 'Oeste'))
+    return pd.DataFrame({
+        'latitude_inicial': lat_pool[rng.integers(0, n_unique, n_rows)],
+        'longitude_inicial': lon_pool[rng.integers(0, n_unique, n_rows)],
+        'latitude_final': lat_pool[rng.integers(0, n_unique, n_rows)],
+        'longitude_final': lon_pool[rng.integers(0, n_unique, n_rows)],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--unique', type=int, default=50_000)
+    args = parser.parse_args()
+
+    df = build_coordinate_frame(args.rows, args.unique)
+
+    start = time.perf_counter()
+    decoded = decode_coordinate_columns(df, COORD_COLS)
+    bulk_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = {col: df[col].apply(dms_to_dd).to_numpy(dtype=float) for col in COORD_COLS}
+    apply_time = time.perf_counter() - start
+
+    identical = all(np.array_equal(reference[col], decoded[col], equal_nan=True) for col in COORD_COLS)
+    print(f"Linhas: {args.rows:,} x {len(COORD_COLS)} colunas ({args.unique:,} strings distintas por coluna)")
+    print(f"apply(dms_to_dd):          {apply_time:.2f} s")
+    print(f"decode_coordinate_columns: {bulk_time:.3f} s")
+    print(f"Speedup:                   {apply_time / bulk_time:.0f}x")
+    print(f"Resultados idênticos: {'sim' if identical else 'NÃO'}")
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
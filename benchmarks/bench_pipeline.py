@@ -0,0 +1,202 @@
+"""
+Benchmark de escala: gera exportações sintéticas (generate_telemetry.py) de vários tamanhos e mede o tempo e o
+pico de memória de cada etapa do pipeline e dos principais callbacks do dashboard. O resultado vai para um JSON
+(com o commit atual) para comparar regressões entre versões.
+
+Uso:
+    python benchmarks/bench_pipeline.py --sizes 10000 100000 1000000
+    python benchmarks/bench_pipeline.py --sizes 10000000 --drivers 2000 --vehicles 1200
+    python benchmarks/bench_pipeline.py --sizes 100000 --compare benchmarks/results/bench_abc1234_20250601-120000.json
+
+Os CSVs gerados ficam em --data-dir e são reaproveitados entre execuções (mesmo tamanho, frota e semente).
+O pico de memória é o maior RSS do processo durante a etapa (VmHWM, zerado antes de cada etapa no Linux);
+em outros sistemas, o maior RSS desde o início do processo.
+"""
+import argparse
+import base64
+import copy
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+import main  # noqa: E402
+import pipeline  # noqa: E402
+from generate_telemetry import generate_telemetry_csv  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+REGRESSION_RATIO = 1.2
+REGRESSION_MIN_SECONDS = 0.05
+
+
+def reset_peak_rss():
+    """Zera o pico de RSS do processo (Linux); nos demais sistemas o pico continua acumulado."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def read_peak_rss_mb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+class StageTimer:
+    """Executa as etapas em sequência, guardando segundos e pico de memória de cada uma."""
+
+    def __init__(self):
+        self.results = {}
+
+    def run(self, name, func, *args, **kwargs):
+        gc.collect()
+        reset_peak_rss()
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        self.results[name] = {'seconds': round(seconds, 4), 'peak_rss_mb': round(read_peak_rss_mb(), 1)}
+        print(f"  {name:<44} {seconds:9.3f} s {self.results[name]['peak_rss_mb']:9.1f} MB", flush=True)
+        return result
+
+
+def changed_gravity_config():
+    """Configuração com só um tipo alterado, para medir o recálculo incremental."""
+    gravity_config = copy.deepcopy(pipeline.DEFAULT_GRAVITY_CONFIG)
+    gravity_config['Velocidade_Excessiva_Rodovia']['base_weight'] *= 1.5
+    return gravity_config
+
+
+def benchmark_size(path, rows):
+    timer = StageTimer()
+    gravity_config = pipeline.DEFAULT_GRAVITY_CONFIG
+
+    # Etapas do pipeline, na ordem em que rodam em um upload
+    raw_df = timer.run('read_csv', pd.read_csv, path, delimiter=';', encoding='utf-8', on_bad_lines='warn')
+    parsed_df = timer.run('normalize_violations', pipeline.normalize_violations, raw_df)
+    del raw_df
+    parsed_df = timer.run('add_violation_counts', pipeline.add_violation_counts, parsed_df)
+    scored_df = timer.run('score_violations', pipeline.score_violations, parsed_df, gravity_config)
+    # Como em read_and_score_file: o dashboard identifica cada linha por (arquivo_origem, linha_csv)
+    scored_df['arquivo_origem'] = os.path.basename(path)
+    rankings = timer.run('build_rankings', pipeline.build_rankings, scored_df)
+    # O dashboard guarda o dataset no esquema compacto; os callbacks abaixo rodam sobre ele
+    compact_df = timer.run('compact_violations', pipeline.compact_violations, scored_df)
+    timer.results['compact_violations']['dataset_mb_before'] = round(pipeline.dataset_memory_bytes(scored_df) / 2**20, 1)
+    timer.results['compact_violations']['dataset_mb_after'] = round(pipeline.dataset_memory_bytes(compact_df) / 2**20, 1)
+    row_index = timer.run('build_row_index', main.build_row_index, compact_df)
+    handle = timer.run('store_dataset', main.store_dataset, f'bench-{rows}', gravity_config, compact_df, rankings, row_index)
+    timer.run('rescore_violations', pipeline.rescore_violations, compact_df, gravity_config, changed_gravity_config())
+    timer.run('process_csv_out_of_core', pipeline.process_csv_out_of_core, path, gravity_config)
+
+    def upload_pipeline():
+        # Mesmo caminho do upload no dashboard: conteúdo em base64 decodificado e ingestão pelo pipeline, sem cache em disco
+        with open(path, 'rb') as source:
+            contents = 'data:text/csv;base64,' + base64.b64encode(source.read()).decode('ascii')
+        files = [(os.path.basename(path), pipeline.decode_upload_contents(contents), None)]
+        return pipeline.ingest_violation_files(files, gravity_config)
+    timer.run('ingest_upload', upload_pipeline)
+
+    # Callbacks do dashboard sobre o dataset em cache
+    top_driver = rankings['motorista'].sort_values('Pontuação Total', ascending=False)['Motorista'].iloc[0]
+    violation_types = list(pipeline.VIOLATION_TYPES)
+    timer.run('callback:update_general_dashboard', main.update_general_dashboard, handle, handle)
+    timer.run('callback:update_general_dashboard_memoized', main.update_general_dashboard, handle, handle)
+    timer.run('callback:update_veiculo_dashboard', main.update_veiculo_dashboard, handle)
+    timer.run('callback:update_category_ranking', main.update_category_ranking, handle)
+    timer.run('callback:update_violations_table', main.update_violations_table, handle, 0, 20, [], '')
+    timer.run('callback:update_violations_table_sorted', main.update_violations_table, handle, 5, 20, [{'column_id': 'score_final', 'direction': 'desc'}], '')
+    timer.run('callback:update_violations_table_filtered', main.update_violations_table, handle, 0, 20, [], '{violacao} contains Velocidade && {score_final} > 0.1')
+    timer.run('callback:update_individual_content', main.update_individual_content, top_driver, violation_types, handle)
+    timer.run('callback:update_individual_content_memoized', main.update_individual_content, top_driver, violation_types, handle)
+    timer.run('callback:render_individual_violation_list', main.render_individual_violation_list, 0, top_driver, violation_types, handle)
+    return timer.results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, baseline_path):
+    """Imprime a razão de tempo (atual / referência) de cada etapa presente nos dois resultados."""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"\nComparação com {baseline_path} (commit {baseline.get('commit')}):")
+    for rows, stages in current['sizes'].items():
+        reference = baseline['sizes'].get(rows)
+        if reference is None:
+            continue
+        print(f"  {int(rows):,} linhas")
+        for name, result in stages.items():
+            if name in reference and reference[name]['seconds'] > 0:
+                ratio = result['seconds'] / reference[name]['seconds']
+                # Etapas de poucos milissegundos variam muito entre execuções; só marca diferenças reais
+                slower = ratio > REGRESSION_RATIO and result['seconds'] - reference[name]['seconds'] > REGRESSION_MIN_SECONDS
+                flag = '  <-- mais lento' if slower else ''
+                print(f"    {name:<44} {ratio:6.2f}x{flag}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--drivers', type=int, default=500)
+    parser.add_argument('--vehicles', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'driver-behavior-bench'))
+    parser.add_argument('--output', default=None, help=f'padrão: {RESULTS_DIR}/bench_<commit>_<data>.json')
+    parser.add_argument('--compare', default=None, help='JSON de uma execução anterior para comparar')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'fleet': {'drivers': args.drivers, 'vehicles': args.vehicles, 'seed': args.seed},
+        'sizes': {},
+    }
+    for rows in args.sizes:
+        path = os.path.join(args.data_dir, f'telemetria_{rows}_{args.drivers}_{args.vehicles}_{args.seed}.csv')
+        if not os.path.exists(path):
+            print(f"Gerando {rows:,} linhas em {path}...", flush=True)
+            generate_telemetry_csv(path, rows, drivers=args.drivers, vehicles=args.vehicles, seed=args.seed)
+        print(f"{rows:,} linhas ({os.path.getsize(path) / 2**20:.0f} MB):", flush=True)
+        results['sizes'][str(rows)] = benchmark_size(path, rows)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{commit or 'sem-commit'}_{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=2, ensure_ascii=False)
+    print(f"\nResultados gravados em {output}")
+    if args.compare:
+        compare_results(results, args.compare)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,72 @@
+"""
+Benchmark do motor de pontuação: compara o cálculo linha a linha (df.apply) com o vetorizado.
+
+Uso:
+    python benchmarks/bench_scoring.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import (DEFAULT_GRAVITY_CONFIG, VIOLATION_TYPES, calculate_event_gravity_factor,  # noqa: E402
+                      calculate_final_scores, calculate_gravity_factors, get_base_weight)
+
+
+def build_scoring_frame(n_rows, seed=42):
+    """Gera um DataFrame já normalizado, apenas com as colunas usadas na pontuação."""
+    rng = np.random.default_rng(seed)
+    limite = rng.choice([0, 20, 21, 40, 60, 90], size=n_rows)
+    return pd.DataFrame({
+        'violacao': rng.choice(VIOLATION_TYPES, size=n_rows),
+        'valor_final_da_velocidade_configurada': limite,
+        'velocidade_maxima': limite + rng.integers(-5, 40, size=n_rows),
+        'duracao_seconds': rng.integers(0, 7200, size=n_rows),
+        'pedal_de_freio': rng.choice(['Não Acionado', 'Sim', 'Não'], size=n_rows),
+    })
+
+
+def score_row_wise(df, gravity_config):
+    factors = df.apply(calculate_event_gravity_factor, axis=1, gravity_config=gravity_config)
+    scores = df.assign(fator_gravidade_evento=factors).apply(
+        lambda row: get_base_weight(row['violacao'], row['valor_final_da_velocidade_configurada'], gravity_config) * row['fator_gravidade_evento'], axis=1)
+    scores[df['violacao'] == 'Freada brusca'] = gravity_config['Freada_Brusca']['base_weight']
+    return factors.to_numpy(), scores.to_numpy()
+
+
+def score_vectorized(df, gravity_config):
+    factors = calculate_gravity_factors(df, gravity_config)
+    scores = calculate_final_scores(df.assign(fator_gravidade_evento=factors), gravity_config)
+    return factors, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = build_scoring_frame(args.rows)
+
+    start = time.perf_counter()
+    vec_factors, vec_scores = score_vectorized(df, DEFAULT_GRAVITY_CONFIG)
+    vec_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    row_factors, row_scores = score_row_wise(df, DEFAULT_GRAVITY_CONFIG)
+    row_time = time.perf_counter() - start
+
+    identical = np.array_equal(vec_factors, row_factors) and np.array_equal(vec_scores, row_scores)
+    print(f"Linhas: {args.rows:,}")
+    print(f"Linha a linha: {row_time:.2f} s")
+    print(f"Vetorizado:    {vec_time:.3f} s")
+    print(f"Speedup:       {row_time / vec_time:.0f}x")
+    print(f"Resultados idênticos: {'sim' if identical else 'NÃO'}")
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
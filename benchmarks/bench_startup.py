@@ -0,0 +1,167 @@
+"""
+Benchmark de partida: mede, em processos novos, o tempo do import de main (o que cada worker do gunicorn paga ao
+subir) e o tempo até a primeira resposta (/, /_dash-layout e /_dash-dependencies pelo cliente de teste do Flask,
+com login). Uma execução extra com -X importtime lista os módulos mais caros. O resultado vai para um JSON (com o
+commit atual) para comparar regressões entre versões.
+
+Uso:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --compare benchmarks/results/startup_abc1234_20250601-120000.json
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+FIRST_REQUESTS = ['/', '/_dash-layout', '/_dash-dependencies']
+# Dependências que só o Instrutor Virtual e a exportação usam; não devem ser carregadas na partida
+LAZY_MODULES = ['requests', 'markdown', 'pyarrow.parquet']
+IMPORTTIME_TOP = 15
+REGRESSION_RATIO = 1.2
+REGRESSION_MIN_SECONDS = 0.02
+
+
+def measure_in_process():
+    """Executado no processo filho: import de main e primeiras requisições, em segundos desde o início do import."""
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT_DIR)
+    import main
+    result = {'import_main': time.perf_counter() - start}
+
+    client = main.server.test_client()
+    username, password = next(iter(main.USERS.items()))
+    token = base64.b64encode(f'{username}:{password}'.encode()).decode('ascii')
+    headers = {'Authorization': f'Basic {token}'}
+    for path in FIRST_REQUESTS:
+        request_start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        if response.status_code != 200:
+            raise SystemExit(f'{path} respondeu {response.status_code}')
+        result[f'request:{path}'] = time.perf_counter() - request_start
+    result['first_response'] = time.perf_counter() - start
+    result['lazy_modules_loaded'] = [name for name in LAZY_MODULES if name in sys.modules]
+    return result
+
+
+def run_child(extra_args=()):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, *extra_args, os.path.abspath(__file__), '--child'],
+                               cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    measures = json.loads(completed.stdout.strip().splitlines()[-1])
+    measures['process_total'] = time.perf_counter() - start
+    return measures, completed.stderr
+
+
+def slowest_imports(stderr, top):
+    """Imports diretos de main de maior tempo acumulado, a partir da saída do -X importtime."""
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        # Cada nível de import acrescenta dois espaços; os filhos aparecem antes do módulo que os importou
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative_us)))
+        elif depth == 0:
+            if name.strip() == 'main':
+                break
+            children = []
+    children.sort(key=lambda item: item[1], reverse=True)
+    return [{'module': name, 'cumulative_ms': round(cumulative / 1000, 1)} for name, cumulative in children[:top]]
+
+
+def summarize(runs):
+    summary = {}
+    for key in runs[0]:
+        if key == 'lazy_modules_loaded':
+            continue
+        values = [run[key] for run in runs]
+        summary[key] = {'median_seconds': round(statistics.median(values), 4), 'min_seconds': round(min(values), 4)}
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, baseline_path):
+    """Imprime a razão da mediana (atual / referência) de cada medida presente nos dois resultados."""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    print(f"\nComparação com {baseline_path} (commit {baseline.get('commit')}):")
+    for name, result in current['timings'].items():
+        reference = baseline['timings'].get(name)
+        if reference is None or reference['median_seconds'] <= 0:
+            continue
+        ratio = result['median_seconds'] / reference['median_seconds']
+        slower = ratio > REGRESSION_RATIO and result['median_seconds'] - reference['median_seconds'] > REGRESSION_MIN_SECONDS
+        flag = '  <-- mais lento' if slower else ''
+        print(f"  {name:<32} {ratio:6.2f}x{flag}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--output', default=None, help=f'padrão: {RESULTS_DIR}/startup_<commit>_<data>.json')
+    parser.add_argument('--compare', default=None, help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_in_process()))
+        return
+
+    # A primeira execução compila os .pyc; as medidas seguintes refletem a partida de um worker em produção
+    run_child()
+    runs = []
+    for run in range(args.runs):
+        measures, _ = run_child()
+        runs.append(measures)
+        print(f"  execução {run + 1}: import {measures['import_main']:.3f} s, "
+              f"primeira resposta {measures['first_response']:.3f} s, processo {measures['process_total']:.3f} s", flush=True)
+    _, importtime_stderr = run_child(['-X', 'importtime'])
+
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': args.runs,
+        'timings': summarize(runs),
+        'lazy_modules_loaded': runs[-1]['lazy_modules_loaded'],
+        'slowest_imports': slowest_imports(importtime_stderr, IMPORTTIME_TOP),
+    }
+    print("\nMediana:")
+    for name, result in results['timings'].items():
+        print(f"  {name:<32} {result['median_seconds']:9.3f} s")
+    print("\nImports mais caros (acumulado):")
+    for entry in results['slowest_imports']:
+        print(f"  {entry['module']:<32} {entry['cumulative_ms']:9.1f} ms")
+    if results['lazy_modules_loaded']:
+        print(f"\nAtenção: carregados na partida: {', '.join(results['lazy_modules_loaded'])}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup_{commit or 'sem-commit'}_{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=2, ensure_ascii=False)
+    print(f"\nResultados gravados em {output}")
+    if args.compare:
+        compare_results(results, args.compare)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,209 @@
+"""
+Gera exportações sintéticas de telemetria no mesmo formato do arquivo real (2025-05.csv): separador ";",
+UTF-8 com BOM, datas dd/mm/aaaa hh:mm:ss, durações hh:mm:ss, coordenadas DMS ("26° 38´ 24´´ Sul"),
+hodômetros "55.510,20", RPM "1.295" e os seis tipos de VIOLATION_TYPES, com campos vazios por tipo como na
+exportação original. Os eventos se concentram em pátios e rotas repetidos, como nos dados reais.
+
+Uso:
+    python benchmarks/generate_telemetry.py --rows 1000000 --drivers 500 --vehicles 300 --output /tmp/telemetria_1m.csv
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import VIOLATION_TYPES  # noqa: E402
+
+CSV_COLUMNS = [
+    'Nome da conta', 'Nome do veículo', 'Número do veículo', 'Motorista', 'CPF', 'Violação',
+    'Data inicial da violação', 'Data final da violação', 'Duração', 'Velocidade inicial', 'Velocidade final',
+    'Valor inicial da velocidade configurada', 'Valor final da velocidade configurada', 'RPM inicial', 'RPM final',
+    'Valor inicial do RPM configurado', 'Valor final do RPM configurado', 'Hodômetro inicial', 'Hodômetro final',
+    'Distância', 'Latitude inicial', 'Latitude final', 'Longitude inicial', 'Longitude final', 'Velocidade máxima',
+    'RPM máximo', 'Pedal de freio', 'Posição do Acelerador',
+]
+
+# Participação de cada tipo nos eventos (próxima da exportação real; Freio motor não aparece nela)
+VIOLATION_SHARES = {
+    "Velocidade excessiva": 0.41, "Marcha lenta": 0.39, "Faixa verde": 0.15,
+    "Freada brusca": 0.02, "RPM excessiva": 0.01, "Freio motor": 0.02,
+}
+# Duração mediana (s) e dispersão (lognormal) de cada tipo
+VIOLATION_DURATIONS = {
+    "Velocidade excessiva": (40, 0.9), "Marcha lenta": (600, 1.0), "Faixa verde": (45, 0.5),
+    "Freada brusca": (2, 0.1), "RPM excessiva": (13, 0.4), "Freio motor": (30, 0.6),
+}
+# Colunas preenchidas só em alguns tipos (nos demais ficam vazias, como na exportação)
+SPEED_LIMIT_TYPES = ["Velocidade excessiva"]
+RPM_TYPES = ["Faixa verde", "RPM excessiva", "Freio motor"]
+RPM_LIMIT_TYPES = ["Faixa verde"]
+MAX_SPEED_EMPTY_TYPES = ["Marcha lenta"]
+
+FIRST_NAMES = ['João', 'Maria', 'Carlos', 'Ana', 'Pedro', 'Lucas', 'Juliana', 'Marcos', 'Fernanda', 'Rafael',
+               'Patrícia', 'Bruno', 'Camila', 'Diego', 'Larissa', 'Eduardo', 'Renata', 'Gustavo', 'Aline', 'Thiago']
+LAST_NAMES = ['Silva', 'Santos', 'Ferreira', 'Costa', 'Oliveira', 'Souza', 'Pereira', 'Lima', 'Gomes', 'Ribeiro',
+              'Almeida', 'Carvalho', 'Rocha', 'Martins', 'Barbosa', 'Araújo', 'Cardoso', 'Teixeira', 'Moreira', 'Mendes']
+
+
+def driver_names(n):
+    """Nomes únicos "Nome Sobrenome" (com número quando as combinações acabam)."""
+    names = [f"{first} {last}" for last in LAST_NAMES for first in FIRST_NAMES]
+    return [names[i % len(names)] + (f" {i // len(names) + 1}" if i >= len(names) else "") for i in range(n)]
+
+
+def format_thousands(values, decimals):
+    """Números no formato brasileiro ("55.510,20", "1.295") em bloco; values >= 0 e < 1.000.000."""
+    scaled = np.round(np.asarray(values, dtype=np.float64) * 10 ** decimals).astype(np.int64)
+    integer, fraction = scaled // 10 ** decimals, scaled % 10 ** decimals
+    thousands, units = pd.Series(integer // 1000), pd.Series(integer % 1000)
+    text = units.astype(str).where(thousands == 0, thousands.astype(str) + '.' + units.astype(str).str.zfill(3))
+    if decimals:
+        text = text + ',' + pd.Series(fraction).astype(str).str.zfill(decimals)
+    return text
+
+
+def format_decimal_br(values, decimals):
+    return pd.Series(np.char.mod(f'%.{decimals}f', np.asarray(values, dtype=np.float64))).str.replace('.', ',', regex=False)
+
+
+def format_dms(values, positive, negative):
+    """Graus decimais -> "26° 38´ 24´´ Sul" em bloco."""
+    values = np.asarray(values, dtype=np.float64)
+    total_seconds = np.round(np.abs(values) * 3600).astype(np.int64)
+    degrees, minutes, seconds = total_seconds // 3600, total_seconds // 60 % 60, total_seconds % 60
+    direction = np.where(values < 0, negative, positive)
+    return (pd.Series(degrees).astype(str) + '° ' + pd.Series(minutes).astype(str).str.zfill(2) + '´ '
+            + pd.Series(seconds).astype(str).str.zfill(2) + '´´ ' + pd.Series(direction))
+
+
+def format_datetimes(values):
+    iso = pd.Series(values.astype('datetime64[s]').astype(str))
+    return iso.str[8:10] + '/' + iso.str[5:7] + '/' + iso.str[0:4] + ' ' + iso.str[11:19]
+
+
+def format_durations(seconds):
+    seconds = pd.Series(seconds)
+    return ((seconds // 3600).astype(str).str.zfill(2) + ':' + (seconds // 60 % 60).astype(str).str.zfill(2) + ':'
+            + (seconds % 60).astype(str).str.zfill(2))
+
+
+class TelemetryGenerator:
+    """Frota sintética fixa (motoristas, veículos, pátios) que gera blocos de eventos no formato da exportação."""
+
+    def __init__(self, drivers=50, vehicles=30, seed=42, start_date='2025-06-01', days=30, depots=40):
+        self.rng = np.random.default_rng(seed)
+        self.start = np.datetime64(start_date, 's')
+        self.period_seconds = days * 86400
+        self.drivers = np.array(driver_names(drivers), dtype=object)
+        self.cpfs = np.array([f"{a:03d}.{b:03d}.{c:03d}-{d:02d}" for a, b, c, d in self.rng.integers(0, 1000, (drivers, 4)) % [1000, 1000, 1000, 100]], dtype=object)
+        self.vehicle_names = np.array([f"F{1000 + i}" for i in range(vehicles)], dtype=object)
+        self.vehicle_numbers = self.rng.integers(100000, 999999, vehicles)
+        # Cada motorista dirige quase sempre o mesmo veículo e roda em torno de uma região
+        self.home_vehicle = self.rng.integers(0, vehicles, drivers)
+        self.home_region = np.column_stack([self.rng.uniform(-27.5, -15.0, drivers), self.rng.uniform(-52.0, -47.0, drivers)])
+        self.depots = np.column_stack([self.rng.uniform(-27.5, -15.0, depots), self.rng.uniform(-52.0, -47.0, depots)])
+        self.odometer = self.rng.uniform(20_000, 600_000, vehicles)
+        self.types = np.array(list(VIOLATION_SHARES), dtype=object)
+        self.type_shares = np.array(list(VIOLATION_SHARES.values()))
+        assert set(self.types) == set(VIOLATION_TYPES)
+
+    def chunk(self, n):
+        """n eventos como DataFrame de strings, com as colunas e os vazios da exportação."""
+        rng = self.rng
+        driver = rng.integers(0, len(self.drivers), n)
+        vehicle = np.where(rng.random(n) < 0.85, self.home_vehicle[driver], rng.integers(0, len(self.vehicle_names), n))
+        violation = self.types[rng.choice(len(self.types), size=n, p=self.type_shares)]
+        is_type = {name: violation == name for name in self.types}
+
+        duration = np.ones(n, dtype=np.int64)
+        for name, (median, sigma) in VIOLATION_DURATIONS.items():
+            mask = is_type[name]
+            duration[mask] = np.clip(np.round(rng.lognormal(np.log(median), sigma, mask.sum())), 1, 4 * 3600)
+        start = self.start + rng.integers(0, self.period_seconds, n).astype('timedelta64[s]')
+
+        # Pátios (strings repetidas) para marcha lenta e parte dos demais eventos; o resto, perto da região do motorista
+        at_depot = is_type["Marcha lenta"] | (rng.random(n) < 0.2)
+        origin = np.where(at_depot[:, None], self.depots[rng.integers(0, len(self.depots), n)], self.home_region[driver] + rng.normal(0, 0.5, (n, 2)))
+        moving = ~is_type["Marcha lenta"]
+        distance = np.where(moving, np.round(duration * rng.uniform(8, 25, n) / 1000, 1), 0.0)
+        destination = origin + np.where(moving[:, None], rng.normal(0, 0.002, (n, 2)), 0.0)
+        odometer_start = self.odometer[vehicle] + rng.uniform(0, 20_000, n)
+
+        # Limite final configurado: rodovia na maior parte, serra e pátio para exercitar as três faixas de peso
+        speed_limit = rng.choice([20, 40, 90], size=n, p=[0.1, 0.2, 0.7])
+        speed = np.where(is_type["Velocidade excessiva"], speed_limit + rng.integers(1, 35, n),
+                         np.where(is_type["Marcha lenta"], rng.integers(0, 2, n), rng.integers(15, 95, n)))
+        rpm = np.where(is_type["RPM excessiva"], rng.integers(2200, 2600, n), np.where(is_type["Faixa verde"], rng.integers(1500, 1800, n), rng.integers(800, 1700, n)))
+        brake = np.where(is_type["Freada brusca"], np.where(rng.random(n) < 0.9, 'Acionado', 'Não Acionado'),
+                         rng.choice(['Não Acionado', 'Acionado', 'Não disponível'], size=n, p=[0.88, 0.1, 0.02]))
+
+        def only(types, values):
+            return pd.Series(values, index=range(n), dtype=object).where(np.isin(violation, types), '')
+
+        speed_text = pd.Series(speed).astype(str)
+        return pd.DataFrame({
+            'Nome da conta': 'Frota Sintética',
+            'Nome do veículo': self.vehicle_names[vehicle],
+            'Número do veículo': self.vehicle_numbers[vehicle],
+            'Motorista': self.drivers[driver],
+            'CPF': self.cpfs[driver],
+            'Violação': violation,
+            'Data inicial da violação': format_datetimes(start),
+            'Data final da violação': format_datetimes(start + duration.astype('timedelta64[s]')),
+            'Duração': format_durations(duration),
+            'Velocidade inicial': speed_text,
+            'Velocidade final': pd.Series(np.maximum(speed - rng.integers(0, 4, n), 0)).astype(str).where(~(is_type["Marcha lenta"] & (rng.random(n) < 0.04)), ''),
+            'Valor inicial da velocidade configurada': only(SPEED_LIMIT_TYPES, pd.Series(rng.choice([10, 21, 40, 90], size=n, p=[0.03, 0.54, 0.33, 0.1])).astype(str)),
+            'Valor final da velocidade configurada': only(SPEED_LIMIT_TYPES, pd.Series(speed_limit).astype(str)),
+            'RPM inicial': only(RPM_TYPES, format_thousands(rpm, 0)),
+            'RPM final': only(RPM_TYPES, format_thousands(rpm - rng.integers(0, 300, n), 0)),
+            'Valor inicial do RPM configurado': only(RPM_LIMIT_TYPES, '100'),
+            'Valor final do RPM configurado': only(RPM_LIMIT_TYPES, '1.500'),
+            'Hodômetro inicial': format_thousands(odometer_start, 2),
+            'Hodômetro final': format_thousands(odometer_start + distance, 2),
+            'Distância': format_decimal_br(distance, 2),
+            'Latitude inicial': format_dms(origin[:, 0], 'Norte', 'Sul'),
+            'Latitude final': format_dms(destination[:, 0], 'Norte', 'Sul'),
+            'Longitude inicial': format_dms(origin[:, 1], 'Leste', 'Oeste'),
+            'Longitude final': format_dms(destination[:, 1], 'Leste', 'Oeste'),
+            'Velocidade máxima': speed_text.where(~np.isin(violation, MAX_SPEED_EMPTY_TYPES), ''),
+            'RPM máximo': format_thousands(rpm + rng.integers(0, 150, n), 0),
+            'Pedal de freio': brake,
+            'Posição do Acelerador': pd.Series(np.where(moving & ~is_type["Freada brusca"], rng.integers(0, 100, n), 0)).astype(str) + '%',
+            # A exportação termina cada linha com ";" (coluna vazia sem nome)
+            '': '',
+        }, columns=CSV_COLUMNS + [''])
+
+
+def generate_telemetry_csv(path, rows, drivers=50, vehicles=30, seed=42, chunk_rows=250_000, **fleet):
+    """Grava rows eventos sintéticos em path, em blocos de chunk_rows linhas. Retorna o caminho."""
+    generator = TelemetryGenerator(drivers=drivers, vehicles=vehicles, seed=seed, **fleet)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8-sig', newline='') as output:
+        written = 0
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            generator.chunk(n).to_csv(output, sep=';', index=False, header=written == 0, lineterminator='\n')
+            written += n
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--drivers', type=int, default=50)
+    parser.add_argument('--vehicles', type=int, default=30)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='padrão: telemetria_<linhas>.csv no diretório atual')
+    args = parser.parse_args()
+    path = args.output or f"telemetria_{args.rows}.csv"
+    generate_telemetry_csv(path, args.rows, drivers=args.drivers, vehicles=args.vehicles, seed=args.seed, days=args.days)
+    print(f"{args.rows:,} eventos gravados em {path} ({os.path.getsize(path) / 2**20:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Servidor HTTP local que imita os endpoints generateContent e streamGenerateContent (SSE) da API Gemini, para
+testar os relatórios de IA (inclusive os da frota) sem custo e sem rede. Pode devolver 429/503 em parte das
+chamadas (ou nas primeiras N) para exercitar as novas tentativas com backoff. Fala HTTP/1.1 com keep-alive e conta
+as conexões abertas e o pico de chamadas simultâneas, para conferir o pool de conexões e o limite de concorrência
+do cliente.
+
+Uso:
+    python benchmarks/llm_stub_server.py --port 8765 --latency 0.5 --chunk-delay 0.05 --failure-rate 0.2
+    LLM_API_BASE_URL=http://127.0.0.1:8765/v1beta GEMINI_API_KEY=teste python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    chunk_delay = 0.0
+    failure_rate = 0.0
+    fail_first = 0
+    stats = {'requests': 0, 'failures': 0, 'connections': 0, 'in_flight': 0, 'max_in_flight': 0}
+    stats_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.stats_lock:
+            self.stats['connections'] += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            fail = self.stats['requests'] <= self.fail_first or random.random() < self.failure_rate
+            if fail:
+                self.stats['failures'] += 1
+            self.stats['in_flight'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+        try:
+            time.sleep(self.latency)
+            self.respond(body, fail)
+        finally:
+            with self.stats_lock:
+                self.stats['in_flight'] -= 1
+
+    def respond(self, body, fail):
+        if fail:
+            self.send_json(random.choice([429, 503]), {'error': {'message': 'stub: tente novamente'}}, {'Retry-After': '0'})
+            return
+        prompt = body['contents'][0]['parts'][0]['text']
+        text = f"Relatório de teste ({len(prompt)} caracteres de prompt)."
+        if '[L1]' in prompt:
+            # Cita a primeira referência de mapa, como o modelo faz, para exercitar a troca pelos links
+            text += " Local da ocorrência: [L1]"
+        if ':streamGenerateContent' in self.path:
+            self.send_stream(text)
+            return
+        self.send_json(200, {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}]})
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_stream(self, text):
+        """Envia o texto palavra a palavra como eventos SSE, em transferência chunked (mantém a conexão aberta)."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        words = text.split(' ')
+        for index, word in enumerate(words):
+            piece = word if index == len(words) - 1 else word + ' '
+            event = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': piece}]}}]}
+            data = f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0, latency=0.0, failure_rate=0.0, chunk_delay=0.0, fail_first=0):
+    """Sobe o servidor em uma thread e retorna (servidor, url base para LLM_API_BASE_URL); as contagens ficam em server.stats."""
+    handler = type('ConfiguredStubGeminiHandler', (StubGeminiHandler,), {
+        'latency': latency, 'failure_rate': failure_rate, 'chunk_delay': chunk_delay, 'fail_first': fail_first,
+        'stats': {'requests': 0, 'failures': 0, 'connections': 0, 'in_flight': 0, 'max_in_flight': 0},
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.stats = handler.stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1beta"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help='segundos por resposta')
+    parser.add_argument('--chunk-delay', type=float, default=0.05, help='segundos entre os trechos do streaming')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fração das chamadas respondidas com 429/503')
+    parser.add_argument('--fail-first', type=int, default=0, help='quantas das primeiras chamadas respondem com 429/503')
+    args = parser.parse_args()
+    server, base_url = start_stub_server(args.port, args.latency, args.failure_rate, args.chunk_delay, args.fail_first)
+    print(f"Stub do Gemini em {base_url} (Ctrl+C para parar)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,35 @@
 import pandas as pd
+import numpy as np
 import re
 import dash
 from dash import dcc, html, dash_table
 from dash.dependencies import Input, Output, State, ALL
 import plotly.graph_objects as go
-import base64
-import io
-import requests
+from plotly.io.json import to_json_plotly
 import json
 from datetime import datetime
-from markdown import markdown
-from flask import request, Response
+from flask import g, request, Response, jsonify, send_file
 import time
 import os
+import hashlib
+import gzip
+import sqlite3
+import threading
+import tempfile
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from dotenv import load_dotenv
 
+from pipeline import (
+    BYTES_BUCKETS, DATASET_MEMORY_BYTES, DEFAULT_GRAVITY_CONFIG, DURATION_BUCKETS, METRICS_PREFIX, PROCESS_POOL_CONTEXT,
+    STAGE_BYTES, STAGE_DURATION, STAGE_FAILURES, STAGE_FAILURES_LOCK, STAGE_ROWS, STAGE_TRACE, VIOLATION_CATEGORIES,
+    VIOLATION_TYPES, Histogram, build_rankings, compact_violations, convert_seconds_to_hhmm, decode_upload_contents,
+    escape_label_value, format_datetimes_br, generate_maps_route_link, hash_uploaded_files, ingest_violation_files,
+    instrumented_stage, rescore_violations, score_violations,
+)
+
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
@@ -36,285 +51,136 @@ def authenticate():
 
 
 
-# --- CONFIGURAÇÃO DA LÓGICA DE GRAVIDADE (VALORES PADRÃO) ---
-DEFAULT_GRAVITY_CONFIG = {
-    "Velocidade_Excessiva_Rodovia": {
-        "base_weight": 0.2, "speed_increment": 5, "speed_factor": 0.2,
-        "speed_factor_high": 0.4, "speed_threshold_high": 100,
-        "duration_increment": 10, "duration_factor": 0.1,
-    },
-    "Velocidade_Excessiva_Serra": {
-        "base_weight": 0.1, "speed_increment": 5, "speed_factor": 0.1,
-        "speed_factor_high": 0.2, "speed_threshold_high": 65,
-        "duration_increment": 10, "duration_factor": 0.05,
-    },
-    "Velocidade_Excessiva_Patio": {
-        "base_weight": 0.1, "speed_increment": 5, "speed_factor": 0.1,
-        "duration_increment": 10, "duration_factor": 0.05,
-    },
-    "Marcha_lenta": {
-        "base_weight": 0.1, "duration_increment": 1200, "duration_factor": 0.1, # 20 minutos
-        "min_duration_filter": 600 # 10 minutos
-    },
-    "Freada_Brusca": {
-        "base_weight": 0.1,
-    },
-    "RPM_Excessiva": {
-        "base_weight": 0.07, "duration_increment": 30, "duration_factor": 0.07,
-    },
-    "Faixa_Verde": {
-        "base_weight": 0.07, "duration_increment": 180, "duration_factor": 0.07, # 3 minutos
-    },
-    "Freio_Motor": {
-        "base_weight": 0.07, "duration_increment": 120, "duration_factor": 0.07, # 2 minutos
-    }
-}
-# Tipos de violações que serão processadas. "Banguela" foi removida.
-VIOLATION_TYPES = ["Velocidade excessiva", "Marcha lenta", "Freada brusca", "RPM excessiva", "Faixa verde", "Freio motor"]
-
-# Classificação das violações por categoria
-VIOLATION_CATEGORIES = {
-    "Econômica": ["Freio motor", "RPM excessiva", "Marcha lenta", "Faixa verde"],
-    "Segurança": ["Velocidade excessiva", "Freada brusca"]
-}
-
 # Cores para as categorias
 CATEGORY_COLORS = {
     "Econômica": "#F59E0B",  # Amarelo/Laranja
     "Segurança": "#EF4444"   # Vermelho
 }
 
-# --- FUNÇÕES DE PROCESSAMENTO DE DADOS ---
+# --- CACHE DE DATASETS NO SERVIDOR ---
+# Os dcc.Store guardam apenas um identificador pequeno; os DataFrames já tipados ficam em memória no processo.
+DATASET_CACHE_MAX_ENTRIES = int(os.getenv('DATASET_CACHE_MAX_ENTRIES', '8'))
+DATASET_CACHE_MAX_MB = int(os.getenv('DATASET_CACHE_MAX_MB', '1024'))
+
+class DatasetCache:
+    """Cache LRU em memória para os datasets processados, limitado por quantidade e por tamanho total."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry, size_bytes):
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+                self._total_bytes -= self._sizes.pop(key)
+            self._entries[key] = entry
+            self._sizes[key] = size_bytes
+            self._total_bytes += size_bytes
+            # Despeja os menos usados recentemente, mantendo sempre o item recém-inserido
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                old_key, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(old_key)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._total_bytes}
+
+    def items(self):
+        """(chave, entrada) de todos os itens, do menos ao mais usado recentemente, sem alterar a ordem do LRU."""
+        with self._lock:
+            return list(self._entries.items())
+
+DATASET_CACHE = DatasetCache(DATASET_CACHE_MAX_ENTRIES, DATASET_CACHE_MAX_MB * 1024 * 1024)
+
+def hash_gravity_config(gravity_config):
+    """Gera um hash estável da configuração de gravidade."""
+    return hashlib.sha256(json.dumps(gravity_config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+# Entidade do índice de linhas -> coluna do dataset
+ROW_INDEX_COLUMNS = {'motorista': 'motorista', 'veiculo': 'nome_do_veículo'}
+
+def build_row_index(violations_df):
+    """Posições das linhas de cada motorista e de cada veículo, para o detalhamento não varrer o dataset inteiro."""
+    return {entity: violations_df.groupby(column, sort=False, observed=True).indices for entity, column in ROW_INDEX_COLUMNS.items()}
+
+@instrumented_stage('store_dataset')
+def store_dataset(content_hash, gravity_config, violations_df, rankings, row_index=None):
+    """
+    Registra o dataset processado no cache e retorna o identificador que vai para o dcc.Store.
+    O índice de linhas pode ser reaproveitado de outro resultado do mesmo upload (o recálculo não muda a ordem das linhas).
+    """
+    config_hash = hash_gravity_config(gravity_config)
+    dataset_id = f"{content_hash}:{config_hash}"
+    row_index = row_index if row_index is not None else build_row_index(violations_df)
+    size_bytes = int(violations_df.memory_usage(deep=True).sum() + sum(ranking.memory_usage(deep=True).sum() for ranking in rankings.values()))
+    size_bytes += sum(positions.nbytes for entity_index in row_index.values() for positions in entity_index.values())
+    entry = {'violations': violations_df, 'ranking': rankings['motorista'], 'rankings': rankings, 'row_index': row_index, 'gravity_config': gravity_config}
+    DATASET_CACHE.put(dataset_id, entry, size_bytes)
+    return {'dataset_id': dataset_id, 'content_hash': content_hash, 'config_hash': config_hash, 'rows': len(violations_df)}
+
+def store_base_dataset(content_hash, base_df):
+    """
+    Guarda o dataset do upload no esquema compacto como base dos recálculos sem novo upload. As colunas de
+    pontuação que ele traz são refeitas a cada recálculo; o dataset normalizado fica só no cache em disco.
+    """
+    DATASET_CACHE.put(f"{content_hash}:base", {'base': base_df}, int(base_df.memory_usage(deep=True).sum()))
 
-def dms_to_dd(dms_str):
-    if not isinstance(dms_str, str): return None
-    try:
-        parts = re.findall(r'[\d,.]+|[NSLOEWnsloew]', dms_str)
-        if len(parts) < 4: raise ValueError("Formato DMS inválido")
-        degrees = float(parts[0].replace(',', '.'))
-        minutes = float(parts[1].replace(',', '.'))
-        seconds = float(parts[2].replace(',', '.'))
-        direction = parts[3].upper()
-        dd = degrees + minutes / 60 + seconds / 3600
-        if direction in ['S', 'SUL', 'W', 'O', 'OESTE']: dd = -dd
-        return dd
-    except (ValueError, IndexError):
-        try: return float(dms_str.replace(',', '.'))
-        except (ValueError, TypeError): return None
-
-def convert_seconds_to_hhmm(seconds):
-    """Converte segundos em formato HH:MM"""
-    if pd.isna(seconds) or seconds == 0:
-        return "00:00"
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    return f"{hours:02d}:{minutes:02d}"
-
-def convert_duration_to_seconds(duration_str):
-    if not isinstance(duration_str, str): return 0
-    try:
-        h, m, s = map(int, duration_str.split(':'))
-        return h * 3600 + m * 60 + s
-    except (ValueError, TypeError): return 0
-
-def generate_maps_route_link(lat_i, lon_i, lat_f, lon_f):
-    if pd.isna(lat_i) or pd.isna(lon_i) or pd.isna(lat_f) or pd.isna(lon_f):
-        return "Percurso indisponível"
-    if lat_i == lat_f and lon_i == lon_f:
-        return f"https://www.google.com/maps?q={lat_i},{lon_i}"
-    return f"https://www.google.com/maps/dir/{lat_i},{lon_i}/{lat_f},{lon_f}"
-
-def clean_column_names(df):
-    new_columns = {col: col.strip().lower().replace(' ', '_').replace('ã', 'a').replace('ç', 'c') for col in df.columns}
-    df = df.rename(columns=new_columns)
-    rename_map = {
-        'latitude_inicial': 'latitude_inicial', 'longitude_inicial': 'longitude_inicial',
-        'latitude_final': 'latitude_final', 'longitude_final': 'longitude_final',
-        'data_inicial_da_violacao': 'data_evento'
-    }
-    df = df.rename(columns=rename_map)
-    return df
-    
-def calculate_event_gravity_factor(row, gravity_config):
-    """Calcula o Fator de Gravidade para uma única violação (linha)."""
-    viol_type = row.get('violacao')
-    factor = 1.0
-    duration = row.get('duracao_seconds', 0)
-
-    if viol_type == "Velocidade excessiva":
-        limite = row.get('valor_final_da_velocidade_configurada', 0)
-        # Categoriza a violação
-        if limite <= 20: conf = gravity_config["Velocidade_Excessiva_Patio"]
-        elif limite <= 40: conf = gravity_config["Velocidade_Excessiva_Serra"]
-        else: conf = gravity_config["Velocidade_Excessiva_Rodovia"]
-        
-        extrapolation = row.get('velocidade_maxima', 0) - limite
-        if extrapolation > 0 and conf.get('speed_increment', 0) > 0:
-            speed_multiplier = conf.get('speed_factor_high', conf['speed_factor']) if 'speed_threshold_high' in conf and row.get('velocidade_maxima', 0) > conf['speed_threshold_high'] else conf['speed_factor']
-            factor += (extrapolation / conf['speed_increment']) * speed_multiplier
-        if duration > 0 and conf.get('duration_increment', 0) > 0:
-            factor += (duration / conf['duration_increment']) * conf.get('duration_factor')
-            
-    elif viol_type == "Marcha lenta":
-        conf = gravity_config["Marcha_lenta"]
-        if duration >= conf.get('min_duration_filter', 600) and row.get('pedal_de_freio', '').lower() != 'sim' and conf.get('duration_increment', 0) > 0:
-            factor += (duration / conf['duration_increment']) * conf.get('duration_factor')
-            
-    elif viol_type in ["RPM excessiva", "Freio motor", "Faixa verde"]:
-        conf_map = {"RPM excessiva": "RPM_Excessiva", "Freio motor": "Freio_Motor", "Faixa verde": "Faixa_Verde"}
-        conf = gravity_config[conf_map[viol_type]]
-        if duration > 0 and conf.get('duration_increment', 0) > 0:
-             factor += (duration / conf['duration_increment']) * conf.get('duration_factor')
-
-    elif viol_type == "Freada brusca":
-        # Freada brusca não tem fator de gravidade, pontuação fixa de 0.1 por violação
-        factor = 0.0
-        
-    return factor
+def get_base_dataset(content_hash):
+    entry = DATASET_CACHE.get(f"{content_hash}:base")
+    return entry['base'] if entry is not None else None
 
-def process_uploaded_data(contents, filename, gravity_config):
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
-    
-    try:
-        if 'csv' not in filename: return None, None, html.Div(['O arquivo precisa ser um .CSV.'])
-        df = pd.read_csv(io.StringIO(decoded.decode('utf-8')), delimiter=';', on_bad_lines='warn').fillna(0)
-        df = clean_column_names(df)
-        
-        # Adicionar índice da linha do CSV (começando de 2 para considerar o header como linha 1)
-        df['linha_csv'] = df.index + 2
-
-        df = df[df['violacao'].isin(VIOLATION_TYPES)]
-
-        if 'data_evento' not in df.columns: return None, None, html.Div(['Coluna de data ("Data inicial da violação") não encontrada.'])
-        df['data_evento'] = pd.to_datetime(df['data_evento'], dayfirst=True, errors='coerce')
-        df = df.dropna(subset=['data_evento'])
-
-        # Remover pontos dos valores de rpm_máximo de forma inteligente
-        # Se termina com .0, remove apenas o .0
-        # Se tem ponto no meio (como 1.644), remove o ponto
-        for rpm_col in ['rpm_máximo', 'rpm_maximo']:
-            if rpm_col in df.columns:
-                series = pd.Series(df[rpm_col]).astype(str)
-                series = series.str.replace(r'\.0$', '', regex=True)  # Remove .0 no final
-                series = series.str.replace('.', '', regex=False)  # Remove outros pontos
-                df[rpm_col] = series
-
-        numeric_cols = ['velocidade_maxima', 'valor_final_da_velocidade_configurada', 'rpm_maximo', 'valor_final_do_rpm_configurado', 'distancia', 'velocidade_inicial', 'velocidade_final']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                df[col] = df[col].fillna(0)
-
-        if 'rpm_máximo' in df.columns:
-            df['rpm_máximo'] = pd.to_numeric(df['rpm_máximo'], errors='coerce')
-            df['rpm_máximo'] = df['rpm_máximo'].fillna(0)
-
-        coord_cols = ['latitude_inicial', 'longitude_inicial', 'latitude_final', 'longitude_final']
-        for col in coord_cols:
-            if col in df.columns: 
-                df[col] = df[col].apply(dms_to_dd)
-        
-        df['duracao_seconds'] = df['duracao'].apply(convert_duration_to_seconds)
-        df['fator_gravidade_evento'] = df.apply(calculate_event_gravity_factor, axis=1, gravity_config=gravity_config)
+def build_scored_dataset(content_hash, gravity_config, previous_handle=None, base_df=None):
+    """
+    Pontua e agrega o dataset para a configuração informada, reaproveitando o que já estiver em cache:
+    o próprio resultado, um resultado anterior (recalculando só os tipos alterados) ou o dataset normalizado.
+    Retorna o identificador do dataset ou None se os dados do upload não estiverem mais em memória.
+    """
+    dataset_id = f"{content_hash}:{hash_gravity_config(gravity_config)}"
+    cached = DATASET_CACHE.get(dataset_id)
+    if cached is not None:
+        return store_dataset(content_hash, gravity_config, cached['violations'], cached['rankings'], cached['row_index'])
+
+    previous = get_cached_dataset(previous_handle)
+    row_index = None
+    if previous is not None and previous_handle.get('content_hash') == content_hash:
+        violations_df = rescore_violations(previous['violations'], previous['gravity_config'], gravity_config)
+        row_index = previous['row_index']
+    else:
+        base_df = base_df if base_df is not None else get_base_dataset(content_hash)
+        if base_df is None:
+            return None
+        violations_df = score_violations(base_df, gravity_config)
 
-        # Contagem de violações por motorista e tipo (para referência, mas não para multiplicação)
-        counts = df.groupby(['motorista', 'violacao']).size().reset_index(name='qtd_violacoes')
-        df = pd.merge(df, counts, on=['motorista', 'violacao'], how='left')
-        
-        def get_base_weight(viol_type, limite):
-            if viol_type == 'Velocidade excessiva':
-                if limite <= 20: return gravity_config["Velocidade_Excessiva_Patio"]['base_weight']
-                elif limite > 20 and limite <= 40: return gravity_config["Velocidade_Excessiva_Serra"]['base_weight']
-                else: return gravity_config["Velocidade_Excessiva_Rodovia"]['base_weight']
-            else:
-                conf_map = {"Marcha lenta": "Marcha_lenta", "Freada brusca": "Freada_Brusca", "RPM excessiva": "RPM_Excessiva", "Faixa verde": "Faixa_Verde", "Freio motor": "Freio_Motor"}
-                key = conf_map.get(viol_type)
-                return gravity_config.get(key, {}).get('base_weight', 0)
+    return store_dataset(content_hash, gravity_config, violations_df, build_rankings(violations_df), row_index)
 
-        # Cada violação tem pontuação individual baseada em seu próprio fator de gravidade
-        df['score_final'] = df.apply(lambda row: get_base_weight(row['violacao'], row['valor_final_da_velocidade_configurada']) * row.get('fator_gravidade_evento', 1), axis=1)
-        
-        # Correção especial para Freada brusca: apenas base_weight por violação, sem multiplicadores
-        freada_brusca_mask = df['violacao'] == 'Freada brusca'
-        if freada_brusca_mask.any():
-            df.loc[freada_brusca_mask, 'score_final'] = gravity_config.get('Freada_Brusca', {}).get('base_weight', 0.1)
-        
-        # Ranking por motorista
-        ranking_list = []
-        for driver, group in df.groupby('motorista'):
-            if not driver: continue
-            total_score = group['score_final'].sum()
-            violation_scores = group.groupby('violacao')['score_final'].sum().to_dict()
-            summary = {'Motorista': driver, 'Pontuação Total': total_score}
-            for v_type in VIOLATION_TYPES:
-                summary[v_type] = violation_scores.get(v_type, 0)
-            ranking_list.append(summary)
-
-        ranking_df = pd.DataFrame(ranking_list)
-        
-        # Ranking por veículo
-        ranking_veiculo_list = []
-        for veiculo, group in df.groupby('nome_do_veículo'):
-            if not veiculo: continue
-            total_score = group['score_final'].sum()
-            violation_scores = group.groupby('violacao')['score_final'].sum().to_dict()
-            summary = {'Veículo': veiculo, 'Pontuação Total': total_score}
-            for v_type in VIOLATION_TYPES:
-                summary[v_type] = violation_scores.get(v_type, 0)
-            ranking_veiculo_list.append(summary)
-
-        ranking_veiculo_df = pd.DataFrame(ranking_veiculo_list)
-        
-        return df, ranking_df, None
+def get_cached_dataset(handle):
+    """Recupera o dataset a partir do identificador do dcc.Store (None se expirou ou foi despejado)."""
+    if not handle:
+        return None
+    return DATASET_CACHE.get(handle.get('dataset_id'))
 
-    except Exception as e:
-        print(f"Erro no processamento: {e}")
-        # Rankings por categoria - Motoristas
-        ranking_categoria_motorista_list = []
-        for driver, group in df.groupby('motorista'):
-            if not driver: continue
-            total_score = group['score_final'].sum()
-            economica_score = group[group['violacao'].isin(VIOLATION_CATEGORIES['Econômica'])]['score_final'].sum()
-            seguranca_score = group[group['violacao'].isin(VIOLATION_CATEGORIES['Segurança'])]['score_final'].sum()
-            summary = {
-                'Motorista': driver, 
-                'Pontuação Total': total_score,
-                'Pontuação Econômica': economica_score,
-                'Pontuação Segurança': seguranca_score,
-                'Percentual Econômica': (economica_score / total_score * 100) if total_score > 0 else 0,
-                'Percentual Segurança': (seguranca_score / total_score * 100) if total_score > 0 else 0
-            }
-            ranking_categoria_motorista_list.append(summary)
-        ranking_categoria_motorista_df = pd.DataFrame(ranking_categoria_motorista_list)
-        
-        # Rankings por categoria - Veículos
-        ranking_categoria_veiculo_list = []
-        for veiculo, group in df.groupby('nome_do_veículo'):
-            if not veiculo: continue
-            total_score = group['score_final'].sum()
-            
-            # Calcula pontuação por categoria
-            economica_score = group[group['violacao'].isin(VIOLATION_CATEGORIES['Econômica'])]['score_final'].sum()
-            seguranca_score = group[group['violacao'].isin(VIOLATION_CATEGORIES['Segurança'])]['score_final'].sum()
-            
-            summary = {
-                'Veículo': veiculo, 
-                'Pontuação Total': total_score,
-                'Pontuação Econômica': economica_score,
-                'Pontuação Segurança': seguranca_score,
-                'Percentual Econômica': (economica_score / total_score * 100) if total_score > 0 else 0,
-                'Percentual Segurança': (seguranca_score / total_score * 100) if total_score > 0 else 0
-            }
-            ranking_categoria_veiculo_list.append(summary)
-
-        ranking_categoria_veiculo_df = pd.DataFrame(ranking_categoria_veiculo_list)
-        
-        return df, ranking_df, ranking_categoria_motorista_df, None
+def get_entity_violations(dataset, entity, key):
+    """Violações de um motorista ou veículo (entity: 'motorista' ou 'veiculo') pelo índice de linhas, na ordem do dataset."""
+    violations_df = dataset['violations']
+    positions = dataset['row_index'][entity].get(key)
+    if positions is None:
+        return violations_df.iloc[:0]
+    return violations_df.take(positions)
 
-    except Exception as e:
-        print(f"Erro no processamento: {e}")
-        return None, None, html.Div([f'Ocorreu um erro ao processar o arquivo: {e}'])
+def get_driver_violations(dataset, driver):
+    return get_entity_violations(dataset, 'motorista', driver)
 
 
 # --- INICIALIZAÇÃO DO APP DASH ---
@@ -330,9 +196,330 @@ def require_authentication():
     if not auth or not check_auth(auth.username, auth.password):
         return authenticate()
 
+# --- MÉTRICAS: CALLBACKS DO DASH E ROTA /metrics ---
+# As etapas do pipeline são medidas em pipeline.py; aqui ficam a latência e o tamanho da resposta de cada callback.
+# Se METRICS_TRACE_PATH estiver definido, cada requisição grava uma linha JSON com as etapas executadas nela.
+METRICS_TRACE_PATH = os.getenv('METRICS_TRACE_PATH', '')
+CALLBACK_DURATION = Histogram(f'{METRICS_PREFIX}_callback_duration_seconds', 'Latência de cada callback do Dash.', 'callback', DURATION_BUCKETS)
+CALLBACK_RESPONSE_BYTES = Histogram(f'{METRICS_PREFIX}_callback_response_bytes', 'Tamanho da resposta de cada callback do Dash.', 'callback', BYTES_BUCKETS)
+
+@server.before_request
+def start_request_metrics():
+    g.metrics_started_at = time.perf_counter()
+    STAGE_TRACE.stages = [] if METRICS_TRACE_PATH else None
+
+def get_callback_name(output_id):
+    """Nome da função do callback a partir do identificador de saída enviado pelo Dash."""
+    callback = app.callback_map.get(output_id, {}).get('callback')
+    return getattr(callback, '__name__', None) or output_id
+
+TRACE_LOCK = threading.Lock()
+
+def write_request_trace(callback_name, seconds, response_bytes, stages):
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+        'path': request.path,
+        'callback': callback_name,
+        'seconds': round(seconds, 6),
+        'response_bytes': response_bytes,
+        'stages': stages,
+    }
+    with TRACE_LOCK, open(METRICS_TRACE_PATH, 'a', encoding='utf-8') as trace_file:
+        trace_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+@server.after_request
+def record_request_metrics(response):
+    started_at = getattr(g, 'metrics_started_at', None)
+    if started_at is None:
+        return response
+    seconds = time.perf_counter() - started_at
+    response_bytes = None if response.is_streamed else response.calculate_content_length()
+    callback_name = None
+    if request.path.endswith('/_dash-update-component'):
+        callback_name = get_callback_name((request.get_json(silent=True) or {}).get('output'))
+        CALLBACK_DURATION.observe(callback_name, seconds)
+        if response_bytes is not None:
+            CALLBACK_RESPONSE_BYTES.observe(callback_name, response_bytes)
+    stages = getattr(STAGE_TRACE, 'stages', None)
+    STAGE_TRACE.stages = None
+    # Assets e demais rotas sem etapas não entram no trace
+    if stages or (stages is not None and callback_name is not None):
+        write_request_trace(callback_name, seconds, response_bytes, stages)
+    return response
+
+def render_metrics():
+    """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)."""
+    lines = []
+    for histogram in (STAGE_DURATION, STAGE_ROWS, STAGE_BYTES, DATASET_MEMORY_BYTES, CALLBACK_DURATION, CALLBACK_RESPONSE_BYTES):
+        lines.extend(histogram.render())
+
+    lines += [f'# HELP {METRICS_PREFIX}_stage_failures_total Etapas do pipeline que terminaram com exceção.', f'# TYPE {METRICS_PREFIX}_stage_failures_total counter']
+    with STAGE_FAILURES_LOCK:
+        failures = sorted(STAGE_FAILURES.items())
+    lines += [f'{METRICS_PREFIX}_stage_failures_total{{stage="{escape_label_value(stage)}"}} {count}' for stage, count in failures]
+
+    cache_stats = DATASET_CACHE.stats()
+    lines += [
+        f'# HELP {METRICS_PREFIX}_dataset_cache_entries Datasets no cache em memória.',
+        f'# TYPE {METRICS_PREFIX}_dataset_cache_entries gauge',
+        f'{METRICS_PREFIX}_dataset_cache_entries {cache_stats["entries"]}',
+        f'# HELP {METRICS_PREFIX}_dataset_cache_bytes Tamanho estimado dos datasets no cache em memória.',
+        f'# TYPE {METRICS_PREFIX}_dataset_cache_bytes gauge',
+        f'{METRICS_PREFIX}_dataset_cache_bytes {cache_stats["bytes"]}',
+    ]
+
+    figure_stats = FIGURE_CACHE.stats()
+    with FIGURE_CACHE_LOOKUPS_LOCK:
+        figure_lookups = sorted(FIGURE_CACHE_LOOKUPS.items())
+    lines += [
+        f'# HELP {METRICS_PREFIX}_figure_cache_entries Figuras e blocos de KPI no cache em memória.',
+        f'# TYPE {METRICS_PREFIX}_figure_cache_entries gauge',
+        f'{METRICS_PREFIX}_figure_cache_entries {figure_stats["entries"]}',
+        f'# HELP {METRICS_PREFIX}_figure_cache_bytes Tamanho em JSON das figuras e blocos de KPI no cache.',
+        f'# TYPE {METRICS_PREFIX}_figure_cache_bytes gauge',
+        f'{METRICS_PREFIX}_figure_cache_bytes {figure_stats["bytes"]}',
+        f'# HELP {METRICS_PREFIX}_figure_cache_lookups_total Consultas ao cache de figuras e KPIs, por resultado.',
+        f'# TYPE {METRICS_PREFIX}_figure_cache_lookups_total counter',
+    ]
+    lines += [f'{METRICS_PREFIX}_figure_cache_lookups_total{{result="{result}"}} {count}' for result, count in figure_lookups]
+
+    llm_stats = dict(LLM_RESPONSE_CACHE.stats)
+    lines += [f'# HELP {METRICS_PREFIX}_llm_cache_lookups_total Consultas ao cache de respostas do LLM, por resultado.', f'# TYPE {METRICS_PREFIX}_llm_cache_lookups_total counter']
+    lines += [f'{METRICS_PREFIX}_llm_cache_lookups_total{{result="{result}"}} {count}' for result, count in sorted(llm_stats.items())]
+
+    with AI_REPORT_JOBS_LOCK:
+        job_statuses = [job['status'] for job in AI_REPORT_JOBS.values()]
+    lines += [f'# HELP {METRICS_PREFIX}_background_jobs Tarefas em segundo plano (relatórios e exportações), por estado.', f'# TYPE {METRICS_PREFIX}_background_jobs gauge']
+    lines += [f'{METRICS_PREFIX}_background_jobs{{status="{status}"}} {job_statuses.count(status)}' for status in sorted(set(job_statuses))]
+    return '\n'.join(lines) + '\n'
+
+@server.route('/metrics')
+def metrics():
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# --- UPLOAD EM PARTES PARA ARQUIVOS GRANDES ---
+# O dcc.Upload entrega o arquivo inteiro em base64 e várias cópias acabam em memória. Estas rotas recebem
+# o arquivo em blocos, gravando direto em disco, e a leitura do CSV parte do arquivo já no servidor.
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'driver-behavior-uploads'))
+UPLOAD_MAX_MB = int(os.getenv('UPLOAD_MAX_MB', '2048'))
+UPLOAD_SESSION_TTL_SECONDS = 6 * 3600
+UPLOAD_STREAM_BUFFER_BYTES = 1024 * 1024
+
+UPLOAD_SESSIONS = {}
+UPLOAD_SESSIONS_LOCK = threading.Lock()
+
+def upload_session_state(session):
+    return {key: session[key] for key in ('upload_id', 'filename', 'size', 'received', 'complete')}
+
+def get_upload_session(upload_id):
+    with UPLOAD_SESSIONS_LOCK:
+        return UPLOAD_SESSIONS.get(upload_id)
+
+def discard_upload_session(upload_id):
+    """Remove a sessão de upload e o arquivo temporário correspondente."""
+    with UPLOAD_SESSIONS_LOCK:
+        session = UPLOAD_SESSIONS.pop(upload_id, None)
+    if session is not None and os.path.exists(session['path']):
+        os.remove(session['path'])
+
+def cleanup_stale_uploads():
+    """Descarta uploads abandonados há mais tempo que UPLOAD_SESSION_TTL_SECONDS."""
+    now = time.time()
+    with UPLOAD_SESSIONS_LOCK:
+        stale = [upload_id for upload_id, session in UPLOAD_SESSIONS.items() if now - session['updated_at'] > UPLOAD_SESSION_TTL_SECONDS]
+    for upload_id in stale:
+        discard_upload_session(upload_id)
+
+@server.route('/upload/chunked', methods=['POST'])
+def start_chunked_upload():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        payload = {}
+    filename = str(payload.get('filename', ''))
+    if not filename.lower().endswith('.csv'):
+        return jsonify(error='O arquivo precisa ser um .CSV.'), 400
+    try:
+        size = int(payload.get('size') or 0)
+    except (TypeError, ValueError):
+        return jsonify(error='O tamanho do arquivo (size) precisa ser um número inteiro de bytes.'), 400
+    if size <= 0 or size > UPLOAD_MAX_MB * 1024 * 1024:
+        return jsonify(error=f'O arquivo precisa ter entre 1 byte e {UPLOAD_MAX_MB} MB.'), 413
+
+    cleanup_stale_uploads()
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    path = os.path.join(UPLOAD_SPOOL_DIR, f'{upload_id}.csv.part')
+    open(path, 'wb').close()
+    session = {
+        'upload_id': upload_id, 'filename': filename, 'size': size, 'received': 0, 'complete': False,
+        'path': path, 'sha256': None, 'updated_at': time.time(), 'lock': threading.Lock(),
+    }
+    with UPLOAD_SESSIONS_LOCK:
+        UPLOAD_SESSIONS[upload_id] = session
+    return jsonify(upload_session_state(session))
+
+@server.route('/upload/chunked/<upload_id>', methods=['GET'])
+def get_chunked_upload_status(upload_id):
+    """Progresso do upload; o cliente usa o campo 'received' para retomar após uma falha."""
+    session = get_upload_session(upload_id)
+    if session is None:
+        return jsonify(error='Upload não encontrado.'), 404
+    return jsonify(upload_session_state(session))
+
+@server.route('/upload/chunked/<upload_id>', methods=['PUT'])
+def receive_chunked_upload(upload_id):
+    session = get_upload_session(upload_id)
+    if session is None:
+        return jsonify(error='Upload não encontrado.'), 404
+    with session['lock']:
+        # O bloco só é aceito na posição exata em que o servidor parou
+        if session['complete'] or request.args.get('offset', type=int) != session['received']:
+            return jsonify(upload_session_state(session)), 409
+        with open(session['path'], 'ab') as spool_file:
+            while True:
+                block = request.stream.read(UPLOAD_STREAM_BUFFER_BYTES)
+                if not block:
+                    break
+                if session['received'] + len(block) > session['size']:
+                    return jsonify(error='O bloco excede o tamanho declarado do arquivo.', **upload_session_state(session)), 413
+                spool_file.write(block)
+                session['received'] += len(block)
+        session['updated_at'] = time.time()
+        return jsonify(upload_session_state(session))
+
+@server.route('/upload/chunked/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    session = get_upload_session(upload_id)
+    if session is None:
+        return jsonify(error='Upload não encontrado.'), 404
+    with session['lock']:
+        if session['received'] != session['size']:
+            return jsonify(error='O upload ainda não foi concluído.', **upload_session_state(session)), 409
+        if not session['complete']:
+            digest = hashlib.sha256()
+            with open(session['path'], 'rb') as spool_file:
+                for block in iter(lambda: spool_file.read(UPLOAD_STREAM_BUFFER_BYTES), b''):
+                    digest.update(block)
+            session['sha256'] = digest.hexdigest()
+            session['complete'] = True
+            session['updated_at'] = time.time()
+        return jsonify(upload_session_state(session))
+
+@server.route('/upload/chunked/<upload_id>', methods=['DELETE'])
+def cancel_chunked_upload(upload_id):
+    discard_upload_session(upload_id)
+    return jsonify(upload_id=upload_id, cancelled=True)
+
+# --- API REST (SOMENTE LEITURA) ---
+# Rankings, eventos por motorista e séries diárias dos datasets já pontuados no cache, para outros sistemas não
+# precisarem raspar o dashboard. O ETag vem do dataset (hash do arquivo + hash da configuração) e do recurso pedido:
+# um cliente que repete a consulta com If-None-Match recebe 304 sem que nada seja serializado de novo.
+API_PREFIX = '/api/v1'
+API_DEFAULT_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+API_GZIP_MIN_BYTES = 1024
+API_RANKINGS = ('motorista', 'veiculo', 'categoria_motorista', 'categoria_veiculo')
+
+def find_api_dataset(dataset_id):
+    """(identificador, dataset) do cache; 'latest' é o dataset pontuado usado mais recentemente."""
+    if dataset_id == 'latest':
+        scored = [(key, entry) for key, entry in DATASET_CACHE.items() if 'violations' in entry]
+        return scored[-1] if scored else (None, None)
+    entry = DATASET_CACHE.get(dataset_id)
+    if entry is None or 'violations' not in entry:
+        return None, None
+    return dataset_id, entry
+
+def api_etag(dataset_id):
+    """Hash do dataset resolvido (o mesmo para 'latest' e para o identificador explícito) e do recurso pedido."""
+    view_args = sorted((key, value) for key, value in request.view_args.items() if key != 'dataset_id')
+    resource = json.dumps([request.endpoint, view_args, sorted(request.args.items(multi=True))], ensure_ascii=False)
+    return hashlib.sha256(f"{dataset_id}|{resource}".encode('utf-8')).hexdigest()[:32]
+
+def api_response(body, etag):
+    """Resposta JSON com ETag (fraco, pois o corpo pode ir comprimido) e gzip quando o cliente aceita."""
+    response = Response(body.encode('utf-8'), mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    if len(response.data) >= API_GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(response.data, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def api_not_modified(etag):
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    return response
+
+def api_records_body(meta, df):
+    """JSON com os metadados e os registros do DataFrame em 'items', serializados direto pelo pandas."""
+    items = df.to_json(orient='records', date_format='iso', force_ascii=False)
+    return json.dumps(meta, ensure_ascii=False)[:-1] + f', "items": {items}}}'
+
+def serve_dataset_resource(dataset_id, build_body):
+    """Resolve o dataset, responde 304 se o cliente já tem a versão atual e, senão, monta o corpo com build_body(id, dataset)."""
+    dataset_id, dataset = find_api_dataset(dataset_id)
+    if dataset is None:
+        return jsonify(error='Dataset não encontrado (expirado do cache ou nunca carregado).'), 404
+    etag = api_etag(dataset_id)
+    not_modified = api_not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    body = build_body(dataset_id, dataset)
+    if isinstance(body, tuple):
+        return body
+    return api_response(body, etag)
+
+@server.route(f'{API_PREFIX}/datasets')
+def api_list_datasets():
+    datasets = [
+        {'dataset_id': key, 'content_hash': key.split(':')[0], 'config_hash': key.split(':')[1], 'rows': len(entry['violations'])}
+        for key, entry in reversed(DATASET_CACHE.items()) if 'violations' in entry
+    ]
+    return jsonify(datasets=datasets)
+
+@server.route(f'{API_PREFIX}/datasets/<dataset_id>/rankings/<kind>')
+def api_rankings(dataset_id, kind):
+    if kind not in API_RANKINGS:
+        return jsonify(error=f"Ranking desconhecido. Use um de: {', '.join(API_RANKINGS)}."), 404
+    return serve_dataset_resource(dataset_id, lambda resolved_id, dataset: api_records_body({'dataset_id': resolved_id, 'ranking': kind}, dataset['rankings'][kind]))
+
+@server.route(f'{API_PREFIX}/datasets/<dataset_id>/drivers/<path:driver>/events')
+def api_driver_events(dataset_id, driver):
+    page = max(request.args.get('page', 0, type=int), 0)
+    page_size = min(max(request.args.get('page_size', API_DEFAULT_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+
+    def build_body(resolved_id, dataset):
+        if driver not in dataset['row_index']['motorista']:
+            return jsonify(error='Motorista não encontrado neste dataset.'), 404
+        driver_df = get_driver_violations(dataset, driver)
+        meta = {'dataset_id': resolved_id, 'driver': driver, 'page': page, 'page_size': page_size, 'total': len(driver_df)}
+        return api_records_body(meta, driver_df.iloc[page * page_size:(page + 1) * page_size])
+    return serve_dataset_resource(dataset_id, build_body)
+
+@server.route(f'{API_PREFIX}/datasets/<dataset_id>/daily-scores')
+def api_daily_scores(dataset_id):
+    """Pontuação e quantidade de eventos por dia, da frota inteira ou de um motorista (?driver=)."""
+    driver = request.args.get('driver')
+
+    def build_body(resolved_id, dataset):
+        if driver is not None and driver not in dataset['row_index']['motorista']:
+            return jsonify(error='Motorista não encontrado neste dataset.'), 404
+        df = get_driver_violations(dataset, driver) if driver is not None else dataset['violations']
+        grouped = df.groupby(df['data_evento'].dt.normalize())['score_final']
+        daily = pd.DataFrame({'pontuacao': grouped.sum(), 'eventos': grouped.size()}).rename_axis('dia').reset_index()
+        daily['dia'] = daily['dia'].dt.strftime('%Y-%m-%d')
+        return api_records_body({'dataset_id': resolved_id, 'driver': driver}, daily)
+    return serve_dataset_resource(dataset_id, build_body)
+
 # --- ESTILIZAÇÃO ---
 colors = {'background': '#111827', 'card_bg': '#1F2937', 'text': '#E5E7EB', 'text_light': '#9CA3AF', 'border': '#374151', 'accent_blue': '#3B82F6', 'accent_red': '#EF4444', 'accent_yellow': '#F59E0B', 'accent_purple': '#8B5CF6', 'accent_orange': '#FB923C', 'accent_green': '#10B981'}
 kpi_card_style = {'backgroundColor': colors['card_bg'], 'padding': '20px', 'border': f"1px solid {colors['border']}", 'borderRadius': '8px', 'textAlign': 'center'}
+list_pager_button_style = {'backgroundColor': colors['border'], 'color': colors['text'], 'border': 'none', 'padding': '6px 14px', 'borderRadius': '5px', 'cursor': 'pointer'}
 
 # Estilo melhorado para upload
 upload_style = {
@@ -410,10 +597,9 @@ responsive_css = """
 """
 
 # --- FUNÇÕES DE LAYOUT ---
-def get_documentation_for_violation(viol_type_key):
-    """Retorna a documentação completa para cada violação."""
-    docs = {
-        "Velocidade_Excessiva_Rodovia": """
+# Textos fixos do editor de parâmetros: montados uma vez na importação, não a cada chamada
+VIOLATION_DOCUMENTATION = {
+    "Velocidade_Excessiva_Rodovia": """
         **🏛️ Rodovia (Limite: 90 km/h)**
         
         **📋 Gatilho do Evento:**
@@ -435,7 +621,7 @@ def get_documentation_for_violation(viol_type_key):
         - **duration_factor**: Multiplicador por incremento de duração
         """,
         
-        "Velocidade_Excessiva_Serra": """
+    "Velocidade_Excessiva_Serra": """
         **⛰️ Serra (Limite: 40 km/h)**
         
         **📋 Gatilho do Evento:**
@@ -457,7 +643,7 @@ def get_documentation_for_violation(viol_type_key):
         - **duration_factor**: Multiplicador por incremento de duração
         """,
         
-        "Velocidade_Excessiva_Patio": """
+    "Velocidade_Excessiva_Patio": """
         **🏢 Pátio (Limite: 21 km/h)**
         
         **📋 Gatilho do Evento:**
@@ -476,7 +662,7 @@ def get_documentation_for_violation(viol_type_key):
         - **duration_factor**: Multiplicador por incremento de duração
         """,
         
-        "Marcha_lenta": """
+    "Marcha_lenta": """
         **🛑 Marcha Lenta**
         
         **📋 Gatilho do Evento:**
@@ -494,7 +680,7 @@ def get_documentation_for_violation(viol_type_key):
         - **duration_factor**: Multiplicador por incremento de duração
         """,
         
-        "Freada_Brusca": """
+    "Freada_Brusca": """
         **🛑 Freada Brusca**
         
         **📋 Gatilho do Evento:**
@@ -508,7 +694,7 @@ def get_documentation_for_violation(viol_type_key):
         - **base_weight**: Pontuação inicial por violação (único parâmetro)
         """,
         
-        "RPM_Excessiva": """
+    "RPM_Excessiva": """
         **⚡ RPM Excessiva**
         
         **📋 Gatilho do Evento:**
@@ -524,7 +710,7 @@ def get_documentation_for_violation(viol_type_key):
         - **duration_factor**: Multiplicador por incremento de duração
         """,
         
-        "Faixa_Verde": """
+    "Faixa_Verde": """
         **🟢 Faixa Verde**
         
         **📋 Gatilho do Evento:**
@@ -540,7 +726,7 @@ def get_documentation_for_violation(viol_type_key):
         - **duration_factor**: Multiplicador por incremento de duração
         """,
         
-        "Freio_Motor": """
+    "Freio_Motor": """
         **🔧 Freio Motor**
         
         **📋 Gatilho do Evento:**
@@ -555,9 +741,22 @@ def get_documentation_for_violation(viol_type_key):
         - **duration_increment**: Intervalo de tempo para incremento (segundos)
         - **duration_factor**: Multiplicador por incremento de duração
         """
-    }
-    
-    return dcc.Markdown(docs.get(viol_type_key, "Sem documentação disponível."), 
+}
+
+PARAMETER_DESCRIPTIONS = {
+    'base_weight': 'Pontuação inicial por violação',
+    'speed_increment': 'Intervalo de velocidade para incremento (km/h)',
+    'speed_factor': 'Multiplicador por incremento de velocidade',
+    'speed_threshold_high': 'Velocidade para incremento adicional (km/h)',
+    'speed_factor_high': 'Multiplicador adicional para velocidades altas',
+    'duration_increment': 'Intervalo de tempo para incremento (segundos)',
+    'duration_factor': 'Multiplicador por incremento de duração',
+    'min_duration_filter': 'Duração mínima para considerar violação (segundos)'
+}
+
+def get_documentation_for_violation(viol_type_key):
+    """Retorna a documentação completa para cada violação."""
+    return dcc.Markdown(VIOLATION_DOCUMENTATION.get(viol_type_key, "Sem documentação disponível."), 
                        dangerously_allow_html=True, 
                        style={'backgroundColor': colors['background'], 'padding': '15px', 'borderRadius': '5px', 'border': f"1px solid {colors['border']}"})
 
@@ -579,7 +778,7 @@ def create_parameter_editor():
                     html.Label(f"{key}:", style={'marginRight': '10px', 'fontWeight': 'bold', 'color': colors['accent_yellow']}),
                     html.Span(get_parameter_description(key), style={'fontSize': '0.8em', 'color': colors['text_light'], 'fontStyle': 'italic'})
                 ], style={'display': 'flex', 'flexDirection': 'column', 'marginBottom': '5px'}),
-                dcc.Input(id={'type': 'gravity-input', 'index': f'{viol_type}-{key}'}, type='number', value=value, 
+                dcc.Input(id={'type': 'gravity-input', 'index': f'{viol_type}-{key}'}, type='number', value=value, debounce=True, 
                          style={'width': '100px', 'backgroundColor': '#374151', 'border': 'none', 'padding': '5px', 'borderRadius': '3px'})
             ], style={'display': 'flex', 'justifyContent': 'space-between', 'alignItems': 'center', 'marginBottom': '10px', 'padding': '8px', 'backgroundColor': colors['background'], 'borderRadius': '5px'})
             for key, value in params.items()
@@ -602,7 +801,7 @@ def create_parameter_editor():
                     html.Label(f"{key}:", style={'marginRight': '10px', 'fontWeight': 'bold', 'color': colors['accent_yellow']}),
                     html.Span(get_parameter_description(key), style={'fontSize': '0.8em', 'color': colors['text_light'], 'fontStyle': 'italic'})
                 ], style={'display': 'flex', 'flexDirection': 'column', 'marginBottom': '5px'}),
-                dcc.Input(id={'type': 'gravity-input', 'index': f'{viol_type}-{key}'}, type='number', value=value, 
+                dcc.Input(id={'type': 'gravity-input', 'index': f'{viol_type}-{key}'}, type='number', value=value, debounce=True, 
                          style={'width': '100px', 'backgroundColor': '#374151', 'border': 'none', 'padding': '5px', 'borderRadius': '3px'})
             ], style={'display': 'flex', 'justifyContent': 'space-between', 'alignItems': 'center', 'marginBottom': '10px', 'padding': '8px', 'backgroundColor': colors['background'], 'borderRadius': '5px'})
             for key, value in params.items()
@@ -620,21 +819,11 @@ def create_parameter_editor():
 
 def get_parameter_description(param_name):
     """Retorna a descrição do impacto de cada parâmetro."""
-    descriptions = {
-        'base_weight': 'Pontuação inicial por violação',
-        'speed_increment': 'Intervalo de velocidade para incremento (km/h)',
-        'speed_factor': 'Multiplicador por incremento de velocidade',
-        'speed_threshold_high': 'Velocidade para incremento adicional (km/h)',
-        'speed_factor_high': 'Multiplicador adicional para velocidades altas',
-        'duration_increment': 'Intervalo de tempo para incremento (segundos)',
-        'duration_factor': 'Multiplicador por incremento de duração',
-        'min_duration_filter': 'Duração mínima para considerar violação (segundos)'
-    }
-    return descriptions.get(param_name, 'Parâmetro de configuração')
+    return PARAMETER_DESCRIPTIONS.get(param_name, 'Parâmetro de configuração')
 
 app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': colors['text'], 'fontFamily': 'sans-serif'}, children=[
     html.Div(style={'maxWidth': '1280px', 'margin': '0 auto', 'padding': '20px'}, children=[
-        dcc.Store(id='store-violations-df'), dcc.Store(id='store-ranking-df'),
+        dcc.Store(id='store-violations-df'), dcc.Store(id='store-ranking-df'), dcc.Store(id='store-spooled-upload'),
         html.H1('Dashboard de Violações', style={'textAlign': 'center', 'marginBottom': '10px', 'fontSize': '3em'}),
         html.P('Análise de Telemetria e Desempenho dos Motoristas', style={'textAlign': 'center', 'marginBottom': '20px', 'color': colors['text_light']}),
         
@@ -653,10 +842,11 @@ app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': c
                 html.Div(style={'position': 'relative', 'marginBottom': '20px'}, children=[
                     dcc.Upload(
                         id='upload-data', 
+                        multiple=True,
                         children=html.Div([
                             html.Div(style={'fontSize': '3em', 'marginBottom': '15px', 'color': colors['accent_blue']}, children='📁'),
                             html.Div([
-                                html.Span('Arraste e solte seu arquivo CSV aqui', style={'fontSize': '18px', 'fontWeight': '600', 'color': colors['text']}),
+                                html.Span('Arraste e solte seus arquivos CSV aqui', style={'fontSize': '18px', 'fontWeight': '600', 'color': colors['text']}),
                                 html.Br(),
                                 html.Span('ou clique para selecionar', style={'fontSize': '14px', 'color': colors['text_light']})
                             ]),
@@ -675,6 +865,17 @@ app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': c
                             html.Li('Coordenadas em formato decimal (ex: -27.123456, -48.123456)', style={'color': colors['text_light'], 'fontSize': '14px', 'marginBottom': '5px'}),
                             html.Li('Duração em formato HH:MM:SS', style={'color': colors['text_light'], 'fontSize': '14px'})
                         ], style={'margin': '0', 'paddingLeft': '20px'})
+                    ]),
+
+                    # Upload em partes para arquivos grandes (gravado em disco no servidor)
+                    html.Div(style={'marginTop': '15px', 'padding': '15px', 'backgroundColor': colors['background'], 'borderRadius': '8px', 'border': f"1px solid {colors['border']}"}, children=[
+                        html.H4('📦 Arquivos grandes (acima de 100 MB):', style={'color': colors['accent_yellow'], 'marginBottom': '10px', 'fontSize': '16px'}),
+                        html.P('O arquivo é enviado em partes, com progresso e possibilidade de cancelamento.', style={'color': colors['text_light'], 'fontSize': '14px'}),
+                        html.Div(style={'display': 'flex', 'gap': '10px', 'alignItems': 'center', 'flexWrap': 'wrap'}, children=[
+                            html.Button('Selecionar arquivo grande', id='large-upload-select', n_clicks=0, style={'backgroundColor': colors['accent_blue'], 'color': 'white', 'border': 'none', 'padding': '8px 16px', 'borderRadius': '5px', 'cursor': 'pointer'}),
+                            html.Button('Cancelar envio', id='large-upload-cancel', n_clicks=0, style={'backgroundColor': colors['accent_red'], 'color': 'white', 'border': 'none', 'padding': '8px 16px', 'borderRadius': '5px', 'cursor': 'pointer'}),
+                        ]),
+                        html.Div(id='large-upload-progress', style={'marginTop': '10px', 'color': colors['text_light'], 'fontSize': '14px'})
                     ])
                 ]),
                 
@@ -701,6 +902,7 @@ app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': c
             html.H2('Ajuste Fino dos Parâmetros de Gravidade', style={'textAlign': 'center', 'marginBottom': '20px'}),
             html.Div([
                 html.Button('Resetar para o Padrão', id='reset-gravity-button', n_clicks=0, style={'marginBottom': '20px', 'backgroundColor': colors['accent_yellow'], 'color': 'black', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'fontWeight': 'bold'}),
+                html.Div(id='rescore-status'),
             ], style={'textAlign': 'center'}),
             create_parameter_editor(),
             ], style={'backgroundColor': colors['card_bg'], 'padding': '20px', 'borderRadius': '8px'}),
@@ -722,6 +924,16 @@ def reset_gravity_parameters(n_clicks):
         raise dash.exceptions.PreventUpdate
     return [p_val[p_key] for v_key, p_val in DEFAULT_GRAVITY_CONFIG.items() for p_key in p_val.keys()]
 
+def build_gravity_config(gravity_ids, gravity_values):
+    """Monta o dicionário de configuração de gravidade a partir dos inputs do editor de parâmetros."""
+    gravity_config = {}
+    for i, comp_id in enumerate(gravity_ids):
+        viol_type, param_name = comp_id['index'].split('-')
+        if viol_type not in gravity_config:
+            gravity_config[viol_type] = {}
+        gravity_config[viol_type][param_name] = gravity_values[i]
+    return gravity_config
+
 # Callback para processar o upload e construir a UI principal
 @app.callback(
     [Output('main-dashboard-content', 'children'), Output('main-dashboard-content', 'style'), Output('initial-setup-container', 'style'), Output('store-violations-df', 'data'), Output('store-ranking-df', 'data'), Output('upload-error-output', 'children'), Output('csv-processing-status', 'children')],
@@ -738,27 +950,85 @@ def update_on_upload(contents, filename, gravity_ids, gravity_values):
         html.P('Aguarde enquanto analisamos os dados...', style={'color': colors['text_light']})
     ])
     
-    gravity_config = {}
-    for i, comp_id in enumerate(gravity_ids):
-        viol_type, param_name = comp_id['index'].split('-')
-        if viol_type not in gravity_config:
-            gravity_config[viol_type] = {}
-        gravity_config[viol_type][param_name] = gravity_values[i]
-        
-    violations_df, ranking_df, error_div = process_uploaded_data(contents, filename, gravity_config)
-    
-    if error_div is not None: 
-        return None, {'display': 'none'}, {'display': 'block'}, None, None, error_div, ""
+    gravity_config = build_gravity_config(gravity_ids, gravity_values)
+
+    invalid_files = [name for name in filename if 'csv' not in name]
+    if invalid_files:
+        return None, {'display': 'none'}, {'display': 'block'}, None, None, html.Div([f"Todos os arquivos precisam ser .CSV: {', '.join(invalid_files)}"]), ""
+
+    raw_files = [decode_upload_contents(file_contents) for file_contents in contents]
+    file_hashes = [hashlib.sha256(raw_bytes).hexdigest() for raw_bytes in raw_files]
+    return ingest_dataset(hash_uploaded_files(file_hashes), list(zip(filename, raw_files, file_hashes)), gravity_config)
+
+# Callback para processar um arquivo grande enviado em partes (já gravado em disco)
+@app.callback(
+    [Output('main-dashboard-content', 'children', allow_duplicate=True), Output('main-dashboard-content', 'style', allow_duplicate=True), Output('initial-setup-container', 'style', allow_duplicate=True), Output('store-violations-df', 'data', allow_duplicate=True), Output('store-ranking-df', 'data', allow_duplicate=True), Output('upload-error-output', 'children', allow_duplicate=True), Output('csv-processing-status', 'children', allow_duplicate=True)],
+    [Input('store-spooled-upload', 'data')],
+    [State({'type': 'gravity-input', 'index': ALL}, 'id'), State({'type': 'gravity-input', 'index': ALL}, 'value')],
+    prevent_initial_call=True
+)
+def update_on_spooled_upload(spooled_upload, gravity_ids, gravity_values):
+    session = get_upload_session(spooled_upload['upload_id']) if spooled_upload else None
+    if session is None or not session['complete']:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, html.Div(['Upload não encontrado ou incompleto. Envie o arquivo novamente.']), ""
+
+    gravity_config = build_gravity_config(gravity_ids, gravity_values)
+    try:
+        return ingest_dataset(session['sha256'], [(session['filename'], session['path'], session['sha256'])], gravity_config)
+    finally:
+        # O dataset normalizado fica no cache; o arquivo temporário não é mais necessário
+        discard_upload_session(session['upload_id'])
+
+def ingest_dataset(content_hash, files, gravity_config):
+    """Lê (se ainda não estiver em cache), pontua e monta o dashboard para um upload identificado pelo hash."""
+    try:
+        base_df = get_base_dataset(content_hash)
+        if base_df is None:
+            # Os arquivos já chegam pontuados do pool; a memória antes e depois do esquema compacto vai para /metrics
+            violations_df = compact_violations(ingest_violation_files(files, gravity_config))
+            store_base_dataset(content_hash, violations_df)
+            dataset_handle = store_dataset(content_hash, gravity_config, violations_df, build_rankings(violations_df))
+        else:
+            dataset_handle = build_scored_dataset(content_hash, gravity_config, base_df=base_df)
+    except ValueError as e:
+        return None, {'display': 'none'}, {'display': 'block'}, None, None, html.Div([str(e)]), ""
+    except Exception as e:
+        print(f"Erro no processamento: {e}")
+        return None, {'display': 'none'}, {'display': 'block'}, None, None, html.Div([f'Ocorreu um erro ao processar o arquivo: {e}']), ""
+
+    dataset = get_cached_dataset(dataset_handle)
+    violations_df, ranking_df = dataset['violations'], dataset['ranking']
     
     dashboard_layout = build_dashboard_layout(ranking_df)
     
     # Status de conclusão
     completion_status = html.Div([
         html.H4('✅ Processamento concluído!', style={'color': '#10B981'}),
-        html.P(f'Arquivo processado com sucesso: {len(violations_df)} violações encontradas', style={'color': colors['text_light']})
+        html.P(f'{len(files)} arquivo(s) processado(s) com sucesso: {len(violations_df)} violações encontradas', style={'color': colors['text_light']}),
     ])
     
-    return dashboard_layout, {'display': 'block'}, {'display': 'none'}, violations_df.to_json(date_format='iso',orient='split'), ranking_df.to_json(orient='split'), None, completion_status
+    return dashboard_layout, {'display': 'block'}, {'display': 'none'}, dataset_handle, dataset_handle, None, completion_status
+
+# Callback para recalcular a pontuação quando um parâmetro de gravidade muda (sem novo upload)
+@app.callback(
+    [Output('store-violations-df', 'data', allow_duplicate=True), Output('store-ranking-df', 'data', allow_duplicate=True), Output('rescore-status', 'children')],
+    [Input({'type': 'gravity-input', 'index': ALL}, 'value')],
+    [State({'type': 'gravity-input', 'index': ALL}, 'id'), State('store-violations-df', 'data')],
+    prevent_initial_call=True
+)
+def rescore_on_parameter_change(gravity_values, gravity_ids, dataset_handle):
+    if not dataset_handle or any(value is None for value in gravity_values):
+        raise dash.exceptions.PreventUpdate
+
+    start = time.perf_counter()
+    gravity_config = build_gravity_config(gravity_ids, gravity_values)
+    new_handle = build_scored_dataset(dataset_handle['content_hash'], gravity_config, previous_handle=dataset_handle)
+    if new_handle is None:
+        return dash.no_update, dash.no_update, html.P('Os dados do último upload expiraram. Faça o upload do arquivo novamente para recalcular.', style={'color': colors['accent_red']})
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    status = html.P(f'✅ Pontuação recalculada com os novos parâmetros em {elapsed_ms:.0f} ms.', style={'color': colors['accent_green']})
+    return new_handle, new_handle, status
 
 # Callback para o botão "Analisar Outro Arquivo"
 @app.callback(
@@ -873,6 +1143,45 @@ def build_dashboard_layout(ranking_df):
                             )
                         )
                     ]),
+                    html.Div(className='card-container', style={'backgroundColor': colors['card_bg'], 'padding': '20px', 'borderRadius': '8px', 'marginBottom': '20px'}, children=[
+                        html.H2('Ranking por Categoria (Econômica x Segurança)', style={'marginBottom': '10px'}),
+                        dcc.Loading(
+                            id="loading-general-category-table",
+                            type="default",
+                            className='dash-loading',
+                            children=html.Div(
+                                className='table-container',
+                                children=dash_table.DataTable(
+                                    id='ranking-table-categoria', 
+                                    style_cell={'backgroundColor': colors['card_bg'], 'color': colors['text'], 'border': f"1px solid {colors['border']}", 'padding': '10px', 'textAlign': 'left'}, 
+                                    style_header={'backgroundColor': colors['border'], 'fontWeight': 'bold'}, 
+                                    style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': '#374151'}], 
+                                    page_size=10,
+                                    filter_action='native',
+                                    sort_action='native',
+                                    sort_mode='multi'
+                                )
+                            )
+                        )
+                    ]),
+                    html.Div(className='card-container', style={'backgroundColor': colors['card_bg'], 'padding': '20px', 'borderRadius': '8px', 'marginBottom': '20px'}, children=[
+                        html.H2('Relatórios de IA da Frota', style={'marginBottom': '10px'}),
+                        html.P('Gera a análise do Instrutor Virtual para todos os motoristas do ranking (ou apenas os de maior pontuação) em segundo plano, e exporta os relatórios HTML da frota em um ZIP.', style={'color': colors['text_light']}),
+                        html.Div(style={'display': 'flex', 'gap': '10px', 'alignItems': 'center', 'flexWrap': 'wrap'}, children=[
+                            dcc.Input(id='fleet-report-top-n', type='number', min=1, step=1, placeholder='Top N (vazio = todos)', style={'width': '200px', 'backgroundColor': '#374151', 'color': colors['text'], 'border': 'none', 'padding': '10px', 'borderRadius': '5px'}),
+                            html.Button('Gerar Relatórios da Frota', id='fleet-report-button', n_clicks=0, style={'backgroundColor': colors['accent_purple'], 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer'}),
+                            html.Button('Cancelar', id='fleet-report-cancel', n_clicks=0, style={'backgroundColor': colors['border'], 'color': colors['text'], 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer'}),
+                            html.Button('Baixar Relatórios', id='fleet-report-download-btn', n_clicks=0, style={'backgroundColor': colors['accent_blue'], 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer'}),
+                            html.Button('Exportar HTML (ZIP)', id='fleet-export-button', n_clicks=0, style={'backgroundColor': colors['accent_green'], 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer'}),
+                        ]),
+                        html.Div(id='fleet-report-status', style={'marginTop': '10px', 'color': colors['text_light']}),
+                        html.Div(id='fleet-export-status', style={'marginTop': '5px', 'color': colors['text_light']}),
+                        dcc.Store(id='fleet-report-job'),
+                        dcc.Interval(id='fleet-report-poll', interval=2000, disabled=True),
+                        dcc.Download(id='fleet-report-download'),
+                        dcc.Store(id='fleet-export-job'),
+                        dcc.Interval(id='fleet-export-poll', interval=1000, disabled=True),
+                    ]),
                     html.Div(className='card-container', style={'backgroundColor': colors['card_bg'], 'padding': '20px', 'borderRadius': '8px', 'marginTop': '20px'}, children=[
                         html.H2('Todas as Violações', style={'marginBottom': '10px'}),
                         dcc.Loading(
@@ -887,11 +1196,16 @@ def build_dashboard_layout(ranking_df):
                                     style_cell={'backgroundColor': colors['card_bg'], 'color': colors['text'], 'border': f"1px solid {colors['border']}", 'padding': '10px', 'textAlign': 'left', 'minWidth': '120px', 'maxWidth': '200px', 'overflow': 'hidden', 'textOverflow': 'ellipsis'}, 
                                     style_header={'backgroundColor': colors['border'], 'fontWeight': 'bold'}, 
                                     style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': '#374151'}], 
+                                    page_current=0,
                                     page_size=20,
-                                    filter_action='native',
-                                    sort_action='native',
+                                    page_action='custom',
+                                    filter_action='custom',
+                                    filter_query='',
+                                    sort_action='custom',
                                     sort_mode='multi',
+                                    sort_by=[],
                                     columns=[
+                                        {'name': 'Arquivo', 'id': 'arquivo_origem'},
                                         {'name': 'Linha CSV', 'id': 'linha_csv'},
                                         {'name': 'Data/Hora', 'id': 'data_evento'},
                                         {'name': 'Motorista', 'id': 'motorista'},
@@ -910,6 +1224,58 @@ def build_dashboard_layout(ranking_df):
                     ]),
                 ])
             ]),
+            dcc.Tab(label='Ranking por Veículo', value='tab-veiculo', style=tab_style, selected_style=tab_selected_style, className='dash-tab', children=[
+                html.Div(className='dash-container', style={'padding': '20px 0'}, children=[
+                    dcc.Loading(
+                        id="loading-veiculo-kpis",
+                        type="default",
+                        className='dash-loading',
+                        children=html.Div(id='kpi-container-veiculo', className='kpi-row')
+                    ),
+                    html.Div(className='card-container', style={'backgroundColor': colors['card_bg'], 'padding': '20px', 'borderRadius': '8px', 'marginBottom': '20px'}, children=[
+                        html.H2('Ranking de Risco por Veículo', style={'marginBottom': '10px'}),
+                        dcc.Loading(
+                            id="loading-veiculo-table",
+                            type="default",
+                            className='dash-loading',
+                            children=html.Div(
+                                className='table-container',
+                                children=dash_table.DataTable(
+                                    id='ranking-table-veiculo', 
+                                    style_cell={'backgroundColor': colors['card_bg'], 'color': colors['text'], 'border': f"1px solid {colors['border']}", 'padding': '10px', 'textAlign': 'left'}, 
+                                    style_header={'backgroundColor': colors['border'], 'fontWeight': 'bold'}, 
+                                    style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': '#374151'}], 
+                                    page_size=10,
+                                    filter_action='native',
+                                    sort_action='native',
+                                    sort_mode='multi'
+                                )
+                            )
+                        )
+                    ]),
+                    html.Div(className='card-container', style={'backgroundColor': colors['card_bg'], 'padding': '20px', 'borderRadius': '8px', 'marginBottom': '20px'}, children=[
+                        html.H2('Ranking por Categoria (Econômica x Segurança)', style={'marginBottom': '10px'}),
+                        dcc.Loading(
+                            id="loading-veiculo-category-table",
+                            type="default",
+                            className='dash-loading',
+                            children=html.Div(
+                                className='table-container',
+                                children=dash_table.DataTable(
+                                    id='ranking-table-categoria-veiculo', 
+                                    style_cell={'backgroundColor': colors['card_bg'], 'color': colors['text'], 'border': f"1px solid {colors['border']}", 'padding': '10px', 'textAlign': 'left'}, 
+                                    style_header={'backgroundColor': colors['border'], 'fontWeight': 'bold'}, 
+                                    style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': '#374151'}], 
+                                    page_size=10,
+                                    filter_action='native',
+                                    sort_action='native',
+                                    sort_mode='multi'
+                                )
+                            )
+                        )
+                    ]),
+                ])
+            ]),
             dcc.Tab(label='Análise Individual por Motorista', value='tab-individual', style=tab_style, selected_style=tab_selected_style, className='dash-tab', children=[
                 html.Div(
                     style={'backgroundColor': colors['background'], 'minHeight': '100vh', 'padding': '0'},
@@ -926,20 +1292,45 @@ def build_dashboard_layout(ranking_df):
     ])
 
 # Callback para a Visão Geral da Frota
+# --- MEMOIZAÇÃO DE FIGURAS E KPIs ---
+# Figuras e blocos de KPI já montados ficam em um cache LRU, pela chave (dataset, motorista, filtro); o dataset_id
+# já combina o hash do upload com o da configuração de gravidade. O valor guardado é a árvore JSON da resposta
+# (figuras e componentes já convertidos), então um acerto não refaz agrupamentos, gráficos nem a conversão.
+FIGURE_CACHE_MAX_ENTRIES = int(os.getenv('FIGURE_CACHE_MAX_ENTRIES', '256'))
+FIGURE_CACHE_MAX_MB = int(os.getenv('FIGURE_CACHE_MAX_MB', '64'))
+FIGURE_CACHE = DatasetCache(FIGURE_CACHE_MAX_ENTRIES, FIGURE_CACHE_MAX_MB * 1024 * 1024)
+FIGURE_CACHE_LOOKUPS = {'hits': 0, 'misses': 0}
+FIGURE_CACHE_LOOKUPS_LOCK = threading.Lock()
+
+def figure_cache_key(kind, dataset_handle, *parts):
+    return json.dumps([kind, dataset_handle['dataset_id'], *parts], ensure_ascii=False)
+
+def get_memoized_output(key, build):
+    """Saída do callback guardada no FIGURE_CACHE sob key; build() só roda na primeira vez (ou após o despejo)."""
+    cached = FIGURE_CACHE.get(key)
+    with FIGURE_CACHE_LOOKUPS_LOCK:
+        FIGURE_CACHE_LOOKUPS['hits' if cached is not None else 'misses'] += 1
+    if cached is not None:
+        return cached
+    serialized = to_json_plotly(build())
+    output = json.loads(serialized)
+    FIGURE_CACHE.put(key, output, len(serialized))
+    return output
+
 @app.callback(
-    [Output('kpi-container-general', 'children'), Output('ranking-table', 'columns'), Output('ranking-table', 'data'), Output('violations-chart-general', 'figure'), Output('risk-concentration-chart', 'figure'), Output('daily-risk-timeline-general', 'figure'), Output('violations-quantity-chart', 'figure'), Output('violations-table', 'columns'), Output('violations-table', 'data')],
+    [Output('kpi-container-general', 'children'), Output('ranking-table', 'columns'), Output('ranking-table', 'data'), Output('violations-chart-general', 'figure'), Output('risk-concentration-chart', 'figure'), Output('daily-risk-timeline-general', 'figure'), Output('violations-quantity-chart', 'figure')],
     [Input('store-violations-df', 'data'), Input('store-ranking-df', 'data')]
 )
-def update_general_dashboard(violations_json, ranking_json):
-    if violations_json is None or ranking_json is None: 
+def update_general_dashboard(violations_handle, ranking_handle):
+    dataset = get_cached_dataset(violations_handle)
+    if dataset is None or ranking_handle is None: 
         raise dash.exceptions.PreventUpdate
-    
-    # Simular um pequeno delay para mostrar o loading
-    time.sleep(0.1)
-    
-    violations_df = pd.read_json(violations_json, orient='split')
-    violations_df['data_evento'] = pd.to_datetime(violations_df['data_evento'])
-    ranking_df = pd.read_json(ranking_json, orient='split')
+    return get_memoized_output(figure_cache_key('general', violations_handle), lambda: build_general_dashboard(dataset))
+
+def build_general_dashboard(dataset):
+    """KPIs, tabela de ranking e gráficos da Visão Geral da Frota."""
+    violations_df = dataset['violations']
+    ranking_df = dataset['ranking']
     
     kpi_drivers = ranking_df['Motorista'].nunique()
     kpi_violations = len(violations_df)
@@ -1019,7 +1410,7 @@ def update_general_dashboard(violations_json, ranking_json):
     timeline_fig = go.Figure(data=[go.Scatter(x=daily_scores.index, y=daily_scores.values, mode='lines+markers', line=dict(color=colors['accent_blue']))])
     timeline_fig.update_layout(title_text='Evolução do Risco da Frota por Dia', title_x=0.5, plot_bgcolor=colors['card_bg'], paper_bgcolor=colors['card_bg'], font_color=colors['text'], yaxis_gridcolor=colors['border'])
 
-    violation_sums = violations_df.groupby('violacao')['score_final'].sum().sort_values(ascending=False)
+    violation_sums = violations_df.groupby('violacao', observed=True)['score_final'].sum().sort_values(ascending=False)
     bar_fig = go.Figure(data=[go.Bar(x=violation_sums.index, y=violation_sums.values, marker_color=colors['accent_red'])])
     bar_fig.update_layout(title_text='Pontuação de Risco por Tipo de Violação (Frota)', title_x=0.5, plot_bgcolor=colors['card_bg'], paper_bgcolor=colors['card_bg'], font_color=colors['text'], yaxis_gridcolor=colors['border'])
 
@@ -1028,36 +1419,6 @@ def update_general_dashboard(violations_json, ranking_json):
     pie_fig = go.Figure(data=[go.Pie(labels=['Top 5 Motoristas', 'Outros'], values=[top_5_score, others_score], hole=.3, marker_colors=[colors['accent_red'], colors['accent_blue']])])
     pie_fig.update_layout(title_text='Concentração de Risco', title_x=0.5, plot_bgcolor=colors['card_bg'], paper_bgcolor=colors['card_bg'], font_color=colors['text'], legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5))
 
-    # Preparar tabela de violações
-    violations_display_df = violations_df.copy()
-    
-    # Preparar colunas para a tabela de violações
-    violations_columns = [
-        {'name': 'Linha CSV', 'id': 'linha_csv'},
-        {'name': 'Data/Hora', 'id': 'data_evento'},
-        {'name': 'Motorista', 'id': 'motorista'},
-        {'name': 'Veículo', 'id': 'nome_do_veículo'},
-        {'name': 'Violação', 'id': 'violacao'},
-        {'name': 'Pontuação', 'id': 'score_final'},
-        {'name': 'Duração', 'id': 'duracao'},
-        {'name': 'Distância', 'id': 'distância'},
-        {'name': 'Velocidade máxima', 'id': 'velocidade_máxima'},
-        {'name': 'RPM máximo', 'id': 'rpm_máximo'},
-        {'name': 'Mapa', 'id': 'mapa_link', 'type': 'text', 'presentation': 'markdown'}
-    ]
-    
-    # Preparar dados para a tabela de violações
-    violations_data = violations_display_df[['linha_csv', 'data_evento', 'motorista', 'nome_do_veículo', 'violacao', 'score_final', 'duracao', 'distância', 'velocidade_máxima', 'rpm_máximo', 'latitude_inicial', 'longitude_inicial', 'latitude_final', 'longitude_final']].copy()
-    violations_data['data_evento'] = violations_data['data_evento'].dt.strftime('%d/%m/%Y %H:%M:%S')
-    # Formata a pontuação para string com vírgula como separador decimal
-    violations_data['score_final'] = violations_data['score_final'].round(2).apply(lambda x: f'{x:.2f}'.replace('.', ','))
-    violations_data['mapa_link'] = violations_data.apply(
-        lambda row: f"[Ver Mapa]({generate_maps_route_link(row['latitude_inicial'], row['longitude_inicial'], row['latitude_final'], row['longitude_final'])})" if pd.notna(row['latitude_inicial']) and pd.notna(row['longitude_inicial']) else "N/A",
-        axis=1
-    )
-    violations_data = violations_data[['linha_csv', 'data_evento', 'motorista', 'nome_do_veículo', 'violacao', 'score_final', 'duracao', 'distância', 'velocidade_máxima', 'rpm_máximo', 'mapa_link']]
-    violations_data = violations_data.to_dict('records')
-
     # Criar gráfico de quantidade de violações por tipo (horizontal)
     violation_counts = violations_df['violacao'].value_counts().sort_values(ascending=True)
     quantity_fig = go.Figure(data=[go.Bar(
@@ -1086,21 +1447,149 @@ def update_general_dashboard(violations_json, ranking_json):
         margin=dict(l=20, r=20, t=60, b=20)
     )
 
-    return kpis, table_cols, table_data, bar_fig, pie_fig, timeline_fig, quantity_fig, violations_columns, violations_data
+    return kpis, table_cols, table_data, bar_fig, pie_fig, timeline_fig, quantity_fig
+
+# --- TABELA DE VIOLAÇÕES PAGINADA NO SERVIDOR ---
+# O navegador recebe só a página visível; filtro e ordenação rodam sobre o dataset em cache e o resultado
+# (posições das linhas) fica guardado, então trocar de página não refaz o filtro nem a ordenação.
+VIOLATIONS_TABLE_COLUMNS = ['arquivo_origem', 'linha_csv', 'data_evento', 'motorista', 'nome_do_veículo', 'violacao', 'score_final', 'duracao', 'distância', 'velocidade_máxima', 'rpm_máximo']
+VIOLATIONS_TABLE_VIEW_CACHE = DatasetCache(32, 256 * 1024 * 1024)
+
+# Operadores da sintaxe de filtro do DataTable, na ordem em que devem ser testados
+FILTER_OPERATORS = [['ge ', '>='], ['le ', '<='], ['lt ', '<'], ['gt ', '>'], ['ne ', '!='], ['eq ', '='], ['contains '], ['datestartswith ']]
+
+def split_filter_part(filter_part):
+    """Separa um trecho do filter_query ("{coluna} operador valor") em coluna, operador e valor."""
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+                value_part = value_part.strip()
+                quote = value_part[:1]
+                if quote and quote == value_part[-1] and quote in ("'", '"', '`'):
+                    value = value_part[1:-1].replace('\\' + quote, quote)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+                return name, operator_type[0].strip(), value
+    return None, None, None
+
+def filter_value_as_text(value):
+    return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+
+def build_filter_positions(violations_df, filter_query):
+    """Posições das linhas que atendem ao filter_query do DataTable (trechos unidos por &&), na ordem do dataset."""
+    positions = np.arange(len(violations_df))
+    # Cada trecho é avaliado apenas sobre as linhas que passaram pelos anteriores
+    for filter_part in (filter_query or '').split(' && '):
+        column, operator, value = split_filter_part(filter_part)
+        if column not in VIOLATIONS_TABLE_COLUMNS:
+            continue
+        series = violations_df[column].take(positions)
+        if column == 'data_evento':
+            if operator in ('contains', 'datestartswith'):
+                text = format_datetimes_br(series)
+                part_mask = text.str.startswith(str(value)) if operator == 'datestartswith' else text.str.contains(str(value), regex=False)
+            else:
+                value = pd.to_datetime(str(value), dayfirst=True, errors='coerce')
+                if pd.isna(value):
+                    continue
+                part_mask = compare_filter_values(series, operator, value)
+        elif operator in ('contains', 'datestartswith') or not pd.api.types.is_numeric_dtype(series):
+            def match_text(text, operator=operator, value=filter_value_as_text(value)):
+                if operator == 'contains':
+                    return text.str.contains(value, case=False, regex=False)
+                if operator == 'datestartswith':
+                    return text.str.startswith(value)
+                return compare_filter_values(text, operator, value)
+            part_mask = match_text_values(series, match_text)
+        else:
+            value = pd.to_numeric(value, errors='coerce')
+            if pd.isna(value):
+                continue
+            part_mask = compare_filter_values(series, operator, value)
+        positions = positions[part_mask.to_numpy(dtype=bool, na_value=False)]
+    return positions
+
+def match_text_values(series, match_text):
+    """Aplica match_text à coluna como texto; em colunas categóricas, uma vez por categoria em vez de uma vez por linha."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return match_text(series.astype(str))
+    category_mask = match_text(pd.Series(series.cat.categories.astype(str))).to_numpy(dtype=bool, na_value=False)
+    codes = series.cat.codes.to_numpy()
+    return pd.Series(np.where(codes >= 0, category_mask[codes], False), index=series.index)
+
+def compare_filter_values(series, operator, value):
+    if operator == 'eq': return series == value
+    if operator == 'ne': return series != value
+    if operator == 'lt': return series < value
+    if operator == 'le': return series <= value
+    if operator == 'gt': return series > value
+    return series >= value
+
+def get_violations_table_view(dataset_handle, violations_df, filter_query, sort_by):
+    """Posições das linhas filtradas e ordenadas, reaproveitadas entre trocas de página."""
+    sort_by = [sort for sort in (sort_by or []) if sort['column_id'] in VIOLATIONS_TABLE_COLUMNS]
+    view_key = json.dumps([dataset_handle['dataset_id'], filter_query or '', sort_by], ensure_ascii=False)
+    positions = VIOLATIONS_TABLE_VIEW_CACHE.get(view_key)
+    if positions is None:
+        positions = build_filter_positions(violations_df, filter_query)
+        if sort_by:
+            columns = [sort['column_id'] for sort in sort_by]
+            subset = violations_df[columns].take(positions)
+            # Colunas de texto com células vazias preenchidas com 0 são ordenadas como texto; as categóricas já têm
+            # as categorias em ordem alfabética e são ordenadas pelos códigos
+            subset = subset.apply(lambda col: col if pd.api.types.is_numeric_dtype(col) or pd.api.types.is_datetime64_any_dtype(col) or isinstance(col.dtype, pd.CategoricalDtype) else col.astype(str))
+            order = subset.reset_index(drop=True).sort_values(columns, ascending=[sort['direction'] == 'asc' for sort in sort_by], kind='stable').index.to_numpy()
+            positions = positions[order]
+        VIOLATIONS_TABLE_VIEW_CACHE.put(view_key, positions, positions.nbytes)
+    return positions
+
+def format_violations_table_page(page_df):
+    """Formata apenas as linhas da página visível (datas, pontuação e link do mapa)."""
+    if page_df.empty:
+        return []
+    page_data = page_df[VIOLATIONS_TABLE_COLUMNS + ['latitude_inicial', 'longitude_inicial', 'latitude_final', 'longitude_final']].copy()
+    page_data['data_evento'] = format_datetimes_br(page_data['data_evento'])
+    # Formata a pontuação para string com vírgula como separador decimal
+    page_data['score_final'] = page_data['score_final'].round(2).apply(lambda x: f'{x:.2f}'.replace('.', ','))
+    page_data['mapa_link'] = page_data.apply(
+        lambda row: f"[Ver Mapa]({generate_maps_route_link(row['latitude_inicial'], row['longitude_inicial'], row['latitude_final'], row['longitude_final'])})" if pd.notna(row['latitude_inicial']) and pd.notna(row['longitude_inicial']) else "N/A",
+        axis=1
+    )
+    return page_data[VIOLATIONS_TABLE_COLUMNS + ['mapa_link']].to_dict('records')
+
+# Callback da tabela "Todas as Violações": paginação, ordenação e filtro no servidor
+@app.callback(
+    [Output('violations-table', 'data'), Output('violations-table', 'page_count')],
+    [Input('store-violations-df', 'data'), Input('violations-table', 'page_current'), Input('violations-table', 'page_size'), Input('violations-table', 'sort_by'), Input('violations-table', 'filter_query')]
+)
+def update_violations_table(violations_handle, page_current, page_size, sort_by, filter_query):
+    dataset = get_cached_dataset(violations_handle)
+    if dataset is None:
+        raise dash.exceptions.PreventUpdate
+
+    violations_df = dataset['violations']
+    positions = get_violations_table_view(violations_handle, violations_df, filter_query, sort_by)
+    page_count = max(1, -(-len(positions) // page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    page_positions = positions[page_current * page_size:(page_current + 1) * page_size]
+    return format_violations_table_page(violations_df.take(page_positions)), page_count
 
 # Callback para a aba de Ranking por Veículo
 @app.callback(
-    [Output('kpi-container-veiculo', 'children'), Output('ranking-table-veiculo', 'columns'), Output('ranking-table-veiculo', 'data')],
-    [Input('store-ranking-veiculo-df', 'data')]
+    [Output('kpi-container-veiculo', 'children'), Output('ranking-table-veiculo', 'columns'), Output('ranking-table-veiculo', 'data'), Output('ranking-table-categoria-veiculo', 'columns'), Output('ranking-table-categoria-veiculo', 'data')],
+    [Input('store-ranking-df', 'data')]
 )
-def update_veiculo_dashboard(ranking_veiculo_json):
-    if ranking_veiculo_json is None: 
+def update_veiculo_dashboard(ranking_handle):
+    dataset = get_cached_dataset(ranking_handle)
+    if dataset is None: 
         raise dash.exceptions.PreventUpdate
     
-    # Simular um pequeno delay para mostrar o loading
-    time.sleep(0.1)
-    
-    ranking_veiculo_df = pd.read_json(ranking_veiculo_json, orient='split')
+    ranking_veiculo_df = dataset['rankings']['veiculo']
     
     kpi_veiculos = ranking_veiculo_df['Veículo'].nunique()
     kpi_avg_score_veiculo = ranking_veiculo_df['Pontuação Total'].mean() if not ranking_veiculo_df.empty else 0
@@ -1130,17 +1619,44 @@ def update_veiculo_dashboard(ranking_veiculo_json):
     else:
         table_cols, table_data = [], []
 
-    return kpis, table_cols, table_data
+    category_cols, category_data = build_category_ranking_table(dataset['rankings']['categoria_veiculo'])
+    return kpis, table_cols, table_data, category_cols, category_data
+
+def build_category_ranking_table(category_ranking_df):
+    """Colunas e linhas formatadas da tabela de ranking por categoria."""
+    if category_ranking_df.empty:
+        return [], []
+    display_df = category_ranking_df.sort_values(by='Pontuação Total', ascending=False).reset_index(drop=True)
+    display_df.insert(0, 'Rank', display_df.index + 1)
+    for col in display_df.columns:
+        if 'Pontuação' in col:
+            display_df[col] = display_df[col].map(lambda x: f"{x:,.2f}".replace('.', ','))
+        elif 'Percentual' in col:
+            display_df[col] = display_df[col].map(lambda x: f"{x:.1f}%".replace('.', ','))
+    return [{'name': col, 'id': col} for col in display_df.columns], display_df.to_dict('records')
+
+# Callback para o ranking por categoria dos motoristas (Visão Geral da Frota)
+@app.callback(
+    [Output('ranking-table-categoria', 'columns'), Output('ranking-table-categoria', 'data')],
+    [Input('store-ranking-df', 'data')]
+)
+def update_category_ranking(ranking_handle):
+    dataset = get_cached_dataset(ranking_handle)
+    if dataset is None:
+        raise dash.exceptions.PreventUpdate
+    return build_category_ranking_table(dataset['rankings']['categoria_motorista'])
 
 # Callback para criar o layout do dashboard individual
 @app.callback(Output('individual-dashboard-output', 'children'), [Input('driver-dropdown', 'value')], [State('store-violations-df', 'data')])
-def create_individual_layout(selected_driver, violations_json):
-    if not selected_driver or violations_json is None:
+def create_individual_layout(selected_driver, violations_handle):
+    if not selected_driver or violations_handle is None:
         return html.P("Selecione um motorista para ver sua análise detalhada.", style={'color': colors['text_light'], 'textAlign': 'center'})
 
-    violations_df = pd.read_json(violations_json, orient='split')
-    violations_df['data_evento'] = pd.to_datetime(violations_df['data_evento'])
-    driver_violations_df = violations_df[violations_df['motorista'] == selected_driver]
+    dataset = get_cached_dataset(violations_handle)
+    if dataset is None:
+        return html.P("Os dados desta análise expiraram. Faça o upload do arquivo novamente.", style={'color': colors['text_light'], 'textAlign': 'center'})
+
+    driver_violations_df = get_driver_violations(dataset, selected_driver)
     
     if driver_violations_df.empty or driver_violations_df['data_evento'].isnull().all():
         return html.P("Não há dados de violação válidos para este motorista.")
@@ -1166,6 +1682,10 @@ def create_individual_layout(selected_driver, violations_json):
                             className='dash-loading',
                             children=html.Button('Gerar Análise com IA', id='ai-report-button', n_clicks=0, style={'backgroundColor': colors['accent_purple'], 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'marginRight': '10px'})
                         ),
+                        html.Button('Cancelar', id='ai-report-cancel', n_clicks=0, style={'backgroundColor': colors['border'], 'color': colors['text'], 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer'}),
+                        html.Div(id='ai-report-status', style={'marginTop': '10px', 'color': colors['text_light']}),
+                        dcc.Store(id='ai-report-job'),
+                        dcc.Interval(id='ai-report-poll', interval=500, disabled=True),
                     ]),
                     dcc.Textarea(
                         id='ai-report-output', 
@@ -1190,29 +1710,38 @@ def create_individual_layout(selected_driver, violations_json):
                 ]),
                 dcc.Download(id="download-html"),
                 html.H4(id='individual-list-header', style={'marginTop': '30px', 'marginBottom': '10px'}),
-                html.Div(id='individual-violation-list', style={'maxHeight': '400px', 'overflowY': 'auto', 'paddingRight': '10px'})
+                html.Div(id='individual-violation-list', style={'maxHeight': '400px', 'overflowY': 'auto', 'paddingRight': '10px'}),
+                dcc.Store(id='individual-list-page', data=0),
+                html.Div(style={'display': 'flex', 'gap': '10px', 'justifyContent': 'center', 'alignItems': 'center', 'marginTop': '10px'}, children=[
+                    html.Button('‹ Anterior', id='individual-list-prev', n_clicks=0, style=list_pager_button_style),
+                    html.Span(id='individual-list-page-label', style={'color': colors['text_light']}),
+                    html.Button('Próxima ›', id='individual-list-next', n_clicks=0, style=list_pager_button_style),
+                ])
             ])
         )
     ])
 
 # Callback para o conteúdo do dashboard individual
 @app.callback(
-    [Output('individual-kpis-container', 'children'), Output('individual-daily-chart', 'figure'), Output('individual-list-header', 'children'), Output('individual-violation-list', 'children')],
-    [Input('driver-dropdown', 'value'), Input('individual-violation-filter', 'value')],
-    [State('store-violations-df', 'data')]
+    [Output('individual-kpis-container', 'children'), Output('individual-daily-chart', 'figure'), Output('individual-list-header', 'children'), Output('individual-list-page', 'data')],
+    [Input('driver-dropdown', 'value'), Input('individual-violation-filter', 'value'), Input('store-violations-df', 'data')]
 )
-def update_individual_content(selected_driver, selected_violations, violations_json):
-    if selected_driver is None or violations_json is None: 
+def update_individual_content(selected_driver, selected_violations, violations_handle):
+    dataset = get_cached_dataset(violations_handle)
+    if selected_driver is None or dataset is None: 
         raise dash.exceptions.PreventUpdate
-    
-    # Simular um pequeno delay para mostrar o loading
-    time.sleep(0.1)
 
-    violations_df = pd.read_json(violations_json, orient='split')
-    violations_df['data_evento'] = pd.to_datetime(violations_df['data_evento'])
-    
-    driver_df_full = violations_df[violations_df['motorista'] == selected_driver]
-    
+    # Os KPIs não dependem do filtro de violações; o gráfico e o cabeçalho da lista, sim
+    kpis = get_memoized_output(figure_cache_key('individual-kpis', violations_handle, selected_driver),
+                               lambda: build_individual_kpis(get_driver_violations(dataset, selected_driver)))
+    fig, header = get_memoized_output(figure_cache_key('individual-chart', violations_handle, selected_driver, sorted(selected_violations or [])),
+                                      lambda: build_individual_chart(get_driver_violations(dataset, selected_driver), selected_driver, selected_violations))
+
+    # A lista em si é montada por página em render_individual_violation_list; aqui só volta para a primeira página
+    return kpis, fig, header, 0
+
+def build_individual_kpis(driver_df_full):
+    """KPIs e distribuição por categoria de um motorista."""
     total_score = driver_df_full['score_final'].sum()
     total_events = len(driver_df_full)
     main_violation = driver_df_full['violacao'].mode()[0] if not driver_df_full.empty else "Nenhuma"
@@ -1248,7 +1777,10 @@ def update_individual_content(selected_driver, selected_violations, violations_j
             ], style={'marginTop': '10px', 'fontSize': '0.9em', 'color': colors['text_light']})
         ])
     ])
-    
+    return kpis
+
+def build_individual_chart(driver_df_full, selected_driver, selected_violations):
+    """Gráfico diário e cabeçalho da lista de violações de um motorista, para as violações selecionadas."""
     driver_df_filtered = driver_df_full[driver_df_full['violacao'].isin(selected_violations)]
     daily_scores = driver_df_filtered.groupby(driver_df_filtered['data_evento'].dt.date)['score_final'].sum()
     
@@ -1272,17 +1804,76 @@ def update_individual_content(selected_driver, selected_violations, violations_j
         html.P("📊 A lista abaixo mostra todas as violações do motorista.", 
                style={'fontSize': '0.9em', 'color': colors['text_light'], 'fontStyle': 'italic', 'marginTop': '5px'})
     ])
+    return fig, header
+
+# --- LISTA DE VIOLAÇÕES INDIVIDUAL PAGINADA ---
+INDIVIDUAL_LIST_PAGE_SIZE = 50
+
+def build_route_links(df):
+    """Versão vetorizada de generate_maps_route_link para todas as linhas do DataFrame."""
+    lat_i, lon_i, lat_f, lon_f = (df[col].astype('float64') for col in ('latitude_inicial', 'longitude_inicial', 'latitude_final', 'longitude_final'))
+    start = lat_i.astype(str) + ',' + lon_i.astype(str)
+    links = ('https://www.google.com/maps/dir/' + start + '/' + lat_f.astype(str) + ',' + lon_f.astype(str)).astype(object)
+    same_point = (lat_i == lat_f) & (lon_i == lon_f)
+    links[same_point] = ('https://www.google.com/maps?q=' + start)[same_point]
+    links[lat_i.isna() | lon_i.isna() | lat_f.isna() | lon_f.isna()] = "Percurso indisponível"
+    return links
+
+def format_violation_list_page(page_df):
+    """Colunas já formatadas (título, detalhes e link) das violações de uma página da lista."""
+    scores = pd.Series(np.char.mod('%.2f', page_df['score_final'].to_numpy(dtype=np.float64)), index=page_df.index).str.replace('.', ',', regex=False)
+    return {
+        'titulo': (format_datetimes_br(page_df['data_evento']) + ' - ' + page_df['violacao'].astype(str)).tolist(),
+        'detalhes': ('Duração: ' + page_df['duracao'].astype(str) + ' | Pontos: ' + scores).tolist(),
+        'mapa': build_route_links(page_df).tolist(),
+    }
+
+def get_individual_list_df(dataset, driver, selected_violations):
+    driver_df = get_driver_violations(dataset, driver)
+    return driver_df[driver_df['violacao'].isin(selected_violations or []) & driver_df['data_evento'].notna()]
+
+# Callback para trocar de página na lista de violações individual
+@app.callback(
+    Output('individual-list-page', 'data', allow_duplicate=True),
+    [Input('individual-list-prev', 'n_clicks'), Input('individual-list-next', 'n_clicks')],
+    [State('individual-list-page', 'data'), State('driver-dropdown', 'value'), State('individual-violation-filter', 'value'), State('store-violations-df', 'data')],
+    prevent_initial_call=True
+)
+def change_individual_list_page(prev_clicks, next_clicks, page, selected_driver, selected_violations, violations_handle):
+    dataset = get_cached_dataset(violations_handle)
+    if selected_driver is None or dataset is None:
+        raise dash.exceptions.PreventUpdate
+    page_count = -(-len(get_individual_list_df(dataset, selected_driver, selected_violations)) // INDIVIDUAL_LIST_PAGE_SIZE)
+    step = 1 if dash.ctx.triggered_id == 'individual-list-next' else -1
+    return max(0, min((page or 0) + step, page_count - 1))
+
+# Callback para montar a página visível da lista de violações individual
+@app.callback(
+    [Output('individual-violation-list', 'children'), Output('individual-list-page-label', 'children')],
+    [Input('individual-list-page', 'data')],
+    [State('driver-dropdown', 'value'), State('individual-violation-filter', 'value'), State('store-violations-df', 'data')]
+)
+def render_individual_violation_list(page, selected_driver, selected_violations, violations_handle):
+    dataset = get_cached_dataset(violations_handle)
+    if selected_driver is None or dataset is None:
+        raise dash.exceptions.PreventUpdate
+
+    list_df = get_individual_list_df(dataset, selected_driver, selected_violations)
+    if list_df.empty:
+        return [html.P("Nenhuma violação encontrada para os filtros selecionados.")], ""
+
+    page_count = -(-len(list_df) // INDIVIDUAL_LIST_PAGE_SIZE)
+    page = min(page or 0, page_count - 1)
+    page_df = list_df.sort_values('score_final', ascending=False).iloc[page * INDIVIDUAL_LIST_PAGE_SIZE:(page + 1) * INDIVIDUAL_LIST_PAGE_SIZE]
+    page_items = format_violation_list_page(page_df)
 
     list_items = [html.Div(style={'borderLeft': f"3px solid {colors['accent_red']}", 'padding': '10px', 'marginBottom': '10px', 'backgroundColor': colors['background']}, children=[
-        html.P(f"{violation['data_evento'].strftime('%d/%m/%Y %H:%M:%S')} - {violation['violacao']}", style={'fontWeight': 'bold', 'fontSize': '1.1em'}),
-        html.P(f"Duração: {violation['duracao']} | Pontos: {f'{violation['score_final']:.2f}'.replace('.', ',')}") ,
-        html.A('Ver Percurso no Mapa', href=generate_maps_route_link(violation.get('latitude_inicial'), violation.get('longitude_inicial'), violation.get('latitude_final'), violation.get('longitude_final')), target='_blank', style={'color': colors['accent_blue'], 'textDecoration': 'underline'})
-    ]) for _, violation in list_df.sort_values('score_final', ascending=False).iterrows() if pd.notna(violation['data_evento'])]
-    
-    if not list_items:
-        list_items = [html.P("Nenhuma violação encontrada para os filtros selecionados.")]
+        html.P(titulo, style={'fontWeight': 'bold', 'fontSize': '1.1em'}),
+        html.P(detalhes),
+        html.A('Ver Percurso no Mapa', href=mapa, target='_blank', style={'color': colors['accent_blue'], 'textDecoration': 'underline'})
+    ]) for titulo, detalhes, mapa in zip(page_items['titulo'], page_items['detalhes'], page_items['mapa'])]
 
-    return kpis, fig, header, list_items
+    return list_items, f"Página {page + 1} de {page_count}"
 
 
 def get_virtual_instructor_prompt_template():
@@ -1308,7 +1899,7 @@ def get_virtual_instructor_prompt_template():
         <output_format>
             O relatório deve ser em Markdown e seguir rigorosamente esta estrutura:
             1.  **Análise Geral:** Uma saudação ao motorista e um resumo do seu desempenho, mencionando a pontuação total e o que ela representa.
-            2.  **Pontos de Melhoria Detalhados:** Uma análise das violações mais significativas, explicando o risco e fornecendo uma dica prática para cada uma, incluindo o link do mapa.
+            2.  **Pontos de Melhoria Detalhados:** Uma análise das violações mais significativas, explicando o risco e fornecendo uma dica prática para cada uma, incluindo a referência do mapa exatamente como fornecida (ex.: [L1]), sem escrever URLs.
             3.  **Recomendação Final:** Uma conclusão com uma dica de ouro, baseada no padrão geral de comportamento observado nos dados.
         </output_format>
     </task_definition>
@@ -1318,12 +1909,15 @@ def get_virtual_instructor_prompt_template():
             <input_data>
                 <driver_name>João Silva</driver_name>
                 <total_score>85,00</total_score>
-                <violations_summary>
-- **Violação:** Velocidade excessiva (Pontos: 30,00)
-  - **Data:** 01/12/2024 10:15:00
-  - **Duração:** 00:01:30
-  - **Localização:** <a href="https://www.google.com/maps/dir/-26.30,-48.84/-26.32,-48.85" target="_blank">Ver Percurso</a>
-                </violations_summary>
+                <driver_summary>
+Totais por tipo de violação:
+- Velocidade excessiva: 1 eventos, 30,00 pts
+Categorias: Econômica 0,0% | Segurança 100,0%
+Pior dia: 01/12/2024 (30,00 pts em 1 eventos)
+Tendência: eventos em um único dia
+Eventos mais graves:
+- [L1] 01/12/2024 10:15 Velocidade excessiva: 30,00 pts, duração 00:01:30
+                </driver_summary>
             </input_data>
             <output_report>
 ### Análise do Instrutor Virtual: João Silva
@@ -1335,7 +1929,7 @@ Olá, João! Analisamos seu desempenho e alguns pontos de atenção que podemos
 * **Violação: Velocidade excessiva (30,00 pontos) em 01/12/2024 10:15:00**
     * **Risco Associado:** O excesso de velocidade, mesmo que por um curto período, aumenta drasticamente a distância necessária para frenagem e o risco de acidentes graves, além de impactar o consumo.
     * **Dica Prática:** Em trechos de rodovia, é fundamental manter a velocidade de cruzeiro compatível com o limite da via e as condições do tráfego. Utilizar o piloto automático (se disponível) pode ajudar a manter a constância.
-    * **Local da Ocorrência:** <a href="https://www.google.com/maps/dir/-26.30,-48.84/-26.32,-48.85" target="_blank">Ver Percurso no Mapa</a>
+    * **Local da Ocorrência:** [L1]
 
 #### Recomendação Final
 
@@ -1350,7 +1944,7 @@ Notamos que a principal violação foi pontual. A dica de ouro é sempre realiza
             <total_score>{total_score}</total_score>
         </context>
         <input_data>
-            <violations_summary>{violations_summary}</violations_summary>
+            <driver_summary>{driver_summary}</driver_summary>
         </input_data>
         <instruction>
         Execute a análise e gere o relatório para o motorista especificado, seguindo rigorosamente o formato e as diretrizes.
@@ -1359,159 +1953,657 @@ Notamos que a principal violação foi pontual. A dica de ouro é sempre realiza
 </prompt>
 """
 
-def generate_virtual_instructor_report(driver_name, driver_df):
+# --- CACHE DE RESPOSTAS DO LLM ---
+# Mesmo prompt + mesmo modelo + mesma configuração de geração = mesma chave. Camada em memória (LRU) na frente
+# de uma camada em SQLite, que sobrevive a reinícios; as duas expiram pelo TTL.
+LLM_MODEL = 'gemini-2.0-flash'
+LLM_GENERATION_CONFIG = {
+    "temperature": 0.4,
+    "topP": 1,
+    "topK": 32,
+    "maxOutputTokens": 4096,
+}
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'driver-behavior-llm-cache.sqlite'))
+LLM_CACHE_TTL_HOURS = int(os.getenv('LLM_CACHE_TTL_HOURS', '168'))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', '256'))
+
+class LLMResponseCache:
+    """Cache de respostas do LLM em duas camadas (memória e SQLite), com TTL e contadores de acerto/erro."""
+
+    TABLE = 'llm_responses'
+
+    def __init__(self, path, ttl_seconds, max_memory_entries):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        self._memory = OrderedDict()
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt, model, generation_config):
+        payload = json.dumps({'prompt': prompt, 'model': model, 'generation_config': generation_config}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _db(self):
+        # Conexão aberta só no primeiro uso, para não criar o arquivo se a IA nunca for usada
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(f'CREATE TABLE IF NOT EXISTS {self.TABLE} (key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)')
+        return self._connection
+
+    def _remember(self, key, response, created_at):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None and now - cached[1] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return cached[0]
+            self._memory.pop(key, None)
+
+            row = self._db().execute(f'SELECT response, created_at FROM {self.TABLE} WHERE key = ? AND created_at >= ?', (key, now - self.ttl_seconds)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            self._remember(key, row[0], row[1])
+            self.stats['disk_hits'] += 1
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            db = self._db()
+            db.execute(f'INSERT OR REPLACE INTO {self.TABLE} (key, response, created_at) VALUES (?, ?, ?)', (key, response, now))
+            db.execute(f'DELETE FROM {self.TABLE} WHERE created_at < ?', (now - self.ttl_seconds,))
+            db.commit()
+
+LLM_RESPONSE_CACHE = LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_TTL_HOURS * 3600, LLM_CACHE_MEMORY_ENTRIES)
+
+# --- CHAMADA AO LLM (LIMITE DE TAXA E NOVAS TENTATIVAS) ---
+LLM_API_BASE_URL = os.getenv('LLM_API_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta')
+LLM_REQUEST_TIMEOUT_SECONDS = 90
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+LLM_RETRY_BASE_SECONDS = 1.0
+LLM_MAX_REQUESTS_PER_MINUTE = int(os.getenv('LLM_MAX_REQUESTS_PER_MINUTE', '60'))
+LLM_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+LLM_POOL_CONNECTIONS = int(os.getenv('LLM_POOL_CONNECTIONS', '8'))
+
+class LLMError(Exception):
+    """Falha ao obter uma resposta do LLM; a mensagem é a que vai para o usuário."""
+
+class RateLimiter:
+    """Espaça as chamadas de todas as threads para no máximo max_per_minute por minuto."""
+
+    def __init__(self, max_per_minute):
+        self.interval = 60.0 / max_per_minute if max_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+LLM_RATE_LIMITER = RateLimiter(LLM_MAX_REQUESTS_PER_MINUTE)
+
+def get_retry_delay(response, attempt):
+    """Espera antes da próxima tentativa: Retry-After do servidor ou backoff exponencial com jitter."""
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return LLM_RETRY_BASE_SECONDS * (2 ** attempt) * (0.5 + np.random.random())
+
+def create_llm_session(pool_size):
+    """Sessão HTTP compartilhada pelas chamadas ao LLM: mantém as conexões abertas (keep-alive) entre relatórios."""
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Content-Type'] = 'application/json'
+    return session
+
+# O requests e a sessão só são carregados na primeira chamada ao LLM, fora da partida do servidor
+LLM_SESSION = None
+LLM_SESSION_LOCK = threading.Lock()
+
+def get_llm_session():
+    global LLM_SESSION
+    with LLM_SESSION_LOCK:
+        if LLM_SESSION is None:
+            LLM_SESSION = create_llm_session(LLM_POOL_CONNECTIONS)
+        return LLM_SESSION
+
+def get_llm_api_key():
+    apiKey = os.getenv('GEMINI_API_KEY')
+    if not apiKey:
+        raise LLMError("Erro: A chave da API não foi configurada. Verifique se a variável GEMINI_API_KEY está definida no arquivo .env")
+    return apiKey
+
+def build_llm_payload(prompt):
+    return {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generationConfig": LLM_GENERATION_CONFIG
+    }
+
+def post_llm_request(apiUrl, payload, stream=False):
+    """POST na API pela sessão compartilhada, com limite de taxa e novas tentativas; retorna a resposta bem-sucedida."""
+    import requests
+    session = get_llm_session()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        LLM_RATE_LIMITER.wait()
+        try:
+            response = session.post(apiUrl, json=payload, timeout=LLM_REQUEST_TIMEOUT_SECONDS, stream=stream)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            time.sleep(get_retry_delay(None, attempt))
+            continue
+        if response.status_code in LLM_RETRYABLE_STATUS and attempt < LLM_MAX_RETRIES:
+            # Lê o corpo do erro para a conexão voltar ao pool
+            response.content
+            time.sleep(get_retry_delay(response, attempt))
+            continue
+        response.raise_for_status()
+        return response
+
+def request_llm_completion(prompt):
+    """Texto gerado pelo LLM para o prompt, passando pelo cache de respostas. Levanta LLMError ou RequestException."""
+    cache_key = LLMResponseCache.make_key(prompt, LLM_MODEL, LLM_GENERATION_CONFIG)
+    cached_text = LLM_RESPONSE_CACHE.get(cache_key)
+    if cached_text is not None:
+        return cached_text
+
+    apiUrl = f"{LLM_API_BASE_URL}/models/{LLM_MODEL}:generateContent?key={get_llm_api_key()}"
+    result = post_llm_request(apiUrl, build_llm_payload(prompt)).json()
+
+    # (Self-Correction/Reflection)
+    if result.get('candidates') and result['candidates'][0]['content']['parts']:
+        text = result['candidates'][0]['content']['parts'][0]['text']
+        LLM_RESPONSE_CACHE.put(cache_key, text)
+        return text
+    print(f"Resposta inesperada da API: {result}")
+    raise LLMError("Não foi possível gerar a análise. A resposta da IA estava em um formato inesperado.")
+
+def stream_llm_completion(prompt, on_text=None, cancel_event=None):
     """
-    Gera um relatório de melhoria de direção usando um LLM.
-    Esta função orquestra a chamada para a API do modelo de linguagem.
+    Como request_llm_completion, mas pelo endpoint de streaming (SSE): on_text recebe o texto acumulado a cada
+    trecho recebido. Retorna o texto completo, ou None se cancel_event for acionado no meio da resposta.
+    """
+    cache_key = LLMResponseCache.make_key(prompt, LLM_MODEL, LLM_GENERATION_CONFIG)
+    cached_text = LLM_RESPONSE_CACHE.get(cache_key)
+    if cached_text is not None:
+        if on_text is not None:
+            on_text(cached_text)
+        return cached_text
+
+    apiUrl = f"{LLM_API_BASE_URL}/models/{LLM_MODEL}:streamGenerateContent?alt=sse&key={get_llm_api_key()}"
+    parts = []
+    with post_llm_request(apiUrl, build_llm_payload(prompt), stream=True) as response:
+        # text/event-stream sem charset seria decodificado como latin-1 pelo requests
+        response.encoding = 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            if not line or not line.startswith('data:'):
+                continue
+            chunk = json.loads(line[len('data:'):])
+            candidates = chunk.get('candidates') or [{}]
+            parts.extend(part.get('text', '') for part in candidates[0].get('content', {}).get('parts', []))
+            if on_text is not None and parts:
+                on_text(''.join(parts))
+
+    if not parts:
+        print("Resposta inesperada da API: streaming sem texto")
+        raise LLMError("Não foi possível gerar a análise. A resposta da IA estava em um formato inesperado.")
+    text = ''.join(parts)
+    LLM_RESPONSE_CACHE.put(cache_key, text)
+    return text
+
+# --- PROMPT DO INSTRUTOR VIRTUAL (RESUMO COMPACTO) ---
+# Em vez de eventos soltos com URLs longas, o prompt leva um resumo estatístico do motorista (totais por tipo,
+# categorias, pior dia e tendência) e os eventos mais graves que couberem no orçamento de tokens. Os links de mapa
+# viram referências curtas ([L1], [L2]...) que são trocadas pelos links depois da geração.
+PROMPT_SUMMARY_TOKEN_BUDGET = int(os.getenv('PROMPT_SUMMARY_TOKEN_BUDGET', '250'))
+PROMPT_MAX_EVENTS = 10
+PROMPT_CHARS_PER_TOKEN = 4
+PROMPT_TREND_THRESHOLD = 0.10
+PROMPT_LINK_PATTERN = re.compile(r'\[(L\d+)\]')
+
+def estimate_token_count(text):
+    """Estimativa de tokens do texto (~4 caracteres por token), usada no orçamento do prompt e nos relatórios."""
+    return -(-len(text) // PROMPT_CHARS_PER_TOKEN)
+
+def describe_score_trend(daily_scores):
+    """Compara a pontuação da primeira e da segunda metade do período do motorista."""
+    if len(daily_scores) < 2:
+        return "Tendência: eventos em um único dia"
+    start, end = daily_scores.index.min(), daily_scores.index.max()
+    first_half = daily_scores[daily_scores.index <= start + (end - start) / 2].sum()
+    second_half = daily_scores.sum() - first_half
+    change = (second_half - first_half) / first_half if first_half > 0 else float('inf')
+    label = 'em alta' if change > PROMPT_TREND_THRESHOLD else 'em queda' if change < -PROMPT_TREND_THRESHOLD else 'estável'
+    return f"Tendência: {label} (1ª metade do período {first_half:.2f} pts, 2ª metade {second_half:.2f} pts)".replace('.', ',')
+
+def format_prompt_points(value):
+    return f"{value:.2f}".replace('.', ',')
+
+def format_prompt_event(row, reference):
+    """Linha compacta de um evento; reference é a referência do mapa ([L1]...) ou None."""
+    line = f"- {reference or 'sem localização'} {row['data_evento'].strftime('%d/%m/%Y %H:%M')} {row['violacao']}: {format_prompt_points(row['score_final'])} pts"
+    if row['duracao'] != "00:00:00":
+        line += f", duração {row['duracao']}"
+    if row.get('velocidade_máxima', 0) > 0:
+        line += f", {row['velocidade_máxima']:.0f} km/h"
+    if row.get('rpm_máximo', 0) > 0:
+        line += f", {row['rpm_máximo']:.0f} rpm"
+    return line
+
+def build_driver_summary(driver_df, token_budget=PROMPT_SUMMARY_TOKEN_BUDGET):
+    """
+    Resumo estatístico do motorista para o prompt e o mapa referência -> URL dos eventos citados.
+    Os eventos mais graves entram em ordem de pontuação enquanto o resumo couber em token_budget (pelo menos um).
     """
-
-    # 1. Análise e Síntese dos Dados Chain-of-Thought (CoT)
-    if driver_df.empty:
-        return "Não há dados de violação para gerar a análise."
-
     total_score = driver_df['score_final'].sum()
-    top_violations = driver_df.sort_values('score_final', ascending=False).head(3)
+    by_type = driver_df.groupby('violacao', observed=True)['score_final'].agg(['size', 'sum']).sort_values('sum', ascending=False)
+    lines = ["Totais por tipo de violação:"]
+    lines += [f"- {violation}: {int(row['size'])} eventos, {format_prompt_points(row['sum'])} pts" for violation, row in by_type.iterrows()]
 
-    violations_summary = ""
-    for _, row in top_violations.iterrows():
-        map_link_url = generate_maps_route_link(row.get('latitude_inicial'), row.get('longitude_inicial'), row.get('latitude_final'), row.get('longitude_final'))
-        map_link_html = f'<a href="{map_link_url}" target="_blank" style="color: #3B82F6; text-decoration: underline;">Ver Percurso</a>'
-        
-        # Formata a pontuação com 2 casas decimais e vírgula como separador decimal
-        score_formatted = f"{row['score_final']:.2f}".replace('.', ',')
-        
-        details = f"- **Violação:** {row['violacao']} (Pontos: {score_formatted})\n"
-        details += f"  - **Data:** {row['data_evento'].strftime('%d/%m/%Y %H:%M:%S')}\n"
-        if row['duracao'] != "00:00:00":
-             details += f"  - **Duração:** {row['duracao']}\n"
-        if row.get('velocidade_maxima', 0) > 0:
-            details += f"  - **Velocidade Máxima:** {row.get('velocidade_maxima', 'N/A')} km/h\n"
-        if row.get('rpm_maximo', 0) > 0:
-            details += f"  - **RPM Máximo:** {row.get('rpm_maximo', 'N/A')}\n"
-        details += f"  - **Localização:** {map_link_html}\n"
-        violations_summary += details
-
-    # 2. Construção do Prompt Final
-    prompt_template = get_virtual_instructor_prompt_template()
-    final_prompt = prompt_template.format(
+    category_shares = [
+        f"{category} {(by_type['sum'].reindex(category_types).sum() / total_score * 100 if total_score > 0 else 0):.1f}%".replace('.', ',')
+        for category, category_types in VIOLATION_CATEGORIES.items()
+    ]
+    lines.append("Categorias: " + " | ".join(category_shares))
+
+    daily = driver_df.groupby(driver_df['data_evento'].dt.normalize())['score_final'].agg(['size', 'sum'])
+    if not daily.empty:
+        worst_day = daily['sum'].idxmax()
+        lines.append(f"Pior dia: {worst_day.strftime('%d/%m/%Y')} ({format_prompt_points(daily.at[worst_day, 'sum'])} pts em {int(daily.at[worst_day, 'size'])} eventos)")
+        lines.append(describe_score_trend(daily['sum']))
+
+    lines.append("Eventos mais graves:")
+    links = {}
+    used_tokens = estimate_token_count("\n".join(lines))
+    for _, row in driver_df.nlargest(PROMPT_MAX_EVENTS, 'score_final').iterrows():
+        url = generate_maps_route_link(row.get('latitude_inicial'), row.get('longitude_inicial'), row.get('latitude_final'), row.get('longitude_final'))
+        reference = f"[L{len(links) + 1}]" if url.startswith('http') else None
+        line = format_prompt_event(row, reference)
+        line_tokens = estimate_token_count(line) + 1
+        if links and used_tokens + line_tokens > token_budget:
+            break
+        lines.append(line)
+        used_tokens += line_tokens
+        if reference:
+            links[reference[1:-1]] = url
+    return "\n".join(lines), links
+
+def compact_prompt_template(template):
+    """Remove linhas vazias e a indentação das linhas de tags XML (tokens gastos sem informação); o Markdown do exemplo fica intacto."""
+    return "\n".join(line.strip() if line.lstrip().startswith('<') else line for line in template.splitlines() if line.strip())
+
+INSTRUCTOR_PROMPT_TEMPLATE = compact_prompt_template(get_virtual_instructor_prompt_template())
+
+def build_instructor_prompt(driver_name, driver_df):
+    """Prompt do Instrutor Virtual: {'text', 'links' (referência -> URL), 'token_estimate'}."""
+    # Análise e Síntese dos Dados Chain-of-Thought (CoT)
+    driver_summary, links = build_driver_summary(driver_df)
+
+    # Construção do Prompt Final
+    text = INSTRUCTOR_PROMPT_TEMPLATE.format(
         driver_name=driver_name,
-        total_score=f"{total_score:.2f}".replace('.', ','),
-        violations_summary=violations_summary
+        total_score=f"{driver_df['score_final'].sum():.2f}".replace('.', ','),
+        driver_summary=driver_summary
     )
-    
-    # 3. Chamada à API do LLM
-    try:
-        apiKey = os.getenv('GEMINI_API_KEY')
-        if not apiKey:
-            return "Erro: A chave da API não foi configurada. Verifique se a variável GEMINI_API_KEY está definida no arquivo .env"
-
-        apiUrl = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={apiKey}"
-        
-        payload = {
-            "contents": [{"role": "user", "parts": [{"text": final_prompt}]}],
-             "generationConfig": {
-                "temperature": 0.4,
-                "topP": 1,
-                "topK": 32,
-                "maxOutputTokens": 4096,
-            }
-        }
-        
-        response = requests.post(apiUrl, json=payload, headers={'Content-Type': 'application/json'}, timeout=90)
-        response.raise_for_status()
-        
-        result = response.json()
-        
-        # (Self-Correction/Reflection)
-        if result.get('candidates') and result['candidates'][0]['content']['parts']:
-            text = result['candidates'][0]['content']['parts'][0]['text']
-            return text 
-        else:
-            print(f"Resposta inesperada da API para {driver_name}: {result}")
-            return "Não foi possível gerar a análise. A resposta da IA estava em um formato inesperado."
+    return {'text': text, 'links': links, 'token_estimate': estimate_token_count(text)}
+
+def resolve_prompt_links(text, links):
+    """Troca as referências [L1], [L2]... do texto gerado pelos links do mapa; referências desconhecidas ficam como estão."""
+    def to_anchor(match):
+        url = links.get(match.group(1))
+        if url is None:
+            return match.group(0)
+        return f'<a href="{url}" target="_blank" style="color: #3B82F6; text-decoration: underline;">Ver Percurso</a>'
+    return PROMPT_LINK_PATTERN.sub(to_anchor, text)
+
+def generate_virtual_instructor_report(driver_name, driver_df, on_text=None, cancel_event=None, prompt=None):
+    """
+    Gera um relatório de melhoria de direção usando um LLM.
+    Esta função orquestra a chamada para a API do modelo de linguagem; uma falha levanta LLMError com a mensagem
+    para o usuário. Com on_text, o texto parcial é repassado conforme chega (streaming). prompt pode vir já montado
+    por build_instructor_prompt.
+    """
+    if driver_df.empty:
+        return "Não há dados de violação para gerar a análise."
 
+    import requests
+    try:
+        prompt = prompt or build_instructor_prompt(driver_name, driver_df)
+        on_partial = (lambda partial: on_text(resolve_prompt_links(partial, prompt['links']))) if on_text is not None else None
+        text = stream_llm_completion(prompt['text'], on_text=on_partial, cancel_event=cancel_event)
+        return resolve_prompt_links(text, prompt['links']) if text is not None else None
+    except LLMError:
+        raise
     except requests.exceptions.RequestException as e:
         print(f"Erro de conexão ao gerar a análise para {driver_name}: {e}")
-        return f"Erro de conexão ao gerar a análise. Verifique sua rede e a chave da API."
+        raise LLMError("Erro de conexão ao gerar a análise. Verifique sua rede e a chave da API.") from e
     except Exception as e:
         print(f"Ocorreu um erro inesperado ao gerar a análise para {driver_name}: {e}")
-        return f"Ocorreu um erro inesperado ao gerar a análise."
+        raise LLMError("Ocorreu um erro inesperado ao gerar a análise.") from e
+
+
+# --- RELATÓRIOS DE IA EM SEGUNDO PLANO ---
+# A chamada ao LLM pode levar até 90 s; roda em uma fila de threads do próprio processo (o dataset já está em
+# memória aqui) e o navegador acompanha o job por polling, sem prender o worker do servidor. Os jobs da frota
+# (relatórios e ZIP) têm uma fila própria, para não ocupar as vagas dos relatórios individuais. O estado dos jobs
+# fica na memória do processo: o Procfile roda um único worker do gunicorn (com threads) para todos os acessos
+# enxergarem os mesmos jobs.
+AI_REPORT_WORKERS = int(os.getenv('AI_REPORT_WORKERS', '4'))
+FLEET_JOB_WORKERS = int(os.getenv('FLEET_JOB_WORKERS', '2'))
+AI_REPORT_JOB_TTL_SECONDS = 3600
+AI_REPORT_EXECUTOR = ThreadPoolExecutor(max_workers=AI_REPORT_WORKERS, thread_name_prefix='ai-report')
+FLEET_JOB_EXECUTOR = ThreadPoolExecutor(max_workers=FLEET_JOB_WORKERS, thread_name_prefix='fleet-job')
+
+AI_REPORT_JOBS = {}
+AI_REPORT_JOBS_LOCK = threading.Lock()
+
+def cleanup_finished_report_jobs():
+    """Descarta jobs encerrados há mais tempo que AI_REPORT_JOB_TTL_SECONDS."""
+    now = time.time()
+    with AI_REPORT_JOBS_LOCK:
+        for job_id in [job_id for job_id, job in AI_REPORT_JOBS.items() if job['finished_at'] and now - job['finished_at'] > AI_REPORT_JOB_TTL_SECONDS]:
+            del AI_REPORT_JOBS[job_id]
+
+def submit_report_job(executor, runner, *args, **fields):
+    """Registra um job de relatório, coloca runner(job, *args) na fila do executor e retorna o id do job."""
+    cleanup_finished_report_jobs()
+    job = {
+        'job_id': uuid.uuid4().hex, 'status': 'queued', 'result': None,
+        'created_at': time.time(), 'started_at': None, 'finished_at': None, 'cancel_event': threading.Event(), **fields,
+    }
+    with AI_REPORT_JOBS_LOCK:
+        AI_REPORT_JOBS[job['job_id']] = job
+        job['future'] = executor.submit(runner, job, *args)
+    return job['job_id']
+
+def mark_report_job_running(job):
+    """Passa o job para 'running'; retorna False se ele foi cancelado antes de sair da fila."""
+    with AI_REPORT_JOBS_LOCK:
+        if job['cancel_event'].is_set():
+            return False
+        job['status'], job['started_at'] = 'running', time.time()
+        return True
+
+def finish_report_job(job, result, status):
+    """Encerra o job com o resultado; um job cancelado durante a execução descarta o resultado."""
+    with AI_REPORT_JOBS_LOCK:
+        if not job['cancel_event'].is_set():
+            job['result'], job['status'], job['finished_at'] = result, status, time.time()
+
+def submit_ai_report_job(driver_name, driver_df):
+    """Coloca a geração do relatório de um motorista na fila e retorna o id do job."""
+    return submit_report_job(AI_REPORT_EXECUTOR, run_ai_report_job, driver_df, driver=driver_name, partial=None, first_text_at=None, prompt_tokens=None)
+
+def run_ai_report_job(job, driver_df):
+    if not mark_report_job_running(job):
+        return
+
+    def on_text(text):
+        if job['first_text_at'] is None:
+            job['first_text_at'] = time.time()
+        job['partial'] = text
 
+    try:
+        prompt = build_instructor_prompt(job['driver'], driver_df) if not driver_df.empty else None
+        job['prompt_tokens'] = prompt['token_estimate'] if prompt else None
+        result = generate_virtual_instructor_report(job['driver'], driver_df, on_text=on_text, cancel_event=job['cancel_event'], prompt=prompt)
+        status = 'done'
+    except LLMError as e:
+        result, status = str(e), 'error'
+    except Exception as e:
+        print(f"Erro no job de relatório {job['job_id']}: {e}")
+        result, status = "Ocorreu um erro inesperado ao gerar a análise.", 'error'
+    finish_report_job(job, result, status)
+
+def get_ai_report_job(job_id):
+    with AI_REPORT_JOBS_LOCK:
+        return AI_REPORT_JOBS.get(job_id)
+
+def cancel_ai_report_job(job_id):
+    """Cancela o job: se ainda estiver na fila, não chega a rodar; se estiver rodando, o resultado é descartado."""
+    # Sob o lock, o cancelamento e o fim do job não se sobrepõem: vale o que acontecer primeiro
+    with AI_REPORT_JOBS_LOCK:
+        job = AI_REPORT_JOBS.get(job_id)
+        if job is None or job['finished_at']:
+            return job
+        job['cancel_event'].set()
+        job['status'], job['finished_at'] = 'cancelled', time.time()
+    job['future'].cancel()
+    return job
+
+# --- RELATÓRIOS DE IA PARA A FROTA INTEIRA ---
+# Um relatório por motorista do ranking (todos ou os N de maior pontuação), com chamadas simultâneas limitadas;
+# cada resultado é gravado em JSON Lines assim que fica pronto.
+FLEET_REPORT_CONCURRENCY = int(os.getenv('FLEET_REPORT_CONCURRENCY', '4'))
+AI_REPORTS_DIR = os.getenv('AI_REPORTS_DIR', os.path.join(tempfile.gettempdir(), 'driver-behavior-reports'))
+
+def generate_fleet_reports(dataset, output_path, top_n=None, max_workers=None, cancel_event=None, on_progress=None):
+    """
+    Gera os relatórios do Instrutor Virtual para os motoristas do ranking do dataset, na ordem de pontuação,
+    e grava uma linha JSON por motorista em output_path conforme cada relatório termina. Retorna o resumo.
+    """
+    ranking_df = dataset['ranking'].sort_values('Pontuação Total', ascending=False)
+    drivers = ranking_df['Motorista'].tolist()[:top_n] if top_n else ranking_df['Motorista'].tolist()
+    total_scores = dict(zip(ranking_df['Motorista'], ranking_df['Pontuação Total']))
+    summary = {'total': len(drivers), 'ok': 0, 'errors': 0, 'cancelled': 0, 'path': output_path}
+
+    import requests
+
+    def report_for(driver):
+        if cancel_event is not None and cancel_event.is_set():
+            return 'cancelled', None, 0.0, None
+        start = time.perf_counter()
+        prompt = build_instructor_prompt(driver, get_driver_violations(dataset, driver))
+        try:
+            text = resolve_prompt_links(request_llm_completion(prompt['text']), prompt['links'])
+            status = 'ok'
+        except LLMError as e:
+            text, status = str(e), 'error'
+        except requests.exceptions.RequestException as e:
+            text, status = f"Erro de conexão ao gerar a análise: {e}", 'error'
+        return status, text, time.perf_counter() - start, prompt['token_estimate']
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as output, ThreadPoolExecutor(max_workers=max_workers or FLEET_REPORT_CONCURRENCY) as executor:
+        futures = {executor.submit(report_for, driver): (position, driver) for position, driver in enumerate(drivers, start=1)}
+        for future in as_completed(futures):
+            position, driver = futures[future]
+            status, text, elapsed, prompt_tokens = future.result()
+            summary[{'ok': 'ok', 'error': 'errors', 'cancelled': 'cancelled'}[status]] += 1
+            if status != 'cancelled':
+                record = {'posicao': position, 'motorista': driver, 'pontuacao_total': round(float(total_scores[driver]), 2), 'status': status, 'relatorio': text, 'segundos': round(elapsed, 2), 'tokens_prompt': prompt_tokens}
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                output.flush()
+            if on_progress is not None:
+                on_progress(summary)
+    return summary
+
+def run_fleet_report_job(job, dataset, top_n):
+    if not mark_report_job_running(job):
+        return
+    try:
+        summary = generate_fleet_reports(dataset, job['path'], top_n=top_n, cancel_event=job['cancel_event'], on_progress=lambda progress: job.update(progress=dict(progress)))
+        status = 'done'
+    except Exception as e:
+        print(f"Erro no job de relatórios da frota {job['job_id']}: {e}")
+        summary, status = {'error': str(e)}, 'error'
+    finish_report_job(job, summary, status)
 
+def submit_fleet_report_job(dataset, top_n=None):
+    """Coloca a geração dos relatórios da frota na fila; o resultado vai para um arquivo em AI_REPORTS_DIR."""
+    path = os.path.join(AI_REPORTS_DIR, f'relatorios_frota_{uuid.uuid4().hex}.jsonl')
+    return submit_report_job(FLEET_JOB_EXECUTOR, run_fleet_report_job, dataset, top_n, path=path, progress=None)
 
-# Callback para gerar relatório de IA
+# Callback para gerar relatório de IA (só enfileira o job; o resultado chega por poll_ai_report)
 @app.callback(
-    Output('ai-report-output', 'value'),
+    [Output('ai-report-job', 'data'), Output('ai-report-poll', 'disabled'), Output('ai-report-status', 'children')],
     [Input('ai-report-button', 'n_clicks')],
-    [State('driver-dropdown', 'value'), State('store-violations-df', 'data')]
+    [State('driver-dropdown', 'value'), State('store-violations-df', 'data'), State('ai-report-job', 'data')]
 )
-def generate_ai_report(n_clicks, selected_driver, violations_json):
-    if n_clicks == 0 or not selected_driver or not violations_json:
-        return ""
+def generate_ai_report(n_clicks, selected_driver, violations_handle, current_job):
+    if n_clicks == 0 or not selected_driver or not violations_handle:
+        return None, True, ""
 
-    violations_df = pd.read_json(violations_json, orient='split')
-    violations_df['data_evento'] = pd.to_datetime(violations_df['data_evento'])
-    driver_df = violations_df[violations_df['motorista'] == selected_driver]
-    
-    # Chama a nova função otimizada com técnicas avançadas
-    ai_report_text = generate_virtual_instructor_report(selected_driver, driver_df)
-    
-    # Retorna o texto simples para edição
-    return ai_report_text
+    dataset = get_cached_dataset(violations_handle)
+    if dataset is None:
+        return None, True, "Os dados desta análise expiraram. Faça o upload do arquivo novamente."
 
-# Callback para exportação HTML
+    # Um novo pedido substitui o anterior ainda em andamento
+    if current_job:
+        cancel_ai_report_job(current_job['job_id'])
+
+    driver_df = get_driver_violations(dataset, selected_driver)
+    job_id = submit_ai_report_job(selected_driver, driver_df)
+    return {'job_id': job_id, 'driver': selected_driver}, False, "⏳ Análise na fila..."
+
+# Callback de acompanhamento do job de relatório de IA
 @app.callback(
-    Output("download-html", "data"),
-    Input("btn-export-html", "n_clicks"),
-    [State('driver-dropdown', 'value'), 
-     State('store-violations-df', 'data'),
-     State('ai-report-output', 'value')], 
-    prevent_initial_call=True,
+    [Output('ai-report-output', 'value'), Output('ai-report-poll', 'disabled', allow_duplicate=True), Output('ai-report-status', 'children', allow_duplicate=True)],
+    [Input('ai-report-poll', 'n_intervals')],
+    [State('ai-report-job', 'data')],
+    prevent_initial_call=True
 )
-def export_html(n_clicks, selected_driver, violations_json, ai_report_text):
-    if n_clicks is None or n_clicks == 0 or not selected_driver or not violations_json:
-        raise dash.exceptions.PreventUpdate
+def poll_ai_report(n_intervals, current_job):
+    job = get_ai_report_job(current_job['job_id']) if current_job else None
+    if job is None:
+        return dash.no_update, True, "O job de análise não foi encontrado. Gere a análise novamente."
+
+    if job['status'] == 'queued':
+        return dash.no_update, False, f"⏳ Análise na fila... ({time.time() - job['created_at']:.0f} s)"
+    if job['status'] == 'running':
+        status = f"🤖 Gerando análise para {job['driver']}... ({time.time() - job['started_at']:.0f} s)"
+        # Texto parcial do streaming, atualizado a cada polling até a resposta completa
+        return (job['partial'] if job['partial'] is not None else dash.no_update), False, status
+    if job['status'] == 'cancelled':
+        return dash.no_update, True, "Geração da análise cancelada."
+    if job['status'] == 'error':
+        return dash.no_update, True, f"❌ {job['result']} Tente gerar a análise novamente."
 
-    violations_df = pd.read_json(violations_json, orient='split')
-    violations_df['data_evento'] = pd.to_datetime(violations_df['data_evento'])
-    driver_df = violations_df[violations_df['motorista'] == selected_driver].sort_values('score_final', ascending=False)
-    
-    total_score = driver_df['score_final'].sum()
-    total_events = len(driver_df)
-    main_violation = driver_df['violacao'].mode()[0] if not driver_df.empty else "Nenhuma"
-    worst_day_score = driver_df.groupby(driver_df['data_evento'].dt.date)['score_final'].sum().max()
-    worst_day = driver_df.groupby(driver_df['data_evento'].dt.date)['score_final'].sum().idxmax() if not pd.isna(worst_day_score) else "N/A"
-    
-    kpi_html = f"""
-        <div class="kpi-card"><h3>Total de Eventos</h3><p>{total_events}</p></div>
-        <div class="kpi-card"><h3>Violação Principal</h3><p>{main_violation}</p></div>
-        <div class="kpi-card"><h3>Dia de Maior Risco</h3><p>{worst_day.strftime('%d/%m') if worst_day != 'N/A' else 'N/A'}</p></div>
-    """
+    # Retorna o texto simples para edição
+    details = [f"primeiro trecho em {job['first_text_at'] - job['created_at']:.1f} s" if job['first_text_at'] else None,
+               f"prompt de ~{job['prompt_tokens']} tokens" if job['prompt_tokens'] else None]
+    details = ", ".join(detail for detail in details if detail)
+    return job['result'], True, f"✅ Análise concluída em {job['finished_at'] - job['created_at']:.0f} s" + (f" ({details})." if details else ".")
 
-    daily_scores = driver_df.groupby(driver_df['data_evento'].dt.date)['score_final'].sum()
-    chart_data = {'x': [d.strftime('%Y-%m-%d') for d in daily_scores.index], 'y': daily_scores.values.tolist()}
+# Callback para cancelar a geração do relatório de IA
+@app.callback(
+    [Output('ai-report-poll', 'disabled', allow_duplicate=True), Output('ai-report-status', 'children', allow_duplicate=True)],
+    [Input('ai-report-cancel', 'n_clicks')],
+    [State('ai-report-job', 'data')],
+    prevent_initial_call=True
+)
+def cancel_ai_report(n_clicks, current_job):
+    if not n_clicks or not current_job:
+        raise dash.exceptions.PreventUpdate
+    cancel_ai_report_job(current_job['job_id'])
+    return True, "Geração da análise cancelada."
 
-    # Usa o texto editado do textarea, ou gera um novo se estiver vazio
-    if ai_report_text and ai_report_text.strip():
-        ai_text_html = markdown(ai_report_text, extensions=['extra'])
-    else:
-        # Gera um novo relatório se o textarea estiver vazio
-        ai_report_text = generate_virtual_instructor_report(selected_driver, driver_df)
-        ai_text_html = markdown(ai_report_text, extensions=['extra'])
+# Callback para iniciar os relatórios de IA da frota
+@app.callback(
+    [Output('fleet-report-job', 'data'), Output('fleet-report-poll', 'disabled'), Output('fleet-report-status', 'children')],
+    [Input('fleet-report-button', 'n_clicks')],
+    [State('fleet-report-top-n', 'value'), State('store-ranking-df', 'data'), State('fleet-report-job', 'data')],
+    prevent_initial_call=True
+)
+def start_fleet_reports(n_clicks, top_n, ranking_handle, current_job):
+    dataset = get_cached_dataset(ranking_handle)
+    if not n_clicks or dataset is None:
+        raise dash.exceptions.PreventUpdate
+    if current_job:
+        cancel_ai_report_job(current_job['job_id'])
+    job_id = submit_fleet_report_job(dataset, int(top_n) if top_n else None)
+    return {'job_id': job_id}, False, "⏳ Relatórios da frota na fila..."
 
-    list_html = "<div class='table-container'><table><thead><tr><th>Data e Hora - Violação</th><th>Info</th><th>Mapa</th></tr></thead><tbody>"
-    for _, row in driver_df.iterrows():
-        map_link = generate_maps_route_link(row.get('latitude_inicial'), row.get('longitude_inicial'), row.get('latitude_final'), row.get('longitude_final'))
-        
-        list_html += f"<tr><td>{row['data_evento'].strftime('%d/%m/%Y %H:%M:%S')} - {row['violacao']}</td><td>Duração: {row['duracao']} | Pontos: {f'{row['score_final']:.2f}'.replace('.', ',')}</td><td><a href='{map_link}' target='_blank'>Ver Percurso no Mapa</a></td></tr>"
-    list_html += "</tbody></table></div>"
+# Callback de acompanhamento dos relatórios de IA da frota
+@app.callback(
+    [Output('fleet-report-poll', 'disabled', allow_duplicate=True), Output('fleet-report-status', 'children', allow_duplicate=True)],
+    [Input('fleet-report-poll', 'n_intervals')],
+    [State('fleet-report-job', 'data')],
+    prevent_initial_call=True
+)
+def poll_fleet_reports(n_intervals, current_job):
+    job = get_ai_report_job(current_job['job_id']) if current_job else None
+    if job is None:
+        return True, "O job de relatórios não foi encontrado. Inicie novamente."
+    if job['status'] == 'queued':
+        return False, "⏳ Relatórios da frota na fila..."
+    if job['status'] == 'cancelled':
+        return True, "Geração dos relatórios cancelada. Os relatórios já concluídos podem ser baixados."
+    if job['status'] == 'error':
+        return True, f"Erro ao gerar os relatórios: {job['result']['error']}"
+
+    progress = job['result'] if job['status'] == 'done' else job['progress']
+    if progress is None:
+        return False, "🤖 Preparando os relatórios..."
+    completed = progress['ok'] + progress['errors']
+    message = f"{completed} de {progress['total']} relatórios ({progress['errors']} com erro)"
+    if job['status'] == 'done':
+        return True, f"✅ Concluído: {message} em {job['finished_at'] - job['created_at']:.0f} s."
+    return False, f"🤖 Gerando: {message}..."
+
+# Callback para cancelar os relatórios de IA da frota
+@app.callback(
+    [Output('fleet-report-poll', 'disabled', allow_duplicate=True), Output('fleet-report-status', 'children', allow_duplicate=True)],
+    [Input('fleet-report-cancel', 'n_clicks')],
+    [State('fleet-report-job', 'data')],
+    prevent_initial_call=True
+)
+def cancel_fleet_reports(n_clicks, current_job):
+    if not n_clicks or not current_job:
+        raise dash.exceptions.PreventUpdate
+    cancel_ai_report_job(current_job['job_id'])
+    return True, "Geração dos relatórios cancelada. Os relatórios já concluídos podem ser baixados."
 
-    html_string = f"""
+# Callback para baixar os relatórios da frota (inclusive parciais)
+@app.callback(
+    Output('fleet-report-download', 'data'),
+    [Input('fleet-report-download-btn', 'n_clicks')],
+    [State('fleet-report-job', 'data')],
+    prevent_initial_call=True
+)
+def download_fleet_reports(n_clicks, current_job):
+    job = get_ai_report_job(current_job['job_id']) if current_job else None
+    if job is None or not os.path.exists(job['path']):
+        raise dash.exceptions.PreventUpdate
+    return dcc.send_file(job['path'], filename='relatorios_ia_frota.jsonl')
+
+# --- EXPORTAÇÃO HTML DOS RELATÓRIOS ---
+# Um relatório HTML autocontido por motorista. O template é montado uma vez no import e a tabela de eventos é
+# formatada em bloco; na exportação da frota, os relatórios são renderizados em um pool de processos e gravados
+# um a um em um ZIP no disco, sem manter todos em memória.
+REPORT_EXPORT_MAX_WORKERS = int(os.getenv('REPORT_EXPORT_MAX_WORKERS', str(os.cpu_count() or 1)))
+REPORT_EXPORT_COLUMNS = ['data_evento', 'violacao', 'score_final']
+REPORT_EXPORT_IN_FLIGHT_PER_WORKER = 4
+REPORT_EXPORTS_DIR = os.getenv('REPORT_EXPORTS_DIR', os.path.join(tempfile.gettempdir(), 'driver-behavior-exports'))
+
+DRIVER_REPORT_HTML_TEMPLATE = """
     <html>
         <head>
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <meta charset="UTF-8">
-            <title>Relatório - {selected_driver}</title>
+            <title>Relatório - {driver_name}</title>
             <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
             <style>
                 body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif; margin: 0; padding: 15px; background-color: #111827; color: #E5E7EB; }}
@@ -1542,14 +2634,14 @@ def export_html(n_clicks, selected_driver, violations_json, ai_report_text):
         </head>
         <body>
             <div class="container">
-                <h1>Relatório de Desempenho - {selected_driver}</h1>
+                <h1>Relatório de Desempenho - {driver_name}</h1>
                 <div class="kpi-grid">{kpi_html}</div>
                 
                 <div class="chart-container">
                     <canvas id="reportChart"></canvas>
                 </div>
                 <div class="violation-list-container">
-                    <h4>Lista de Violações ({len(driver_df)} eventos)</h4>
+                    <h4>Lista de Violações ({event_count} eventos)</h4>
                     {list_html}
                 </div>
                 <div class="ai-report">
@@ -1567,10 +2659,10 @@ def export_html(n_clicks, selected_driver, violations_json, ai_report_text):
                 new Chart(ctx, {{
                     type: 'bar',
                     data: {{
-                        labels: {json.dumps(chart_data.get('x', []))},
+                        labels: {chart_labels},
                         datasets: [{{
                             label: 'Pontuação de Risco por Dia',
-                            data: {json.dumps(chart_data.get('y', []))},
+                            data: {chart_values},
                             backgroundColor: '#F59E0B'
                         }}]
                     }},
@@ -1584,8 +2676,221 @@ def export_html(n_clicks, selected_driver, violations_json, ai_report_text):
         </body>
     </html>
     """
-    
-    return dict(content=html_string, filename=f"relatorio_{selected_driver}.html")
+
+REPORT_MARKDOWN = threading.local()
+
+def render_report_markdown(text):
+    """Markdown -> HTML como markdown(text, extensions=['extra']), reaproveitando um conversor por thread."""
+    converter = getattr(REPORT_MARKDOWN, 'converter', None)
+    if converter is None:
+        from markdown import Markdown
+        converter = REPORT_MARKDOWN.converter = Markdown(extensions=['extra'])
+    return converter.reset().convert(text)
+
+def build_report_table_rows(df):
+    """Linha <tr> da lista de violações do relatório para cada evento de df (mesmo índice), formatadas em bloco."""
+    if df.empty:
+        return pd.Series(index=df.index, dtype=object)
+    formatted = format_violation_list_page(df)
+    return pd.Series(
+        ["<tr><td>" + (title if isinstance(title, str) else '') + "</td><td>" + details + "</td><td><a href='" + link + "' target='_blank'>Ver Percurso no Mapa</a></td></tr>"
+         for title, details, link in zip(formatted['titulo'], formatted['detalhes'], formatted['mapa'])],
+        index=df.index, dtype=object
+    )
+
+def render_driver_report_html(driver_name, driver_df, ai_report_text, table_rows=None):
+    """
+    HTML do relatório do motorista (KPIs, gráfico diário, lista de violações e análise do Instrutor Virtual).
+    table_rows traz as linhas da lista já formatadas por build_report_table_rows (calculadas aqui se omitidas).
+    """
+    driver_df = driver_df.sort_values('score_final', ascending=False)
+    if table_rows is None:
+        table_rows = build_report_table_rows(driver_df)
+    daily_scores = driver_df['score_final'].groupby(driver_df['data_evento'].dt.date.to_numpy()).sum()
+    main_violation = driver_df['violacao'].mode()[0] if not driver_df.empty else "Nenhuma"
+    worst_day = daily_scores.idxmax() if not daily_scores.empty else "N/A"
+
+    kpi_html = f"""
+        <div class="kpi-card"><h3>Total de Eventos</h3><p>{len(driver_df)}</p></div>
+        <div class="kpi-card"><h3>Violação Principal</h3><p>{main_violation}</p></div>
+        <div class="kpi-card"><h3>Dia de Maior Risco</h3><p>{worst_day.strftime('%d/%m') if worst_day != 'N/A' else 'N/A'}</p></div>
+    """
+    list_html = "<div class='table-container'><table><thead><tr><th>Data e Hora - Violação</th><th>Info</th><th>Mapa</th></tr></thead><tbody>" + "".join(table_rows.loc[driver_df.index]) + "</tbody></table></div>"
+
+    return DRIVER_REPORT_HTML_TEMPLATE.format(
+        driver_name=driver_name,
+        kpi_html=kpi_html,
+        event_count=len(driver_df),
+        list_html=list_html,
+        ai_text_html=render_report_markdown(ai_report_text),
+        chart_labels=json.dumps([d.strftime('%Y-%m-%d') for d in daily_scores.index]),
+        chart_values=json.dumps(daily_scores.values.tolist()),
+    )
+
+def report_archive_name(position, driver_name):
+    """Nome do arquivo do motorista dentro do ZIP: posição no ranking + nome sem caracteres problemáticos."""
+    safe_name = re.sub(r'[^\w\-. ]', '_', str(driver_name)).strip() or 'motorista'
+    return f"{position:04d}_relatorio_{safe_name}.html"
+
+def render_driver_report_file(position, driver_name, driver_df, ai_report_text):
+    """Tarefa do pool de processos: (nome no ZIP, HTML em bytes) de um motorista; driver_df traz a coluna 'linha_html'."""
+    html_string = render_driver_report_html(driver_name, driver_df, ai_report_text, table_rows=driver_df['linha_html'])
+    return report_archive_name(position, driver_name), html_string.encode('utf-8')
+
+def load_fleet_report_texts(path):
+    """Relatórios de IA bem-sucedidos de um arquivo JSON Lines da frota: {motorista: texto}."""
+    texts = {}
+    if not path or not os.path.exists(path):
+        return texts
+    with open(path, encoding='utf-8') as reports:
+        for line in reports:
+            record = json.loads(line)
+            if record['status'] == 'ok':
+                texts[record['motorista']] = record['relatorio']
+    return texts
+
+def export_fleet_reports_zip(dataset, output_path, top_n=None, ai_reports=None, max_workers=None, cancel_event=None, on_progress=None):
+    """
+    Grava em output_path um ZIP com o relatório HTML de cada motorista do ranking (todos ou os top_n de maior
+    pontuação). ai_reports ({motorista: texto}) traz as análises do Instrutor Virtual já geradas. Retorna o resumo.
+    """
+    ranking_df = dataset['ranking'].sort_values('Pontuação Total', ascending=False)
+    drivers = ranking_df['Motorista'].tolist()[:top_n] if top_n else ranking_df['Motorista'].tolist()
+    ai_reports = ai_reports or {}
+    missing_report = "_Análise do Instrutor Virtual não gerada para este motorista. Use \"Gerar Relatórios da Frota\" antes de exportar para incluí-la._"
+    summary = {'total': len(drivers), 'done': 0, 'path': output_path}
+
+    # Linhas da tabela de todos os motoristas exportados formatadas de uma vez; cada tarefa leva só as colunas necessárias
+    selected_df = dataset['violations'][dataset['violations']['motorista'].isin(drivers)]
+    export_df = selected_df[REPORT_EXPORT_COLUMNS].assign(linha_html=build_report_table_rows(selected_df))
+    positions_by_driver = selected_df.groupby('motorista', sort=False, observed=True).indices
+
+    def tasks():
+        for position, driver in enumerate(drivers, start=1):
+            driver_df = export_df.take(positions_by_driver.get(driver, []))
+            yield position, driver, driver_df, ai_reports.get(driver, missing_report)
+
+    workers = min(len(drivers), max_workers or REPORT_EXPORT_MAX_WORKERS)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        def write(name, content):
+            archive.writestr(name, content)
+            summary['done'] += 1
+            if on_progress is not None:
+                on_progress(summary)
+
+        if workers <= 1:
+            for task in tasks():
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                write(*render_driver_report_file(*task))
+            return summary
+
+        # Janela limitada de tarefas em andamento: só alguns motoristas ficam em memória de cada vez. O job roda em
+        # uma thread do servidor, então os processos não saem de um fork (ver PROCESS_POOL_CONTEXT)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=PROCESS_POOL_CONTEXT) as executor:
+            pending = set()
+            for task in tasks():
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                pending.add(executor.submit(render_driver_report_file, *task))
+                if len(pending) >= workers * REPORT_EXPORT_IN_FLIGHT_PER_WORKER:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        write(*future.result())
+            for future in as_completed(pending):
+                write(*future.result())
+    return summary
+
+def run_fleet_export_job(job, dataset, top_n, ai_reports):
+    if not mark_report_job_running(job):
+        return
+    try:
+        summary = export_fleet_reports_zip(dataset, job['path'], top_n=top_n, ai_reports=ai_reports, cancel_event=job['cancel_event'], on_progress=lambda progress: job.update(progress=dict(progress)))
+        status = 'done'
+    except Exception as e:
+        print(f"Erro no job de exportação da frota {job['job_id']}: {e}")
+        summary, status = {'error': str(e)}, 'error'
+    finish_report_job(job, summary, status)
+
+def submit_fleet_export_job(dataset, top_n=None, ai_reports=None):
+    """Coloca a exportação HTML da frota na fila; o ZIP vai para um arquivo em REPORT_EXPORTS_DIR."""
+    path = os.path.join(REPORT_EXPORTS_DIR, f'relatorios_html_frota_{uuid.uuid4().hex}.zip')
+    return submit_report_job(FLEET_JOB_EXECUTOR, run_fleet_export_job, dataset, top_n, ai_reports, path=path, progress=None)
+
+# O ZIP pode ter centenas de MB: sai do disco pelo Flask, em vez de ir em base64 na resposta do callback
+@server.route('/exports/fleet/<job_id>')
+def download_fleet_export(job_id):
+    job = get_ai_report_job(job_id)
+    if job is None or job['status'] != 'done' or not os.path.exists(job['path']):
+        return jsonify(error='Exportação não encontrada (expirada ou ainda em andamento).'), 404
+    return send_file(job['path'], mimetype='application/zip', as_attachment=True, download_name='relatorios_html_frota.zip')
+
+# Callback para iniciar a exportação HTML da frota
+@app.callback(
+    [Output('fleet-export-job', 'data'), Output('fleet-export-poll', 'disabled'), Output('fleet-export-status', 'children')],
+    [Input('fleet-export-button', 'n_clicks')],
+    [State('fleet-report-top-n', 'value'), State('store-ranking-df', 'data'), State('fleet-report-job', 'data'), State('fleet-export-job', 'data')],
+    prevent_initial_call=True
+)
+def start_fleet_export(n_clicks, top_n, ranking_handle, fleet_report_job, current_job):
+    dataset = get_cached_dataset(ranking_handle)
+    if not n_clicks or dataset is None:
+        raise dash.exceptions.PreventUpdate
+    if current_job:
+        cancel_ai_report_job(current_job['job_id'])
+    # Aproveita as análises de IA da última geração da frota, se houver
+    report_job = get_ai_report_job(fleet_report_job['job_id']) if fleet_report_job else None
+    ai_reports = load_fleet_report_texts(report_job['path']) if report_job else {}
+    job_id = submit_fleet_export_job(dataset, int(top_n) if top_n else None, ai_reports)
+    return {'job_id': job_id}, False, "⏳ Exportação HTML na fila..."
+
+# Callback de acompanhamento da exportação HTML da frota (ao terminar, mostra o link do ZIP)
+@app.callback(
+    [Output('fleet-export-poll', 'disabled', allow_duplicate=True), Output('fleet-export-status', 'children', allow_duplicate=True)],
+    [Input('fleet-export-poll', 'n_intervals')],
+    [State('fleet-export-job', 'data')],
+    prevent_initial_call=True
+)
+def poll_fleet_export(n_intervals, current_job):
+    job = get_ai_report_job(current_job['job_id']) if current_job else None
+    if job is None:
+        return True, "O job de exportação não foi encontrado. Inicie novamente."
+    if job['status'] == 'queued':
+        return False, "⏳ Exportação HTML na fila..."
+    if job['status'] == 'cancelled':
+        return True, "Exportação cancelada."
+    if job['status'] == 'error':
+        return True, f"Erro ao exportar os relatórios: {job['result']['error']}"
+    if job['status'] == 'done':
+        result = job['result']
+        message = f"✅ {result['done']} relatórios exportados em {job['finished_at'] - job['created_at']:.0f} s."
+        return True, [message, ' ', html.A('Baixar ZIP', href=f"/exports/fleet/{job['job_id']}", style={'color': colors['accent_green']})]
+    progress = job['progress']
+    return False, f"📦 Exportando: {progress['done'] if progress else 0} de {progress['total'] if progress else '?'} relatórios..."
+
+# Callback para exportação HTML
+@app.callback(
+    [Output("download-html", "data"), Output('ai-report-status', 'children', allow_duplicate=True)],
+    Input("btn-export-html", "n_clicks"),
+    [State('driver-dropdown', 'value'), 
+     State('store-violations-df', 'data'),
+     State('ai-report-output', 'value')], 
+    prevent_initial_call=True,
+)
+def export_html(n_clicks, selected_driver, violations_handle, ai_report_text):
+    dataset = get_cached_dataset(violations_handle)
+    if n_clicks is None or n_clicks == 0 or not selected_driver or dataset is None:
+        raise dash.exceptions.PreventUpdate
+
+    driver_df = get_driver_violations(dataset, selected_driver)
+
+    # Usa o texto (editado) do textarea; a análise é gerada pelo job em segundo plano, nunca dentro deste callback
+    if not (ai_report_text and ai_report_text.strip()):
+        return dash.no_update, "Gere a análise do Instrutor Virtual (ou escreva o texto no campo) antes de exportar o HTML."
+
+    html_string = render_driver_report_html(selected_driver, driver_df, ai_report_text)
+    return dict(content=html_string, filename=f"relatorio_{selected_driver}.html"), dash.no_update
 
 # Callback para acionar a impressão para PDF
 @app.callback(
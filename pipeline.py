@@ -0,0 +1,985 @@
+"""
+Pipeline de dados sem interface: leitura e normalização do CSV de telemetria, pontuação de gravidade e rankings.
+Não importa Dash nem Plotly; é usado pelo dashboard (main.py) e pode rodar sozinho em jobs agendados:
+
+    python -m pipeline exportacao.csv --config gravidade.json --output-dir saida --format parquet
+    cat exportacao.csv | python -m pipeline --streaming --format json --output-dir saida
+"""
+import argparse
+import base64
+import bisect
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # Sem pyarrow o cache em disco dos arquivos normalizados e a saída em Parquet ficam desativados
+    pa = feather = None
+
+load_dotenv()
+
+# --- CONFIGURAÇÃO DA LÓGICA DE GRAVIDADE (VALORES PADRÃO) ---
+DEFAULT_GRAVITY_CONFIG = {
+    "Velocidade_Excessiva_Rodovia": {
+        "base_weight": 0.2, "speed_increment": 5, "speed_factor": 0.2,
+        "speed_factor_high": 0.4, "speed_threshold_high": 100,
+        "duration_increment": 10, "duration_factor": 0.1,
+    },
+    "Velocidade_Excessiva_Serra": {
+        "base_weight": 0.1, "speed_increment": 5, "speed_factor": 0.1,
+        "speed_factor_high": 0.2, "speed_threshold_high": 65,
+        "duration_increment": 10, "duration_factor": 0.05,
+    },
+    "Velocidade_Excessiva_Patio": {
+        "base_weight": 0.1, "speed_increment": 5, "speed_factor": 0.1,
+        "duration_increment": 10, "duration_factor": 0.05,
+    },
+    "Marcha_lenta": {
+        "base_weight": 0.1, "duration_increment": 1200, "duration_factor": 0.1, # 20 minutos
+        "min_duration_filter": 600 # 10 minutos
+    },
+    "Freada_Brusca": {
+        "base_weight": 0.1,
+    },
+    "RPM_Excessiva": {
+        "base_weight": 0.07, "duration_increment": 30, "duration_factor": 0.07,
+    },
+    "Faixa_Verde": {
+        "base_weight": 0.07, "duration_increment": 180, "duration_factor": 0.07, # 3 minutos
+    },
+    "Freio_Motor": {
+        "base_weight": 0.07, "duration_increment": 120, "duration_factor": 0.07, # 2 minutos
+    }
+}
+# Tipos de violações que serão processadas. "Banguela" foi removida.
+VIOLATION_TYPES = ["Velocidade excessiva", "Marcha lenta", "Freada brusca", "RPM excessiva", "Faixa verde", "Freio motor"]
+
+# Classificação das violações por categoria
+VIOLATION_CATEGORIES = {
+    "Econômica": ["Freio motor", "RPM excessiva", "Marcha lenta", "Faixa verde"],
+    "Segurança": ["Velocidade excessiva", "Freada brusca"]
+}
+
+# --- MÉTRICAS DE DESEMPENHO (FORMATO PROMETHEUS) ---
+# Cada etapa do pipeline registra duração, linhas e bytes do resultado em histogramas em memória, que o dashboard
+# expõe em texto na rota /metrics. As métricas são por processo: etapas executadas nos processos do pool de
+# ingestão não aparecem (só a ingestão como um todo).
+METRICS_PREFIX = 'driver_behavior'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+ROWS_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000, 1_000_000_000)
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Histogram:
+    """Histograma cumulativo do Prometheus com um rótulo; cada valor do rótulo é uma série."""
+
+    def __init__(self, name, description, label, buckets):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            series['counts'][index] += 1
+            series['sum'] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series_items = sorted((label_value, list(series['counts']), series['sum']) for label_value, series in self._series.items())
+        for label_value, counts, total in series_items:
+            label = f'{self.label}="{escape_label_value(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {total!r}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+STAGE_DURATION = Histogram(f'{METRICS_PREFIX}_stage_duration_seconds', 'Duração de cada etapa do pipeline.', 'stage', DURATION_BUCKETS)
+STAGE_ROWS = Histogram(f'{METRICS_PREFIX}_stage_rows', 'Linhas no resultado de cada etapa do pipeline.', 'stage', ROWS_BUCKETS)
+STAGE_BYTES = Histogram(f'{METRICS_PREFIX}_stage_bytes', 'Bytes no resultado de cada etapa do pipeline.', 'stage', BYTES_BUCKETS)
+# Memória real (deep) do dataset do dashboard antes e depois do esquema compacto, a cada ingestão
+DATASET_MEMORY_BYTES = Histogram(f'{METRICS_PREFIX}_dataset_memory_bytes', 'Memória do dataset ingerido, no esquema original e no compacto.', 'schema', BYTES_BUCKETS)
+STAGE_FAILURES = {}
+STAGE_FAILURES_LOCK = threading.Lock()
+
+# Etapas executadas na requisição atual (só quando o servidor ativa o trace por requisição)
+STAGE_TRACE = threading.local()
+
+def measure_value(value):
+    """(linhas, bytes) de um DataFrame, Series, array ou bytes; (None, None) para os demais tipos."""
+    if isinstance(value, pd.DataFrame):
+        return len(value), int(value.memory_usage(index=False).sum())
+    if isinstance(value, (pd.Series, np.ndarray)):
+        return len(value), int(value.nbytes)
+    if isinstance(value, (bytes, bytearray)):
+        return None, len(value)
+    return None, None
+
+def measure_stage_output(result):
+    """
+    Linhas e bytes do resultado de uma etapa. Em tuplas, listas e dicionários (sem descer mais de um nível)
+    as linhas são as do primeiro item com linhas, ou a chave 'rows', e os bytes são somados.
+    """
+    if not isinstance(result, (tuple, list, dict)):
+        return measure_value(result)
+    items = list(result.values()) if isinstance(result, dict) else list(result)
+    measured = [measure_value(item) for item in items]
+    rows = next((item_rows for item_rows, _ in measured if item_rows is not None), None)
+    if isinstance(result, dict) and isinstance(result.get('rows'), int):
+        rows = result['rows']
+    sizes = [item_bytes for _, item_bytes in measured if item_bytes is not None]
+    return rows, (sum(sizes) if sizes else None)
+
+def record_stage(stage, seconds, result):
+    rows, size_bytes = measure_stage_output(result)
+    STAGE_DURATION.observe(stage, seconds)
+    if rows is not None:
+        STAGE_ROWS.observe(stage, rows)
+    if size_bytes is not None:
+        STAGE_BYTES.observe(stage, size_bytes)
+    trace = getattr(STAGE_TRACE, 'stages', None)
+    if trace is not None:
+        trace.append({'stage': stage, 'seconds': round(seconds, 6), 'rows': rows, 'bytes': size_bytes})
+
+def instrumented_stage(stage):
+    """Decorador das etapas do pipeline: registra duração, linhas e bytes do resultado; falhas só são contadas."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                with STAGE_FAILURES_LOCK:
+                    STAGE_FAILURES[stage] = STAGE_FAILURES.get(stage, 0) + 1
+                raise
+            record_stage(stage, time.perf_counter() - start, result)
+            return result
+        return wrapper
+    return decorator
+
+# --- FUNÇÕES DE PROCESSAMENTO DE DADOS ---
+
+def dms_to_dd(dms_str):
+    if not isinstance(dms_str, str): return None
+    try:
+        parts = re.findall(r'[\d,.]+|[NSLOEWnsloew]', dms_str)
+        if len(parts) < 4: raise ValueError("Formato DMS inválido")
+        degrees = float(parts[0].replace(',', '.'))
+        minutes = float(parts[1].replace(',', '.'))
+        seconds = float(parts[2].replace(',', '.'))
+        direction = parts[3].upper()
+        dd = degrees + minutes / 60 + seconds / 3600
+        if direction in ['S', 'SUL', 'W', 'O', 'OESTE']: dd = -dd
+        return dd
+    except (ValueError, IndexError):
+        try: return float(dms_str.replace(',', '.'))
+        except (ValueError, TypeError): return None
+
+# Formato canônico das exportações (ex: "26° 38´ 24´´ Sul"); o que não casar cai no dms_to_dd
+DMS_PATTERN = r'^\s*(\d+)\s*°\s*(\d+)\s*´\s*(\d+(?:[.,]\d+)?)\s*´´\s*([NSLOEWnsloew]).*$'
+
+@instrumented_stage('decode_coordinates')
+def decode_coordinate_columns(df, columns):
+    """
+    Converte várias colunas de coordenadas DMS para graus decimais de uma só vez.
+    Cada string distinta é decodificada uma única vez (pátios e garagens se repetem milhares de vezes),
+    com um str.extract vetorizado para o formato canônico e o dms_to_dd como fallback.
+    """
+    columns = [col for col in columns if col in df.columns]
+    if not columns:
+        return {}
+    stacked = pd.concat([df[col] for col in columns], ignore_index=True)
+    codes, uniques = pd.factorize(stacked)
+    uniques = pd.Series(uniques, dtype=object)
+
+    values = np.full(len(uniques), np.nan)
+    is_str = uniques.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    str_uniques = uniques[is_str].astype(str)
+    parts = str_uniques.str.extract(DMS_PATTERN)
+    matched = parts[0].notna()
+
+    canonical = parts[matched]
+    degrees = canonical[0].astype(float)
+    minutes = canonical[1].astype(float)
+    seconds = canonical[2].str.replace(',', '.', regex=False).astype(float)
+    dd = degrees + minutes / 60 + seconds / 3600
+    dd[canonical[3].str.upper().isin(['S', 'W', 'O'])] *= -1
+    values[dd.index.to_numpy()] = dd.to_numpy()
+
+    for i, dms_str in str_uniques[~matched].items():
+        parsed = dms_to_dd(dms_str)
+        values[i] = np.nan if parsed is None else parsed
+
+    # Código -1 = célula nula; numa coluna só de nulos, values fica vazio
+    decoded = np.full(len(codes), np.nan)
+    present = codes >= 0
+    decoded[present] = values[codes[present]]
+    return {col: decoded[i * len(df):(i + 1) * len(df)] for i, col in enumerate(columns)}
+
+def convert_seconds_to_hhmm(seconds):
+    """Converte segundos em formato HH:MM"""
+    if pd.isna(seconds) or seconds == 0:
+        return "00:00"
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    return f"{hours:02d}:{minutes:02d}"
+
+def format_datetimes_br(series):
+    """Formata datas como dd/mm/aaaa hh:mm:ss em bloco (equivalente a dt.strftime, sem o custo por elemento)."""
+    iso = pd.Series(series.to_numpy(dtype='datetime64[s]').astype(str), index=series.index, dtype='str')
+    formatted = iso.str[8:10] + '/' + iso.str[5:7] + '/' + iso.str[0:4] + ' ' + iso.str[11:19]
+    return formatted.where(series.notna())
+
+def convert_duration_to_seconds(duration_str):
+    if not isinstance(duration_str, str): return 0
+    try:
+        h, m, s = map(int, duration_str.split(':'))
+        return h * 3600 + m * 60 + s
+    except (ValueError, TypeError): return 0
+
+def generate_maps_route_link(lat_i, lon_i, lat_f, lon_f):
+    if pd.isna(lat_i) or pd.isna(lon_i) or pd.isna(lat_f) or pd.isna(lon_f):
+        return "Percurso indisponível"
+    if lat_i == lat_f and lon_i == lon_f:
+        return f"https://www.google.com/maps?q={lat_i},{lon_i}"
+    return f"https://www.google.com/maps/dir/{lat_i},{lon_i}/{lat_f},{lon_f}"
+
+def clean_column_names(df):
+    new_columns = {col: col.strip().lower().replace(' ', '_').replace('ã', 'a').replace('ç', 'c') for col in df.columns}
+    df = df.rename(columns=new_columns)
+    rename_map = {
+        'latitude_inicial': 'latitude_inicial', 'longitude_inicial': 'longitude_inicial',
+        'latitude_final': 'latitude_final', 'longitude_final': 'longitude_final',
+        'data_inicial_da_violacao': 'data_evento'
+    }
+    df = df.rename(columns=rename_map)
+    return df
+    
+def calculate_event_gravity_factor(row, gravity_config):
+    """Calcula o Fator de Gravidade para uma única violação (linha). Referência do motor vetorizado."""
+    viol_type = row.get('violacao')
+    factor = 1.0
+    duration = row.get('duracao_seconds', 0)
+
+    if viol_type == "Velocidade excessiva":
+        limite = row.get('valor_final_da_velocidade_configurada', 0)
+        # Categoriza a violação
+        if limite <= 20: conf = gravity_config["Velocidade_Excessiva_Patio"]
+        elif limite <= 40: conf = gravity_config["Velocidade_Excessiva_Serra"]
+        else: conf = gravity_config["Velocidade_Excessiva_Rodovia"]
+        
+        extrapolation = row.get('velocidade_maxima', 0) - limite
+        if extrapolation > 0 and conf.get('speed_increment', 0) > 0:
+            speed_multiplier = conf.get('speed_factor_high', conf['speed_factor']) if 'speed_threshold_high' in conf and row.get('velocidade_maxima', 0) > conf['speed_threshold_high'] else conf['speed_factor']
+            factor += (extrapolation / conf['speed_increment']) * speed_multiplier
+        if duration > 0 and conf.get('duration_increment', 0) > 0:
+            factor += (duration / conf['duration_increment']) * conf.get('duration_factor')
+            
+    elif viol_type == "Marcha lenta":
+        conf = gravity_config["Marcha_lenta"]
+        if duration >= conf.get('min_duration_filter', 600) and row.get('pedal_de_freio', '').lower() != 'sim' and conf.get('duration_increment', 0) > 0:
+            factor += (duration / conf['duration_increment']) * conf.get('duration_factor')
+            
+    elif viol_type in ["RPM excessiva", "Freio motor", "Faixa verde"]:
+        conf_map = {"RPM excessiva": "RPM_Excessiva", "Freio motor": "Freio_Motor", "Faixa verde": "Faixa_Verde"}
+        conf = gravity_config[conf_map[viol_type]]
+        if duration > 0 and conf.get('duration_increment', 0) > 0:
+             factor += (duration / conf['duration_increment']) * conf.get('duration_factor')
+
+    elif viol_type == "Freada brusca":
+        # Freada brusca não tem fator de gravidade, pontuação fixa de 0.1 por violação
+        factor = 0.0
+        
+    return factor
+
+BASE_WEIGHT_CONFIG_KEYS = {"Marcha lenta": "Marcha_lenta", "Freada brusca": "Freada_Brusca", "RPM excessiva": "RPM_Excessiva", "Faixa verde": "Faixa_Verde", "Freio motor": "Freio_Motor"}
+DURATION_CONFIG_KEYS = {"RPM excessiva": "RPM_Excessiva", "Freio motor": "Freio_Motor", "Faixa verde": "Faixa_Verde"}
+
+def get_base_weight(viol_type, limite, gravity_config):
+    """Retorna o peso base de uma única violação (versão linha a linha, usada como referência)."""
+    if viol_type == 'Velocidade excessiva':
+        if limite <= 20: return gravity_config["Velocidade_Excessiva_Patio"]['base_weight']
+        elif limite > 20 and limite <= 40: return gravity_config["Velocidade_Excessiva_Serra"]['base_weight']
+        else: return gravity_config["Velocidade_Excessiva_Rodovia"]['base_weight']
+    else:
+        key = BASE_WEIGHT_CONFIG_KEYS.get(viol_type)
+        return gravity_config.get(key, {}).get('base_weight', 0)
+
+# --- MOTOR DE PONTUAÇÃO VETORIZADO ---
+# Reproduz exatamente calculate_event_gravity_factor/get_base_weight, mas para todas as linhas de uma vez.
+
+def _numeric_array(df, col):
+    """Retorna a coluna como array float64 (zeros se a coluna não existir), como o row.get(col, 0)."""
+    if col not in df.columns:
+        return np.zeros(len(df))
+    return df[col].to_numpy(dtype=np.float64)
+
+def get_violation_masks(df):
+    """Retorna uma máscara booleana por tipo de violação, fatorando a coluna uma única vez."""
+    codes, uniques = pd.factorize(df['violacao'])
+    empty = np.zeros(len(df), dtype=bool)
+    return {viol_type: codes == uniques.get_loc(viol_type) if viol_type in uniques else empty for viol_type in VIOLATION_TYPES}
+
+def get_speed_tier_masks(df, speed_mask):
+    """Separa as linhas de Velocidade excessiva em Pátio/Serra/Rodovia pelo limite configurado."""
+    limite = _numeric_array(df, 'valor_final_da_velocidade_configurada')
+    return {
+        "Velocidade_Excessiva_Patio": speed_mask & (limite <= 20),
+        "Velocidade_Excessiva_Serra": speed_mask & (limite > 20) & (limite <= 40),
+        "Velocidade_Excessiva_Rodovia": speed_mask & ~(limite <= 40),
+    }
+
+def calculate_gravity_factors(df, gravity_config, violation_masks=None):
+    """Calcula o Fator de Gravidade de todas as violações com máscaras de coluna."""
+    masks = violation_masks if violation_masks is not None else get_violation_masks(df)
+    duration = _numeric_array(df, 'duracao_seconds')
+    factor = np.ones(len(df))
+
+    limite = _numeric_array(df, 'valor_final_da_velocidade_configurada')
+    velocidade_maxima = _numeric_array(df, 'velocidade_maxima')
+    extrapolation = velocidade_maxima - limite
+    for conf_key, tier_mask in get_speed_tier_masks(df, masks["Velocidade excessiva"]).items():
+        conf = gravity_config[conf_key]
+        if conf.get('speed_increment', 0) > 0:
+            mask = tier_mask & (extrapolation > 0)
+            speed_multiplier = np.full(len(df), conf['speed_factor'], dtype=np.float64)
+            if 'speed_threshold_high' in conf:
+                speed_multiplier[velocidade_maxima > conf['speed_threshold_high']] = conf.get('speed_factor_high', conf['speed_factor'])
+            factor[mask] += (extrapolation[mask] / conf['speed_increment']) * speed_multiplier[mask]
+        if conf.get('duration_increment', 0) > 0:
+            mask = tier_mask & (duration > 0)
+            factor[mask] += (duration[mask] / conf['duration_increment']) * conf.get('duration_factor')
+
+    conf = gravity_config["Marcha_lenta"]
+    marcha_mask = masks["Marcha lenta"]
+    if marcha_mask.any() and conf.get('duration_increment', 0) > 0:
+        freio_acionado = np.zeros(len(df), dtype=bool)
+        if 'pedal_de_freio' in df.columns:
+            pedal = df['pedal_de_freio'][marcha_mask].astype(str).str.lower()
+            freio_acionado[marcha_mask] = (pedal == 'sim').to_numpy(dtype=bool)
+        mask = marcha_mask & (duration >= conf.get('min_duration_filter', 600)) & ~freio_acionado
+        factor[mask] += (duration[mask] / conf['duration_increment']) * conf.get('duration_factor')
+
+    for viol_type, conf_key in DURATION_CONFIG_KEYS.items():
+        conf = gravity_config[conf_key]
+        if conf.get('duration_increment', 0) > 0:
+            mask = masks[viol_type] & (duration > 0)
+            factor[mask] += (duration[mask] / conf['duration_increment']) * conf.get('duration_factor')
+
+    # Freada brusca não tem fator de gravidade, pontuação fixa de 0.1 por violação
+    factor[masks["Freada brusca"]] = 0.0
+    return factor
+
+def calculate_base_weights(df, gravity_config, violation_masks=None):
+    """Retorna o peso base de todas as violações de acordo com o tipo e a faixa de velocidade."""
+    masks = violation_masks if violation_masks is not None else get_violation_masks(df)
+    base_weights = np.zeros(len(df))
+    for conf_key, tier_mask in get_speed_tier_masks(df, masks["Velocidade excessiva"]).items():
+        base_weights[tier_mask] = gravity_config[conf_key]['base_weight']
+    for viol_type, conf_key in BASE_WEIGHT_CONFIG_KEYS.items():
+        base_weights[masks[viol_type]] = gravity_config.get(conf_key, {}).get('base_weight', 0)
+    return base_weights
+
+def calculate_final_scores(df, gravity_config, violation_masks=None):
+    """Calcula o score_final (peso base x fator de gravidade) de todas as violações."""
+    masks = violation_masks if violation_masks is not None else get_violation_masks(df)
+    scores = calculate_base_weights(df, gravity_config, masks) * df['fator_gravidade_evento'].to_numpy(dtype=np.float64)
+    # Correção especial para Freada brusca: apenas base_weight por violação, sem multiplicadores
+    freada_brusca_mask = masks["Freada brusca"]
+    if freada_brusca_mask.any():
+        scores[freada_brusca_mask] = gravity_config.get('Freada_Brusca', {}).get('base_weight', 0.1)
+    return scores
+
+@instrumented_stage('decode_upload')
+def decode_upload_contents(contents):
+    """Decodifica o data URL base64 entregue pelo dcc.Upload."""
+    content_type, content_string = contents.split(',')
+    return base64.b64decode(content_string)
+
+def parse_violations_csv(source):
+    """
+    Lê e normaliza o CSV de violações: limpeza de colunas, datas, RPM, números, coordenadas e duração.
+    Aceita os bytes do arquivo ou o caminho de um arquivo em disco (uploads grandes).
+    Nada aqui depende da configuração de gravidade, então o resultado pode ser reaproveitado entre recálculos.
+    """
+    return add_violation_counts(read_violations_csv(source))
+
+def read_violations_csv(source):
+    """Lê e normaliza um CSV (bytes ou caminho), sem a contagem por motorista, que depende do dataset completo."""
+    return normalize_violations(read_raw_csv(source))
+
+@instrumented_stage('read_csv')
+def read_raw_csv(source):
+    """Leitura do CSV exportado, sem nenhuma normalização."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return pd.read_csv(source, delimiter=';', encoding='utf-8', on_bad_lines='warn')
+
+@instrumented_stage('normalize')
+def normalize_violations(df):
+    """Normaliza um DataFrame lido do CSV (o arquivo inteiro ou um bloco dele)."""
+    df = clean_column_names(df.fillna(0))
+    
+    # Adicionar índice da linha do CSV (começando de 2 para considerar o header como linha 1)
+    df['linha_csv'] = df.index + 2
+
+    df = df[df['violacao'].isin(VIOLATION_TYPES)]
+
+    if 'data_evento' not in df.columns: raise ValueError('Coluna de data ("Data inicial da violação") não encontrada.')
+    df['data_evento'] = pd.to_datetime(df['data_evento'], dayfirst=True, errors='coerce')
+    df = df.dropna(subset=['data_evento'])
+
+    # Remover pontos dos valores de rpm_máximo de forma inteligente
+    # Se termina com .0, remove apenas o .0
+    # Se tem ponto no meio (como 1.644), remove o ponto
+    for rpm_col in ['rpm_máximo', 'rpm_maximo']:
+        if rpm_col in df.columns:
+            series = pd.Series(df[rpm_col]).astype(str)
+            series = series.str.replace(r'\.0$', '', regex=True)  # Remove .0 no final
+            series = series.str.replace('.', '', regex=False)  # Remove outros pontos
+            df[rpm_col] = series
+
+    numeric_cols = ['velocidade_maxima', 'valor_final_da_velocidade_configurada', 'rpm_maximo', 'valor_final_do_rpm_configurado', 'distancia', 'velocidade_inicial', 'velocidade_final']
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+            df[col] = df[col].fillna(0)
+
+    if 'rpm_máximo' in df.columns:
+        df['rpm_máximo'] = pd.to_numeric(df['rpm_máximo'], errors='coerce')
+        df['rpm_máximo'] = df['rpm_máximo'].fillna(0)
+
+    coord_cols = ['latitude_inicial', 'longitude_inicial', 'latitude_final', 'longitude_final']
+    for col, values in decode_coordinate_columns(df, coord_cols).items():
+        df[col] = values
+    
+    df['duracao_seconds'] = df['duracao'].apply(convert_duration_to_seconds)
+    return df
+
+@instrumented_stage('count_violations')
+def add_violation_counts(df):
+    """Contagem de violações por motorista e tipo (para referência, mas não para multiplicação)."""
+    counts = df.groupby(['motorista', 'violacao'], observed=True).size().reset_index(name='qtd_violacoes')
+    return pd.merge(df, counts, on=['motorista', 'violacao'], how='left')
+
+@instrumented_stage('score')
+def score_violations(df, gravity_config):
+    """Etapa de pontuação: adiciona fator_gravidade_evento e score_final ao dataset normalizado."""
+    masks = get_violation_masks(df)
+    df = df.assign(fator_gravidade_evento=calculate_gravity_factors(df, gravity_config, masks))
+    # Cada violação tem pontuação individual baseada em seu próprio fator de gravidade
+    df['score_final'] = calculate_final_scores(df, gravity_config, masks)
+    return df
+
+# Seções da configuração de gravidade -> tipo de violação que elas pontuam
+CONFIG_SECTION_VIOLATION_TYPES = {
+    "Velocidade_Excessiva_Rodovia": "Velocidade excessiva",
+    "Velocidade_Excessiva_Serra": "Velocidade excessiva",
+    "Velocidade_Excessiva_Patio": "Velocidade excessiva",
+    **{conf_key: viol_type for viol_type, conf_key in BASE_WEIGHT_CONFIG_KEYS.items()},
+}
+
+def get_changed_violation_types(old_config, new_config):
+    """Retorna os tipos de violação cujos parâmetros de gravidade mudaram."""
+    return {viol_type for section, viol_type in CONFIG_SECTION_VIOLATION_TYPES.items() if old_config.get(section) != new_config.get(section)}
+
+@instrumented_stage('rescore')
+def rescore_violations(scored_df, old_config, new_config):
+    """Recalcula a pontuação apenas das linhas cujos tipos de violação tiveram parâmetros alterados."""
+    changed_types = get_changed_violation_types(old_config, new_config)
+    if not changed_types:
+        return scored_df
+    mask = scored_df['violacao'].isin(changed_types).to_numpy()
+    subset = scored_df[mask]
+    masks = get_violation_masks(subset)
+    factors = scored_df['fator_gravidade_evento'].to_numpy(dtype=np.float64, copy=True)
+    scores = scored_df['score_final'].to_numpy(dtype=np.float64, copy=True)
+    factors[mask] = calculate_gravity_factors(subset, new_config, masks)
+    scores[mask] = calculate_final_scores(subset.assign(fator_gravidade_evento=factors[mask]), new_config, masks)
+    return scored_df.assign(fator_gravidade_evento=factors, score_final=scores)
+
+# --- ESQUEMA COMPACTO DO DATASET EM MEMÓRIA ---
+# O dataset que fica em cache no servidor guarda só as colunas usadas pelo dashboard, relatórios e API, com tipos
+# menores: categorias para textos repetidos e inteiros/decimais de 32 bits quando a conversão não perde nada. As
+# colunas frias continuam no CSV original, no cache em disco dos arquivos normalizados e na saída do CLI.
+COLD_COLUMNS = [
+    'nome_da_conta', 'número_do_veículo', 'cpf', 'data_final_da_violacao', 'hodômetro_inicial', 'hodômetro_final',
+    'posicao_do_acelerador', 'velocidade_inicial', 'velocidade_final', 'valor_inicial_da_velocidade_configurada',
+    'rpm_inicial', 'rpm_final', 'valor_inicial_do_rpm_configurado', 'valor_final_do_rpm_configurado',
+]
+CATEGORY_COLUMNS = ['motorista', 'violacao', 'nome_do_veículo', 'duracao', 'distância', 'pedal_de_freio', 'arquivo_origem']
+# Motorista e veículo vazios no CSV (0 depois do fillna) ficam sem categoria em vez de virar o texto '0': como no
+# dataset original, essas linhas não entram nos rankings nem no índice de linhas
+BLANK_KEY_COLUMNS = ['motorista', 'nome_do_veículo']
+# Somatórios dos rankings e recálculos partem destas colunas, que ficam sempre em float64
+FLOAT64_COLUMNS = ['fator_gravidade_evento', 'score_final']
+
+def downcast_numeric(series):
+    """Versão int32/float32 da coluna se os valores voltarem idênticos ao tipo original; senão, a própria coluna."""
+    if pd.api.types.is_integer_dtype(series.dtype) and series.dtype.itemsize > 4:
+        if series.empty or (series.min() >= np.iinfo(np.int32).min and series.max() <= np.iinfo(np.int32).max):
+            return series.astype(np.int32)
+    elif pd.api.types.is_float_dtype(series.dtype) and series.dtype.itemsize > 4:
+        values = series.to_numpy()
+        compact = values.astype(np.float32)
+        if np.array_equal(compact.astype(values.dtype), values, equal_nan=True):
+            return pd.Series(compact, index=series.index, name=series.name)
+    return series
+
+def dataset_memory_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+@instrumented_stage('compact')
+def compact_violations(df):
+    """Aplica o esquema compacto ao dataset pontuado (mesmos valores, menos memória)."""
+    DATASET_MEMORY_BYTES.observe('original', dataset_memory_bytes(df))
+    df = df.drop(columns=[col for col in df.columns if col in COLD_COLUMNS or col.startswith('unnamed')])
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if col in CATEGORY_COLUMNS and not pd.api.types.is_numeric_dtype(series.dtype):
+            text = series.astype(str)
+            if col in BLANK_KEY_COLUMNS:
+                text = text.where(series.map(bool))
+            columns[col] = text.astype('category')
+        elif col not in FLOAT64_COLUMNS and pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            columns[col] = downcast_numeric(series)
+        else:
+            columns[col] = series
+    compact_df = pd.DataFrame(columns, index=df.index)
+    DATASET_MEMORY_BYTES.observe('compact', dataset_memory_bytes(compact_df))
+    return compact_df
+
+# --- AGREGAÇÃO POR BLOCOS ---
+# Os somatórios são feitos primeiro por bloco de linhas do CSV e depois somados entre blocos. O processamento
+# em memória e o processamento em partes (arquivos maiores que a RAM) percorrem exatamente os mesmos blocos
+# na mesma ordem, então os rankings dos dois caminhos são idênticos, bit a bit.
+AGGREGATION_BLOCK_ROWS = 100_000
+
+SCORE_AGGREGATES = {
+    'motorista': ['motorista', 'violacao'],
+    'veiculo': ['nome_do_veículo', 'violacao'],
+    'dia': ['dia'],
+    'motorista_dia': ['motorista', 'dia'],
+}
+
+def aggregate_score_partials(df):
+    """Somatórios parciais de pontuação, quantidade e duração por bloco de linhas para cada agregado."""
+    df = df.assign(bloco=(df['linha_csv'] - 2) // AGGREGATION_BLOCK_ROWS, dia=df['data_evento'].dt.normalize())
+    partials = {}
+    for name, keys in SCORE_AGGREGATES.items():
+        grouped = df.groupby(['bloco'] + keys, sort=True, observed=True)
+        partials[name] = pd.DataFrame({
+            'score_final': grouped['score_final'].sum(),
+            'eventos': grouped.size(),
+            'duracao_seconds': grouped['duracao_seconds'].sum(),
+        }).reset_index()
+    return partials
+
+def combine_score_partials(partials_list):
+    """Soma os parciais de todos os blocos, na ordem dos blocos, em agregados finais."""
+    combined = {}
+    for name, keys in SCORE_AGGREGATES.items():
+        partials = pd.concat([partials[name] for partials in partials_list], ignore_index=True)
+        combined[name] = partials.groupby(keys, sort=True, observed=True)[['score_final', 'eventos', 'duracao_seconds']].sum()
+    return combined
+
+def build_entity_ranking(aggregate, entity_label):
+    """Ranking (pontuação total e por tipo de violação) a partir do agregado por entidade e violação."""
+    scores = aggregate['score_final'].unstack('violacao')
+    ranking_df = pd.DataFrame({v_type: scores[v_type] if v_type in scores.columns else 0.0 for v_type in VIOLATION_TYPES}, index=scores.index).fillna(0)
+    ranking_df.insert(0, 'Pontuação Total', ranking_df[VIOLATION_TYPES].sum(axis=1))
+    ranking_df = ranking_df[ranking_df.index.map(bool)]
+    # Com o esquema compacto os rótulos chegam como categoria; o ranking sempre sai com texto simples
+    return ranking_df.rename_axis(entity_label).reset_index().astype({entity_label: str})
+
+def build_category_ranking(entity_ranking, entity_label):
+    """Ranking por categoria (Econômica/Segurança) a partir das colunas por tipo de violação do ranking da entidade."""
+    category_ranking = entity_ranking[[entity_label, 'Pontuação Total']].copy()
+    total = category_ranking['Pontuação Total']
+    for category, category_types in VIOLATION_CATEGORIES.items():
+        category_ranking[f'Pontuação {category}'] = entity_ranking[category_types].sum(axis=1)
+    for category in VIOLATION_CATEGORIES:
+        category_ranking[f'Percentual {category}'] = (category_ranking[f'Pontuação {category}'] / total * 100).where(total > 0, 0)
+    return category_ranking
+
+def build_rankings_from_aggregates(aggregates):
+    """Rankings por motorista e por veículo (por tipo de violação e por categoria) a partir dos agregados combinados."""
+    ranking_df = build_entity_ranking(aggregates['motorista'], 'Motorista')
+    ranking_veiculo_df = build_entity_ranking(aggregates['veiculo'], 'Veículo')
+    return {
+        'motorista': ranking_df,
+        'veiculo': ranking_veiculo_df,
+        'categoria_motorista': build_category_ranking(ranking_df, 'Motorista'),
+        'categoria_veiculo': build_category_ranking(ranking_veiculo_df, 'Veículo'),
+    }
+
+@instrumented_stage('rankings')
+def build_rankings(df):
+    """Etapa de agregação: todos os rankings a partir do dataset pontuado."""
+    return build_rankings_from_aggregates(combine_score_partials([aggregate_score_partials(df)]))
+
+# --- CACHE EM DISCO DOS ARQUIVOS NORMALIZADOS ---
+# O resultado de read_violations_csv é gravado em Arrow (Feather sem compressão, lido via memory map), com a
+# chave no SHA-256 do arquivo original. Um novo upload do mesmo arquivo, mesmo após reiniciar o servidor, não
+# passa de novo pela normalização. Incremente PARSER_VERSION sempre que a normalização mudar.
+PARSER_VERSION = 1
+PARSED_CACHE_DIR = os.getenv('PARSED_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'driver-behavior-parsed'))
+PARSED_CACHE_MAX_MB = int(os.getenv('PARSED_CACHE_MAX_MB', '2048'))
+PARSED_CACHE_MAX_AGE_DAYS = int(os.getenv('PARSED_CACHE_MAX_AGE_DAYS', '30'))
+PARSED_CACHE_METADATA_KEY = b'driver_behavior'
+
+def parsed_cache_path(content_hash):
+    return os.path.join(PARSED_CACHE_DIR, f'{content_hash}.v{PARSER_VERSION}.feather')
+
+@instrumented_stage('load_parsed_cache')
+def load_parsed_file(content_hash):
+    """Carrega o dataset normalizado do cache em disco (None se não existir ou se o pyarrow não estiver instalado)."""
+    if feather is None or not content_hash:
+        return None
+    path = parsed_cache_path(content_hash)
+    try:
+        table = feather.read_table(path, memory_map=True)
+        os.utime(path)  # Marca o uso recente para o despejo por idade/tamanho
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    metadata = json.loads(table.schema.metadata.get(PARSED_CACHE_METADATA_KEY, b'{}'))
+    df = table.to_pandas()
+    # Colunas de texto em que o fillna(0) colocou o número 0 nas células vazias
+    for col in metadata.get('zero_filled_columns', []):
+        df[col] = df[col].astype(object).where(df[col].notna(), 0)
+    return df
+
+def save_parsed_file(content_hash, df):
+    """Grava o dataset normalizado no cache em disco e aplica o despejo por idade e tamanho."""
+    if feather is None or not content_hash:
+        return
+    zero_filled_columns = []
+    encoded = {}
+    for col in df.columns[df.dtypes == object]:
+        is_text = df[col].map(lambda value: isinstance(value, str))
+        others = df[col][~is_text]
+        if not others.map(lambda value: type(value) is int and value == 0).all():
+            return  # Tipos que o Arrow não representaria sem perda: não grava
+        if not others.empty:
+            zero_filled_columns.append(col)
+        encoded[col] = df[col].where(is_text, None)
+    table = pa.Table.from_pandas(df.assign(**encoded))
+    metadata = {**(table.schema.metadata or {}), PARSED_CACHE_METADATA_KEY: json.dumps({'zero_filled_columns': zero_filled_columns, 'parser_version': PARSER_VERSION}).encode()}
+
+    os.makedirs(PARSED_CACHE_DIR, exist_ok=True)
+    path = parsed_cache_path(content_hash)
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    feather.write_feather(table.replace_schema_metadata(metadata), temp_path, compression='uncompressed')
+    os.replace(temp_path, path)
+    prune_parsed_cache()
+
+def remove_parsed_cache_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:  # Outro processo do pool já removeu
+        pass
+
+def prune_parsed_cache():
+    """Remove entradas de outras versões do parser, mais antigas que o limite de idade e, por fim, as menos usadas até caber no tamanho máximo."""
+    now = time.time()
+    max_age_seconds = PARSED_CACHE_MAX_AGE_DAYS * 86400
+    entries = []
+    for entry in os.scandir(PARSED_CACHE_DIR):
+        if not entry.name.endswith('.feather'):
+            continue
+        stat = entry.stat()
+        if not entry.name.endswith(f'.v{PARSER_VERSION}.feather') or now - stat.st_mtime > max_age_seconds:
+            remove_parsed_cache_file(entry.path)
+        else:
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= PARSED_CACHE_MAX_MB * 1024 * 1024:
+            break
+        remove_parsed_cache_file(path)
+        total_bytes -= size
+
+def read_violations_file(source, content_hash=None):
+    """read_violations_csv com o cache em disco: só lê o CSV se o conteúdo ainda não tiver sido normalizado."""
+    df = load_parsed_file(content_hash)
+    if df is None:
+        df = read_violations_csv(source)
+        save_parsed_file(content_hash, df)
+    return df
+
+# --- INGESTÃO DE VÁRIOS ARQUIVOS EM PARALELO ---
+# Leitura e pontuação de cada arquivo são independentes e limitadas por CPU, então rodam em processos separados.
+INGEST_MAX_WORKERS = int(os.getenv('INGEST_MAX_WORKERS', '0')) or os.cpu_count() or 1
+# Os pools são criados de dentro de threads (callbacks do servidor, jobs em segundo plano) e um fork copiaria locks
+# presos por outras threads; os processos partem de um servidor limpo (forkserver) ou de um interpretador novo (spawn)
+PROCESS_POOL_CONTEXT = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+def read_and_score_file(filename, source, content_hash, gravity_config):
+    """Tarefa de um processo do pool: lê, normaliza e pontua um arquivo, marcando a origem de cada linha."""
+    df = score_violations(read_violations_file(source, content_hash), gravity_config)
+    df['arquivo_origem'] = filename
+    return df
+
+@instrumented_stage('ingest')
+def ingest_violation_files(files, gravity_config, max_workers=None):
+    """
+    Lê e pontua vários arquivos ([(nome, bytes ou caminho, sha256 ou None), ...]) em paralelo e junta tudo em um
+    único dataset, na ordem recebida. Contagens por motorista são calculadas sobre o dataset completo, depois da junção.
+    linha_csv é a linha no arquivo de origem e se repete entre arquivos: uma linha é identificada por (arquivo_origem, linha_csv).
+    """
+    filenames, sources, content_hashes = (list(column) for column in zip(*files))
+    configs = [gravity_config] * len(files)
+    workers = min(len(files), max_workers or INGEST_MAX_WORKERS)
+    if workers <= 1:
+        frames = list(map(read_and_score_file, filenames, sources, content_hashes, configs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=PROCESS_POOL_CONTEXT) as executor:
+            frames = list(executor.map(read_and_score_file, filenames, sources, content_hashes, configs))
+    return add_violation_counts(pd.concat(frames, ignore_index=True))
+
+def hash_uploaded_files(content_hashes):
+    """Hash de um conjunto de arquivos; um arquivo sozinho mantém o próprio hash (igual ao do upload em partes)."""
+    if len(content_hashes) == 1:
+        return content_hashes[0]
+    return hashlib.sha256(':'.join(content_hashes).encode()).hexdigest()
+
+# --- PROCESSAMENTO EM PARTES (ARQUIVOS MAIORES QUE A MEMÓRIA) ---
+class SQLiteEventStore:
+    """Eventos pontuados gravados em SQLite, com índices por motorista e veículo para as consultas individuais."""
+
+    TABLE = 'eventos'
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def append(self, df):
+        with self._lock:
+            df.to_sql(self.TABLE, self._connection, if_exists='append', index=False)
+
+    def finalize(self):
+        with self._lock:
+            self._connection.execute(f'CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_motorista ON {self.TABLE} ("motorista")')
+            self._connection.execute(f'CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_veiculo ON {self.TABLE} ("nome_do_veículo")')
+            self._connection.commit()
+
+    def _load_events(self, column, value):
+        with self._lock:
+            return pd.read_sql_query(f'SELECT * FROM {self.TABLE} WHERE "{column}" = ? ORDER BY linha_csv', self._connection, params=(value,), parse_dates=['data_evento'])
+
+    def load_driver_events(self, driver, aggregates=None):
+        """Violações de um motorista; com os agregados, também traz a qtd_violacoes do arquivo inteiro."""
+        df = self._load_events('motorista', driver)
+        if aggregates is not None:
+            counts = aggregates['motorista']['eventos'].rename('qtd_violacoes').reset_index()
+            df = pd.merge(df, counts, on=['motorista', 'violacao'], how='left')
+        return df
+
+    def load_vehicle_events(self, vehicle):
+        return self._load_events('nome_do_veículo', vehicle)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+@instrumented_stage('process_out_of_core')
+def process_csv_out_of_core(path, gravity_config, event_store_path=None, event_sink=None):
+    """
+    Lê, pontua e agrega o CSV em blocos de AGGREGATION_BLOCK_ROWS linhas, sem carregar o arquivo inteiro.
+    Cada bloco vira somatórios parciais (e, opcionalmente, linhas no SQLite); os rankings saem da soma dos parciais.
+    path pode ser um caminho, um arquivo aberto (ex.: a entrada padrão) ou uma lista deles, lidos em sequência.
+    Em vez do SQLite, os eventos podem ir para event_sink: qualquer objeto com append(df) e finalize().
+    """
+    event_store = SQLiteEventStore(event_store_path) if event_store_path else event_sink
+    partials_list = []
+    rows = 0
+    for source in (path if isinstance(path, list) else [path]):
+        for chunk in pd.read_csv(source, delimiter=';', encoding='utf-8', on_bad_lines='warn', chunksize=AGGREGATION_BLOCK_ROWS):
+            df = normalize_violations(chunk)
+            if df.empty: continue
+            df = score_violations(df, gravity_config)
+            partials_list.append(aggregate_score_partials(df))
+            if event_store is not None:
+                event_store.append(df)
+            rows += len(df)
+
+    if not partials_list: raise ValueError('Nenhuma violação válida encontrada no arquivo.')
+    aggregates = combine_score_partials(partials_list)
+    if event_store is not None:
+        event_store.finalize()
+    return {'rankings': build_rankings_from_aggregates(aggregates), 'aggregates': aggregates, 'events': event_store, 'rows': rows}
+
+# --- LINHA DE COMANDO (JOBS AGENDADOS) ---
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'json': '.jsonl'}
+RANKING_OUTPUT_NAMES = {
+    'motorista': 'ranking_motoristas',
+    'veiculo': 'ranking_veiculos',
+    'categoria_motorista': 'ranking_categoria_motoristas',
+    'categoria_veiculo': 'ranking_categoria_veiculos',
+}
+EVENTS_OUTPUT_NAME = 'eventos_pontuados'
+# Tipos dos eventos em Parquet, fixados pelo nome da coluna: o que o pandas infere muda de um bloco para outro
+# (inteiro em um, decimal ou vazio em outro). As colunas fora destas listas saem como texto, como no CSV de origem.
+PARQUET_TIMESTAMP_COLUMNS = ['data_evento']
+PARQUET_INTEGER_COLUMNS = ['linha_csv', 'duracao_seconds', 'qtd_violacoes']
+PARQUET_FLOAT_COLUMNS = [
+    'velocidade_inicial', 'velocidade_final', 'valor_inicial_da_velocidade_configurada', 'valor_final_da_velocidade_configurada',
+    'rpm_inicial', 'rpm_final', 'valor_inicial_do_rpm_configurado', 'valor_final_do_rpm_configurado', 'velocidade_máxima', 'rpm_máximo',
+    'latitude_inicial', 'longitude_inicial', 'latitude_final', 'longitude_final', 'fator_gravidade_evento', 'score_final',
+]
+
+def events_parquet_schema(columns):
+    """Schema Parquet dos eventos pontuados, declarado antes do primeiro bloco (ver PARQUET_*_COLUMNS)."""
+    fields = []
+    for col in columns:
+        if col in PARQUET_TIMESTAMP_COLUMNS:
+            fields.append(pa.field(col, pa.timestamp('us')))
+        elif col in PARQUET_INTEGER_COLUMNS:
+            fields.append(pa.field(col, pa.int64()))
+        elif col in PARQUET_FLOAT_COLUMNS:
+            fields.append(pa.field(col, pa.float64()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+def conform_to_parquet_schema(df, schema):
+    """Converte um bloco para os tipos do schema; colunas ausentes no bloco saem nulas."""
+    columns = {}
+    for field in schema:
+        series = df[field.name] if field.name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if pa.types.is_timestamp(field.type):
+            series = pd.to_datetime(series, errors='coerce')
+        elif pa.types.is_integer(field.type):
+            series = pd.to_numeric(series, errors='coerce').fillna(0).astype('int64')
+        elif pa.types.is_floating(field.type):
+            series = pd.to_numeric(series, errors='coerce').astype('float64')
+        else:
+            # Células vazias viram 0 na normalização: a coluna pode chegar como número em um bloco e texto em outro
+            series = series.astype(str).where(series.notna())
+        columns[field.name] = series
+    return pd.DataFrame(columns, index=df.index)
+
+class OutputFileWriter:
+    """Grava um DataFrame bloco a bloco em CSV, Parquet ou JSON Lines; serve de event_sink no processamento em partes.
+
+    parquet_schema recebe as colunas do primeiro bloco e devolve o schema de todos os blocos; sem ele, vale o que o
+    pyarrow inferir do primeiro bloco (suficiente para quem grava um bloco só, como os rankings).
+    """
+
+    def __init__(self, path, output_format, parquet_schema=None):
+        self.path = path
+        self.output_format = output_format
+        self.parquet_schema = parquet_schema
+        self._parquet_writer = None
+        self._started = False
+
+    def append(self, df):
+        if self.output_format == 'parquet':
+            if self._parquet_writer is None:
+                # pyarrow.parquet só é importado aqui: o dashboard não grava Parquet e não paga o import na partida
+                import pyarrow.parquet as pq
+                schema = self.parquet_schema(list(df.columns)) if self.parquet_schema else pa.Schema.from_pandas(df, preserve_index=False)
+                self._parquet_writer = pq.ParquetWriter(self.path, schema)
+            schema = self._parquet_writer.schema
+            if self.parquet_schema:
+                df = conform_to_parquet_schema(df, schema)
+            self._parquet_writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+        elif self.output_format == 'json':
+            with open(self.path, 'a' if self._started else 'w', encoding='utf-8') as output_file:
+                df.to_json(output_file, orient='records', lines=True, force_ascii=False, date_format='iso')
+        else:
+            df.to_csv(self.path, mode='a' if self._started else 'w', header=not self._started, index=False, encoding='utf-8')
+        self._started = True
+
+    def finalize(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+def write_output_file(df, path, output_format, parquet_schema=None):
+    writer = OutputFileWriter(path, output_format, parquet_schema)
+    writer.append(df)
+    writer.finalize()
+
+def load_gravity_config(path=None):
+    """Configuração de gravidade de um JSON no formato de DEFAULT_GRAVITY_CONFIG; o que faltar usa os valores padrão."""
+    if path is None:
+        return DEFAULT_GRAVITY_CONFIG
+    with open(path, encoding='utf-8') as config_file:
+        overrides = json.load(config_file)
+    unknown = sorted(set(overrides) - set(DEFAULT_GRAVITY_CONFIG))
+    if unknown:
+        raise ValueError(f"Seções desconhecidas na configuração de gravidade: {', '.join(unknown)}")
+    return {section: {**params, **overrides.get(section, {})} for section, params in DEFAULT_GRAVITY_CONFIG.items()}
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pipeline', description='Pontua exportações de telemetria (CSV) e grava os rankings e os eventos pontuados, sem o dashboard.')
+    parser.add_argument('inputs', nargs='*', default=['-'], help='CSVs de entrada; "-" ou nenhum lê a entrada padrão')
+    parser.add_argument('--config', default=None, help='JSON com a configuração de gravidade (seções e parâmetros ausentes usam os valores padrão)')
+    parser.add_argument('--output-dir', default='.', help='diretório dos arquivos gerados (padrão: o atual)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help='csv, parquet ou json (JSON Lines)')
+    parser.add_argument('--streaming', action='store_true', help=f'processa em blocos de {AGGREGATION_BLOCK_ROWS:,} linhas, sem carregar os arquivos inteiros (os eventos saem sem qtd_violacoes)')
+    parser.add_argument('--no-events', action='store_true', help='grava só os rankings')
+    args = parser.parse_args(argv)
+    if args.format == 'parquet' and pa is None:
+        parser.error('a saída em Parquet requer o pyarrow')
+    if args.inputs.count('-') > 1:
+        parser.error('a entrada padrão só pode ser lida uma vez')
+
+    extension = OUTPUT_FORMATS[args.format]
+    events_path = os.path.join(args.output_dir, EVENTS_OUTPUT_NAME + extension)
+    try:
+        gravity_config = load_gravity_config(args.config)
+        os.makedirs(args.output_dir, exist_ok=True)
+        if args.streaming:
+            sources = [sys.stdin.buffer if name == '-' else name for name in args.inputs]
+            event_sink = None if args.no_events else OutputFileWriter(events_path, args.format, events_parquet_schema)
+            result = process_csv_out_of_core(sources, gravity_config, event_sink=event_sink)
+            rankings, rows = result['rankings'], result['rows']
+        else:
+            files = [('stdin', sys.stdin.buffer.read(), None) if name == '-' else (os.path.basename(name), name, None) for name in args.inputs]
+            violations_df = ingest_violation_files(files, gravity_config)
+            rankings, rows = build_rankings(violations_df), len(violations_df)
+            if not args.no_events:
+                write_output_file(violations_df, events_path, args.format, events_parquet_schema)
+        for key, name in RANKING_OUTPUT_NAMES.items():
+            write_output_file(rankings[key], os.path.join(args.output_dir, name + extension), args.format)
+    except (OSError, ValueError, KeyError) as e:
+        parser.exit(1, f"Erro: {e}\n")
+    print(f"{rows:,} violações pontuadas, {len(rankings['motorista'])} motoristas; arquivos em {os.path.abspath(args.output_dir)}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main_cli()
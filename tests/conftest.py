@@ -0,0 +1,75 @@
+"""
+Fixtures compartilhadas pelos testes: a exportação real do repositório (2025-05.csv) com algumas células de
+motorista e veículo apagadas, como acontece nas exportações da plataforma, e o dataset pontuado a partir dela.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import pipeline  # noqa: E402
+
+SAMPLE_CSV_PATH = os.path.join(ROOT_DIR, '2025-05.csv')
+CSV_COLUMNS = {'Nome do veículo': 1, 'Motorista': 3}
+
+
+def blank_csv_cells(data, column, every):
+    """Apaga a célula da coluna informada em uma a cada `every` linhas de dados do CSV (bytes)."""
+    lines = data.decode('utf-8-sig').splitlines()
+    position = CSV_COLUMNS[column]
+    for number in range(1, len(lines), every):
+        fields = lines[number].split(';')
+        fields[position] = ''
+        lines[number] = ';'.join(fields)
+    return '\n'.join(lines).encode('utf-8')
+
+
+@pytest.fixture(scope='session')
+def export_bytes():
+    with open(SAMPLE_CSV_PATH, 'rb') as sample:
+        data = sample.read()
+    data = blank_csv_cells(data, 'Nome do veículo', 50)
+    return blank_csv_cells(data, 'Motorista', 70)
+
+
+@pytest.fixture(scope='session')
+def scored_df(export_bytes):
+    return pipeline.ingest_violation_files([('2025-05.csv', export_bytes, None)], pipeline.DEFAULT_GRAVITY_CONFIG)
+
+
+@pytest.fixture
+def client():
+    import main
+    return main.server.test_client()
+
+
+@pytest.fixture
+def auth():
+    import main
+    return next(iter(main.USERS.items()))
+
+
+@pytest.fixture
+def llm_stub(monkeypatch, tmp_path):
+    """Fábrica do stub da API Gemini (benchmarks/llm_stub_server.py) em porta livre, com o main apontado para ele."""
+    import main
+    from benchmarks.llm_stub_server import start_stub_server
+
+    servers = []
+
+    def start(**options):
+        server, base_url = start_stub_server(**options)
+        servers.append(server)
+        monkeypatch.setenv('GEMINI_API_KEY', 'teste')
+        monkeypatch.setattr(main, 'LLM_API_BASE_URL', base_url)
+        monkeypatch.setattr(main, 'LLM_RATE_LIMITER', main.RateLimiter(0))
+        monkeypatch.setattr(main, 'LLM_RESPONSE_CACHE', main.LLMResponseCache(str(tmp_path / 'llm-cache.sqlite'), 3600, 16))
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
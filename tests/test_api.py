@@ -0,0 +1,52 @@
+import gzip
+import json
+
+import pytest
+
+import main
+import pipeline
+
+
+@pytest.fixture(scope='module')
+def dataset(scored_df):
+    violations_df = pipeline.compact_violations(scored_df)
+    rankings = pipeline.build_rankings(violations_df)
+    handle = main.store_dataset('teste-api', pipeline.DEFAULT_GRAVITY_CONFIG, violations_df, rankings)
+    return handle, violations_df, rankings
+
+
+def test_api_requires_login(client, dataset):
+    assert client.get('/api/v1/datasets').status_code == 401
+    assert client.get('/api/v1/datasets/latest/rankings/motorista', auth=('admin', 'errada')).status_code == 401
+
+
+def test_rankings_etag_and_not_modified(client, auth, dataset):
+    handle, _, rankings = dataset
+    path = f"/api/v1/datasets/{handle['dataset_id']}/rankings/motorista"
+    response = client.get(path, auth=auth)
+    assert response.status_code == 200
+    assert len(response.get_json()['items']) == len(rankings['motorista'])
+    etag = response.headers['ETag']
+
+    not_modified = client.get(path, auth=auth, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not_modified.data == b'' and not_modified.headers['ETag'] == etag
+    # Outro recurso do mesmo dataset tem outro ETag
+    other = client.get(f"/api/v1/datasets/{handle['dataset_id']}/rankings/veiculo", auth=auth, headers={'If-None-Match': etag})
+    assert other.status_code == 200 and other.headers['ETag'] != etag
+
+    compressed = client.get(path, auth=auth, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(compressed.data)) == response.get_json()
+
+
+def test_driver_events_are_paged_and_keyed_by_file_and_line(client, auth, dataset):
+    handle, violations_df, rankings = dataset
+    driver = rankings['motorista']['Motorista'].iloc[0]
+    body = client.get(f"/api/v1/datasets/{handle['dataset_id']}/drivers/{driver}/events?page=1&page_size=5", auth=auth).get_json()
+    assert body['total'] == int((violations_df['motorista'] == driver).sum())
+    assert len(body['items']) == 5
+    assert {'arquivo_origem', 'linha_csv'} <= set(body['items'][0])
+
+    assert client.get(f"/api/v1/datasets/{handle['dataset_id']}/drivers/Ninguém/events", auth=auth).status_code == 404
+    assert client.get('/api/v1/datasets/inexistente/rankings/motorista', auth=auth).status_code == 404
+    assert client.get(f"/api/v1/datasets/{handle['dataset_id']}/rankings/desconhecido", auth=auth).status_code == 404
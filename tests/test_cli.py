@@ -0,0 +1,29 @@
+import pytest
+
+import pipeline
+
+# O pyarrow é opcional para o pipeline (só a saída em Parquet precisa dele)
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+@pytest.fixture
+def export_path(tmp_path, export_bytes):
+    path = tmp_path / '2025-05.csv'
+    path.write_bytes(export_bytes)
+    return path
+
+
+def test_streaming_parquet_matches_in_memory(tmp_path, export_path, monkeypatch):
+    # Blocos pequenos: a mesma coluna chega como texto em um bloco e só com células vazias (0) em outro
+    monkeypatch.setattr(pipeline, 'AGGREGATION_BLOCK_ROWS', 2000)
+    pipeline.main_cli([str(export_path), '--streaming', '--format', 'parquet', '--output-dir', str(tmp_path / 'streaming')])
+    pipeline.main_cli([str(export_path), '--format', 'parquet', '--output-dir', str(tmp_path / 'memoria')])
+
+    streaming = pq.read_table(tmp_path / 'streaming' / 'eventos_pontuados.parquet').to_pandas()
+    in_memory = pq.read_table(tmp_path / 'memoria' / 'eventos_pontuados.parquet').to_pandas()
+    assert len(streaming) == len(in_memory)
+    common = [col for col in in_memory.columns if col in streaming.columns]
+    assert common == list(streaming.columns)
+    assert (streaming.dtypes == in_memory[common].dtypes).all()
+    assert streaming['score_final'].sum() == pytest.approx(in_memory['score_final'].sum())
+    assert streaming['motorista'].value_counts().equals(in_memory['motorista'].value_counts())
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+import pipeline
+
+
+@pytest.fixture(scope='module')
+def compact_df(scored_df):
+    return pipeline.compact_violations(scored_df)
+
+
+def test_compaction_keeps_rankings(scored_df, compact_df):
+    expected = pipeline.build_rankings(scored_df)
+    rankings = pipeline.build_rankings(compact_df)
+    assert rankings.keys() == expected.keys()
+    for name, ranking in rankings.items():
+        pd.testing.assert_frame_equal(ranking.reset_index(drop=True), expected[name].reset_index(drop=True), check_dtype=False)
+
+
+def test_blank_driver_and_vehicle_are_not_ranked(compact_df):
+    rankings = pipeline.build_rankings(compact_df)
+    assert compact_df['motorista'].isna().any() and compact_df['nome_do_veículo'].isna().any()
+    assert '0' not in set(rankings['motorista']['Motorista'])
+    assert '0' not in set(rankings['veiculo']['Veículo'])
+
+
+def test_compaction_keeps_values_and_shrinks_memory(scored_df, compact_df):
+    for column in ['score_final', 'fator_gravidade_evento', 'duracao_seconds', 'linha_csv']:
+        assert (compact_df[column].to_numpy() == scored_df[column].to_numpy()).all()
+    assert compact_df['data_evento'].equals(scored_df['data_evento'])
+    assert pipeline.dataset_memory_bytes(compact_df) < pipeline.dataset_memory_bytes(scored_df) / 2
+
+
+def test_compaction_memory_is_recorded(scored_df):
+    def observations(schema):
+        return sum(line.startswith(f'{pipeline.DATASET_MEMORY_BYTES.name}_count{{schema="{schema}"}}') and int(line.split()[-1])
+                   for line in pipeline.DATASET_MEMORY_BYTES.render())
+
+    before = {schema: observations(schema) for schema in ('original', 'compact')}
+    pipeline.compact_violations(scored_df)
+    assert {schema: observations(schema) for schema in before} == {schema: count + 1 for schema, count in before.items()}
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+
+COORDINATES = [
+    '26° 38´ 24´´ Sul', '48° 42´ 55´´ Oeste', '26° 38´ 24,5´´ Norte', '1° 2´ 3.25´´ Leste', '  26°38´24´´S ',
+    '26° 38´ 24´´ sul', '10° 0´ 0´´ W', '10° 0´ 0´´ E', '26 38 24 S', '-26,5', '26° 38´', '26° 38´ 24´´ X', 'abc', '',
+    0, None, np.nan,
+]
+
+
+def test_decoded_columns_match_dms_to_dd():
+    df = pd.DataFrame({'latitude_inicial': COORDINATES, 'longitude_inicial': COORDINATES[::-1]})
+    decoded = pipeline.decode_coordinate_columns(df, ['latitude_inicial', 'longitude_inicial', 'coluna_ausente'])
+    assert list(decoded) == ['latitude_inicial', 'longitude_inicial']
+    for col, values in decoded.items():
+        expected = [pipeline.dms_to_dd(value) for value in df[col]]
+        np.testing.assert_allclose(values, np.array([np.nan if value is None else value for value in expected], dtype=float), rtol=1e-15)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('26° 38´ 24´´ Sul', -(26 + 38 / 60 + 24 / 3600)),
+    ('48° 42´ 55´´ Oeste', -(48 + 42 / 60 + 55 / 3600)),
+    ('26° 38´ 24,5´´ Norte', 26 + 38 / 60 + 24.5 / 3600),
+    ('1° 2´ 3.25´´ Leste', 1 + 2 / 60 + 3.25 / 3600),
+    ('10° 0´ 0´´ W', -10.0),
+])
+def test_hemisphere_sets_the_sign(text, expected):
+    decoded = pipeline.decode_coordinate_columns(pd.DataFrame({'latitude_final': [text]}), ['latitude_final'])
+    assert decoded['latitude_final'][0] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('text', ['abc', '', '26° 38´', '26° 38´ 24´´ X', None])
+def test_malformed_coordinates_decode_to_nan(text):
+    decoded = pipeline.decode_coordinate_columns(pd.DataFrame({'latitude_final': [text]}), ['latitude_final'])
+    assert np.isnan(decoded['latitude_final'][0])
@@ -0,0 +1,76 @@
+import copy
+
+import pytest
+
+import main
+import pipeline
+
+
+@pytest.fixture(scope='module')
+def memo_dataset(scored_df):
+    violations_df = pipeline.compact_violations(scored_df)
+    rankings = pipeline.build_rankings(violations_df)
+    handle = main.store_dataset('teste-memo', pipeline.DEFAULT_GRAVITY_CONFIG, violations_df, rankings)
+    return handle, violations_df, rankings
+
+
+@pytest.fixture
+def build_counts(monkeypatch):
+    counts = {'general': 0, 'kpis': 0, 'chart': 0}
+
+    def counting(name, build):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return build(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(main, 'build_general_dashboard', counting('general', main.build_general_dashboard))
+    monkeypatch.setattr(main, 'build_individual_kpis', counting('kpis', main.build_individual_kpis))
+    monkeypatch.setattr(main, 'build_individual_chart', counting('chart', main.build_individual_chart))
+    # Cache vazio a cada teste, para a contagem não depender da ordem de execução
+    monkeypatch.setattr(main, 'FIGURE_CACHE', main.DatasetCache(main.FIGURE_CACHE_MAX_ENTRIES, main.FIGURE_CACHE_MAX_MB * 1024 * 1024))
+    return counts
+
+
+def test_key_depends_on_kind_dataset_and_filters(memo_dataset):
+    handle, violations_df, rankings = memo_dataset
+    config = copy.deepcopy(pipeline.DEFAULT_GRAVITY_CONFIG)
+    config['Velocidade_Excessiva_Rodovia']['base_weight'] = 0.3
+    other_config = main.store_dataset('teste-memo', config, violations_df, rankings)
+    other_upload = main.store_dataset('teste-memo-2', pipeline.DEFAULT_GRAVITY_CONFIG, violations_df, rankings)
+
+    key = main.figure_cache_key('individual-chart', handle, 'Motorista A', ['Freada brusca'])
+    assert key == main.figure_cache_key('individual-chart', dict(handle), 'Motorista A', ['Freada brusca'])
+    assert len({
+        key,
+        main.figure_cache_key('individual-kpis', handle, 'Motorista A', ['Freada brusca']),
+        main.figure_cache_key('individual-chart', other_config, 'Motorista A', ['Freada brusca']),
+        main.figure_cache_key('individual-chart', other_upload, 'Motorista A', ['Freada brusca']),
+        main.figure_cache_key('individual-chart', handle, 'Motorista B', ['Freada brusca']),
+        main.figure_cache_key('individual-chart', handle, 'Motorista A', []),
+    }) == 6
+
+
+def test_general_dashboard_is_built_once(memo_dataset, build_counts):
+    handle, _, _ = memo_dataset
+    hits_before = main.FIGURE_CACHE_LOOKUPS['hits']
+    first = main.update_general_dashboard(handle, handle)
+    second = main.update_general_dashboard(handle, handle)
+    assert first == second
+    assert build_counts['general'] == 1
+    assert main.FIGURE_CACHE_LOOKUPS['hits'] == hits_before + 1
+
+
+def test_individual_content_reuses_kpis_across_filters(memo_dataset, build_counts):
+    handle, _, rankings = memo_dataset
+    driver = rankings['motorista']['Motorista'].iloc[0]
+    violation_types = list(pipeline.VIOLATION_TYPES)[:2]
+
+    first = main.update_individual_content(driver, violation_types, handle)
+    # A ordem das violações selecionadas não muda a chave
+    assert main.update_individual_content(driver, violation_types[::-1], handle) == first
+    assert build_counts == {'general': 0, 'kpis': 1, 'chart': 1}
+
+    # Outro filtro refaz só o gráfico; os KPIs continuam no cache
+    main.update_individual_content(driver, violation_types[:1], handle)
+    assert build_counts == {'general': 0, 'kpis': 1, 'chart': 2}
@@ -0,0 +1,24 @@
+import io
+import zipfile
+
+import main
+import pipeline
+
+
+def test_fleet_export_runs_in_a_process_pool_and_is_served_from_disk(monkeypatch, scored_df, client, auth):
+    monkeypatch.setattr(main, 'REPORT_EXPORT_MAX_WORKERS', 2)
+    dataset = {'violations': scored_df, 'ranking': pipeline.build_rankings(scored_df)['motorista']}
+    job_id = main.submit_fleet_export_job(dataset, top_n=3)
+    main.get_ai_report_job(job_id)['future'].result(timeout=60)
+    job = main.get_ai_report_job(job_id)
+    assert job['status'] == 'done' and job['result']['done'] == 3
+
+    poll_disabled, status = main.poll_fleet_export(1, {'job_id': job_id})
+    assert poll_disabled and f'/exports/fleet/{job_id}' in str(status)
+
+    response = client.get(f'/exports/fleet/{job_id}', auth=auth)
+    assert response.status_code == 200 and response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert len(archive.namelist()) == 3
+    assert client.get(f'/exports/fleet/{job_id}').status_code == 401
+    assert client.get('/exports/fleet/inexistente', auth=auth).status_code == 404
@@ -0,0 +1,14 @@
+import pandas as pd
+
+import pipeline
+
+
+def test_parallel_ingest_keys_rows_by_file_and_line(export_bytes):
+    files = [('maio.csv', export_bytes, None), ('junho.csv', export_bytes, None)]
+    sequential = pipeline.ingest_violation_files(files, pipeline.DEFAULT_GRAVITY_CONFIG, max_workers=1)
+    parallel = pipeline.ingest_violation_files(files, pipeline.DEFAULT_GRAVITY_CONFIG, max_workers=2)
+    pd.testing.assert_frame_equal(parallel, sequential)
+
+    assert parallel['linha_csv'].duplicated().any()
+    assert not parallel.duplicated(['arquivo_origem', 'linha_csv']).any()
+    assert list(parallel['arquivo_origem'].unique()) == ['maio.csv', 'junho.csv']
@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+import main
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(main.time, 'time', fake.time)
+    return fake
+
+
+def make_cache(tmp_path, ttl_seconds=60, max_memory_entries=2):
+    return main.LLMResponseCache(str(tmp_path / 'llm_cache.sqlite'), ttl_seconds, max_memory_entries)
+
+
+def test_make_key_depends_on_prompt_model_and_config():
+    key = main.LLMResponseCache.make_key('prompt', 'modelo', {'temperature': 0.2, 'topP': 0.9})
+    assert key == main.LLMResponseCache.make_key('prompt', 'modelo', {'topP': 0.9, 'temperature': 0.2})
+    assert key != main.LLMResponseCache.make_key('prompt', 'outro-modelo', {'temperature': 0.2, 'topP': 0.9})
+    assert key != main.LLMResponseCache.make_key('prompt', 'modelo', {'temperature': 0.3, 'topP': 0.9})
+    assert key != main.LLMResponseCache.make_key('outro prompt', 'modelo', {'temperature': 0.2, 'topP': 0.9})
+
+
+def test_memory_hit_disk_hit_and_miss(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    assert cache.get('a') is None
+    cache.put('a', 'resposta A')
+    assert cache.get('a') == 'resposta A'
+    assert cache.stats == {'memory_hits': 1, 'disk_hits': 0, 'misses': 1}
+
+    # Nova instância no mesmo arquivo: a memória começa vazia e a resposta vem do SQLite
+    reopened = make_cache(tmp_path)
+    assert reopened.get('a') == 'resposta A'
+    assert reopened.get('a') == 'resposta A'
+    assert reopened.stats == {'memory_hits': 1, 'disk_hits': 1, 'misses': 0}
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    cache.put('a', 'resposta A')
+    clock.now += 60
+    assert cache.get('a') == 'resposta A'
+    clock.now += 1
+    assert cache.get('a') is None
+    assert make_cache(tmp_path, ttl_seconds=60).get('a') is None
+
+    # A próxima gravação remove do disco as linhas vencidas
+    cache.put('b', 'resposta B')
+    with sqlite3.connect(cache.path) as db:
+        assert [row[0] for row in db.execute('SELECT key FROM llm_responses')] == ['b']
+
+
+def test_memory_layer_evicts_least_recently_used(tmp_path, clock):
+    cache = make_cache(tmp_path, max_memory_entries=2)
+    cache.put('a', 'resposta A')
+    cache.put('b', 'resposta B')
+    cache.get('a')
+    cache.put('c', 'resposta C')
+    assert list(cache._memory) == ['a', 'c']
+
+    # 'b' saiu da memória mas continua no disco
+    assert cache.get('b') == 'resposta B'
+    assert cache.stats['disk_hits'] == 1
+    assert list(cache._memory) == ['c', 'b']
@@ -0,0 +1,80 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+import main
+import pipeline
+
+
+@pytest.fixture
+def fleet_dataset(scored_df):
+    violations_df = pipeline.compact_violations(scored_df)
+    return {'violations': violations_df, 'ranking': pipeline.build_rankings(violations_df)['motorista'], 'row_index': main.build_row_index(violations_df)}
+
+
+def test_retries_429_and_5xx_until_success(llm_stub):
+    server = llm_stub(fail_first=2)
+    assert main.request_llm_completion('prompt de teste').startswith('Relatório de teste')
+    assert server.stats['requests'] == 3 and server.stats['failures'] == 2
+
+
+def test_gives_up_after_the_last_retry(llm_stub, monkeypatch):
+    monkeypatch.setattr(main, 'LLM_MAX_RETRIES', 1)
+    server = llm_stub(failure_rate=1.0)
+    with pytest.raises(requests.exceptions.HTTPError) as error:
+        main.request_llm_completion('prompt de teste')
+    assert error.value.response.status_code in (429, 503)
+    assert server.stats['requests'] == 2
+
+
+def test_retry_delay_uses_retry_after_or_exponential_backoff():
+    response = requests.Response()
+    response.headers['Retry-After'] = '7'
+    assert main.get_retry_delay(response, 3) == 7.0
+    for attempt in range(4):
+        delay = main.get_retry_delay(None, attempt)
+        assert 0.5 * main.LLM_RETRY_BASE_SECONDS * 2 ** attempt <= delay < 1.5 * main.LLM_RETRY_BASE_SECONDS * 2 ** attempt
+
+
+def test_rate_limiter_spaces_calls_across_threads():
+    limiter = main.RateLimiter(1200)  # uma chamada a cada 50 ms
+    start = time.monotonic()
+    threads = [threading.Thread(target=limiter.wait) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 4 * 0.05 - 0.01
+
+
+def test_fleet_reports_respect_the_concurrency_bound_and_write_as_they_finish(llm_stub, fleet_dataset, tmp_path):
+    server = llm_stub(latency=0.1)
+    output_path = tmp_path / 'frota.jsonl'
+    lines_at_progress = []
+
+    def on_progress(summary):
+        with open(output_path, encoding='utf-8') as output:
+            lines_at_progress.append((summary['ok'] + summary['errors'], sum(1 for _ in output)))
+
+    summary = main.generate_fleet_reports(fleet_dataset, str(output_path), max_workers=2, on_progress=on_progress)
+    drivers = len(fleet_dataset['ranking'])
+    assert summary['ok'] == drivers and summary['errors'] == 0
+    assert server.stats['max_in_flight'] == 2
+    # Cada relatório vai para o arquivo assim que termina, antes do aviso de progresso
+    assert lines_at_progress == [(done, done) for done in range(1, drivers + 1)]
+
+    records = [json.loads(line) for line in output_path.read_text(encoding='utf-8').splitlines()]
+    assert sorted(record['posicao'] for record in records) == list(range(1, drivers + 1))
+    assert all(record['status'] == 'ok' and record['relatorio'].startswith('Relatório de teste') for record in records)
+
+
+def test_fleet_report_errors_are_recorded_per_driver(llm_stub, fleet_dataset, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'LLM_MAX_RETRIES', 0)
+    llm_stub(failure_rate=1.0)
+    summary = main.generate_fleet_reports(fleet_dataset, str(tmp_path / 'frota.jsonl'), top_n=2, max_workers=2)
+    assert summary['ok'] == 0 and summary['errors'] == 2
+    records = [json.loads(line) for line in (tmp_path / 'frota.jsonl').read_text(encoding='utf-8').splitlines()]
+    assert [record['status'] for record in records] == ['error', 'error']
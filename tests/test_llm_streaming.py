@@ -0,0 +1,31 @@
+import threading
+
+import main
+
+
+def test_stream_delivers_growing_partial_texts(llm_stub):
+    llm_stub(chunk_delay=0.01)
+    partials = []
+    text = main.stream_llm_completion('Motorista com [L1] no prompt', on_text=partials.append)
+
+    assert text == 'Relatório de teste (28 caracteres de prompt). Local da ocorrência: [L1]'
+    assert len(partials) == len(text.split(' ')) and partials[-1] == text
+    assert all(later.startswith(earlier) and len(later) > len(earlier) for earlier, later in zip(partials, partials[1:]))
+    # A resposta completa vai para o cache: a segunda chamada não abre outro streaming
+    assert main.stream_llm_completion('Motorista com [L1] no prompt', on_text=partials.append) == text
+
+
+def test_cancel_event_stops_reading_the_stream(llm_stub):
+    server = llm_stub(chunk_delay=0.05)
+    cancel_event = threading.Event()
+    partials = []
+
+    def on_text(text):
+        partials.append(text)
+        if len(partials) == 2:
+            cancel_event.set()
+
+    assert main.stream_llm_completion('prompt cancelado', on_text=on_text, cancel_event=cancel_event) is None
+    assert partials == ['Relatório ', 'Relatório de ']
+    assert server.stats['requests'] == 1
+    assert main.LLM_RESPONSE_CACHE.get(main.LLMResponseCache.make_key('prompt cancelado', main.LLM_MODEL, main.LLM_GENERATION_CONFIG)) is None
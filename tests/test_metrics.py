@@ -0,0 +1,75 @@
+import re
+
+import pytest
+
+import main
+import pipeline
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+
+def parse_exposition(text):
+    """{nome da métrica: tipo} e a lista de amostras (nome, rótulos, valor), checando a ordem HELP/TYPE/amostras."""
+    types, samples = {}, []
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+            continue
+        match = SAMPLE_LINE.match(line)
+        assert match, f'linha fora do formato: {line!r}'
+        name, labels, value = match.groups()
+        family = re.sub(r'_(bucket|sum|count)$', '', name) if name not in types else name
+        assert family in types, f'amostra sem # TYPE antes: {line!r}'
+        samples.append((name, labels or '', float(value)))
+    return types, samples
+
+
+def test_histogram_render_is_cumulative():
+    histogram = pipeline.Histogram('teste_duracao_seconds', 'Duração de teste.', 'stage', (0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe('etapa "x"', value)
+    assert histogram.render() == [
+        '# HELP teste_duracao_seconds Duração de teste.',
+        '# TYPE teste_duracao_seconds histogram',
+        'teste_duracao_seconds_bucket{stage="etapa \\"x\\"",le="0.1"} 1',
+        'teste_duracao_seconds_bucket{stage="etapa \\"x\\"",le="1.0"} 3',
+        'teste_duracao_seconds_bucket{stage="etapa \\"x\\"",le="+Inf"} 4',
+        'teste_duracao_seconds_sum{stage="etapa \\"x\\""} 4.05',
+        'teste_duracao_seconds_count{stage="etapa \\"x\\""} 4',
+    ]
+
+
+def test_metrics_requires_login(client):
+    assert client.get('/metrics').status_code == 401
+
+
+def test_metrics_exposition_after_pipeline_run(client, auth, scored_df):
+    pipeline.build_rankings(pipeline.compact_violations(scored_df))
+
+    @pipeline.instrumented_stage('etapa_com_falha')
+    def failing_stage():
+        raise ValueError('falha de teste')
+
+    with pytest.raises(ValueError):
+        failing_stage()
+
+    response = client.get('/metrics', auth=auth)
+    assert response.status_code == 200
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    types, samples = parse_exposition(response.get_data(as_text=True))
+
+    prefix = pipeline.METRICS_PREFIX
+    assert types[f'{prefix}_stage_duration_seconds'] == 'histogram'
+    assert types[f'{prefix}_stage_failures_total'] == 'counter'
+    assert types[f'{prefix}_dataset_cache_entries'] == 'gauge'
+    values = {(name, labels): value for name, labels, value in samples}
+    for stage in ('compact', 'rankings'):
+        count = values[(f'{prefix}_stage_duration_seconds_count', f'{{stage="{stage}"}}')]
+        assert count >= 1
+        assert values[(f'{prefix}_stage_duration_seconds_bucket', f'{{stage="{stage}",le="+Inf"}}')] == count
+        assert values[(f'{prefix}_stage_rows_count', f'{{stage="{stage}"}}')] >= 1
+    assert values[(f'{prefix}_stage_failures_total', '{stage="etapa_com_falha"}')] >= 1
+    assert values[(f'{prefix}_dataset_cache_entries', '')] == main.DATASET_CACHE.stats()['entries']
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+import pipeline
+
+
+def test_out_of_core_rankings_match_in_memory(tmp_path, monkeypatch, export_bytes, scored_df):
+    # Blocos pequenos: os somatórios parciais de vários blocos precisam dar o mesmo ranking do arquivo inteiro
+    monkeypatch.setattr(pipeline, 'AGGREGATION_BLOCK_ROWS', 1500)
+    path = tmp_path / '2025-05.csv'
+    path.write_bytes(export_bytes)
+    result = pipeline.process_csv_out_of_core(str(path), pipeline.DEFAULT_GRAVITY_CONFIG, event_store_path=str(tmp_path / 'eventos.sqlite'))
+    try:
+        expected = pipeline.build_rankings(scored_df)
+        assert result['rows'] == len(scored_df)
+        assert result['rankings'].keys() == expected.keys()
+        for name, ranking in result['rankings'].items():
+            pd.testing.assert_frame_equal(ranking.reset_index(drop=True), expected[name].reset_index(drop=True), check_dtype=False)
+
+        driver = expected['motorista']['Motorista'].iloc[0]
+        events = result['events'].load_driver_events(driver, result['aggregates'])
+        driver_df = scored_df[scored_df['motorista'] == driver]
+        assert len(events) == len(driver_df)
+        assert events['score_final'].sum() == pytest.approx(driver_df['score_final'].sum())
+        assert (events['qtd_violacoes'].to_numpy() == driver_df['qtd_violacoes'].to_numpy()).all()
+    finally:
+        result['events'].close()
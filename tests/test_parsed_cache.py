@@ -0,0 +1,59 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import pipeline
+
+pytest.importorskip('pyarrow.feather')
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'PARSED_CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture(scope='module')
+def parsed_df(export_bytes):
+    return pipeline.read_violations_csv(export_bytes)
+
+
+def test_round_trip_keeps_values_and_dtypes(cache_dir, parsed_df):
+    # As células vazias viram 0 (int) em colunas de texto; o cache precisa devolvê-las assim
+    assert (parsed_df['motorista'] == 0).any()
+    pipeline.save_parsed_file('abc', parsed_df)
+    loaded = pipeline.load_parsed_file('abc')
+    pd.testing.assert_frame_equal(loaded, parsed_df)
+    assert pipeline.load_parsed_file('outro') is None
+
+
+def test_read_violations_file_skips_the_parser_on_a_hit(cache_dir, parsed_df, export_bytes, monkeypatch):
+    pipeline.save_parsed_file('abc', parsed_df)
+    monkeypatch.setattr(pipeline, 'read_violations_csv', lambda source: pytest.fail('arquivo lido de novo'))
+    pd.testing.assert_frame_equal(pipeline.read_violations_file(export_bytes, 'abc'), parsed_df)
+
+
+def test_parser_version_change_invalidates_and_prunes(cache_dir, parsed_df, monkeypatch):
+    pipeline.save_parsed_file('abc', parsed_df)
+    monkeypatch.setattr(pipeline, 'PARSER_VERSION', pipeline.PARSER_VERSION + 1)
+    assert pipeline.load_parsed_file('abc') is None
+    pipeline.save_parsed_file('def', parsed_df)
+    assert sorted(os.listdir(cache_dir)) == [f'def.v{pipeline.PARSER_VERSION}.feather']
+
+
+def test_prune_by_age_and_by_size(cache_dir, parsed_df, monkeypatch):
+    now = time.time()
+    for age_days, content_hash in [(40, 'velho'), (3, 'a'), (2, 'b'), (1, 'c')]:
+        pipeline.save_parsed_file(content_hash, parsed_df)
+        os.utime(pipeline.parsed_cache_path(content_hash), (now - age_days * 86400,) * 2)
+    pipeline.prune_parsed_cache()
+    assert not os.path.exists(pipeline.parsed_cache_path('velho'))
+
+    # Só cabem dois arquivos: sai o usado há mais tempo
+    size = os.path.getsize(pipeline.parsed_cache_path('a'))
+    monkeypatch.setattr(pipeline, 'PARSED_CACHE_MAX_MB', 2.5 * size / 2**20)
+    pipeline.load_parsed_file('a')  # Uso recente
+    pipeline.prune_parsed_cache()
+    assert sorted(os.listdir(cache_dir)) == [f'a.v{pipeline.PARSER_VERSION}.feather', f'c.v{pipeline.PARSER_VERSION}.feather']
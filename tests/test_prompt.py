@@ -0,0 +1,17 @@
+import main
+import pipeline
+
+
+def test_prompt_events_show_speed_and_rpm(scored_df):
+    violations_df = pipeline.compact_violations(scored_df)
+    row = violations_df[(violations_df['velocidade_máxima'] > 0) & (violations_df['rpm_máximo'] > 0)].iloc[0]
+    line = main.format_prompt_event(row, '[L1]')
+    assert line.startswith('- [L1] ')
+    assert f", {row['velocidade_máxima']:.0f} km/h" in line and f", {row['rpm_máximo']:.0f} rpm" in line
+
+
+def test_driver_summary_lists_events_with_speed(scored_df):
+    violations_df = pipeline.compact_violations(scored_df)
+    driver = pipeline.build_rankings(violations_df)['motorista']['Motorista'].iloc[0]
+    prompt = main.build_instructor_prompt(driver, violations_df[violations_df['motorista'] == driver])
+    assert 'km/h' in prompt['text']
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+import pipeline
+
+ENTITIES = {'motorista': ('motorista', 'Motorista'), 'veiculo': ('nome_do_veículo', 'Veículo')}
+
+
+def loop_entity_ranking(df, column, label):
+    """Ranking da versão anterior: um groupby por entidade e outro por tipo de violação dentro dela."""
+    rows = []
+    for entity, group in df.groupby(column, sort=False):
+        if not entity:
+            continue
+        violation_scores = group.groupby('violacao')['score_final'].sum().to_dict()
+        summary = {label: entity, 'Pontuação Total': group['score_final'].sum()}
+        for v_type in pipeline.VIOLATION_TYPES:
+            summary[v_type] = violation_scores.get(v_type, 0)
+        rows.append(summary)
+    return pd.DataFrame(rows)
+
+
+def loop_category_ranking(df, column, label):
+    rows = []
+    for entity, group in df.groupby(column, sort=False):
+        if not entity:
+            continue
+        total_score = group['score_final'].sum()
+        summary = {label: entity, 'Pontuação Total': total_score}
+        for category, category_types in pipeline.VIOLATION_CATEGORIES.items():
+            summary[f'Pontuação {category}'] = group[group['violacao'].isin(category_types)]['score_final'].sum()
+        for category in pipeline.VIOLATION_CATEGORIES:
+            summary[f'Percentual {category}'] = (summary[f'Pontuação {category}'] / total_score * 100) if total_score > 0 else 0
+        rows.append(summary)
+    return pd.DataFrame(rows)
+
+
+def by_label(df, label):
+    return df.astype({label: str}).sort_values(label).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('dataset', ['original', 'compacto'])
+def test_rankings_match_the_per_group_loops(scored_df, dataset):
+    df = scored_df if dataset == 'original' else pipeline.compact_violations(scored_df)
+    rankings = pipeline.build_rankings(df)
+    assert set(rankings) == {'motorista', 'veiculo', 'categoria_motorista', 'categoria_veiculo'}
+    for entity, (column, label) in ENTITIES.items():
+        # A soma vetorizada muda a ordem das parcelas: diferenças de arredondamento na casa de 1e-12
+        expected = loop_entity_ranking(scored_df, column, label)
+        pd.testing.assert_frame_equal(by_label(rankings[entity], label), by_label(expected, label), check_dtype=False, rtol=1e-9)
+        expected = loop_category_ranking(scored_df, column, label)
+        pd.testing.assert_frame_equal(by_label(rankings[f'categoria_{entity}'], label), by_label(expected, label), check_dtype=False, rtol=1e-9)
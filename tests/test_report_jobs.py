@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+import main
+
+
+def wait_for(job_id):
+    main.get_ai_report_job(job_id)['future'].result(timeout=5)
+    return main.get_ai_report_job(job_id)
+
+
+def test_failed_report_is_not_shown_as_done(monkeypatch, scored_df):
+    def fail(*args, **kwargs):
+        raise RuntimeError('API fora do ar')
+    monkeypatch.setattr(main, 'generate_virtual_instructor_report', fail)
+    job_id = main.submit_ai_report_job('Motorista', scored_df.head(0))
+    assert wait_for(job_id)['status'] == 'error'
+
+    value, poll_disabled, status = main.poll_ai_report(1, {'job_id': job_id})
+    assert value is main.dash.no_update and poll_disabled
+    assert status.startswith('❌') and 'concluída' not in status
+
+
+def test_cancel_wins_over_a_finishing_job(monkeypatch, scored_df):
+    release = threading.Event()
+    monkeypatch.setattr(main, 'generate_virtual_instructor_report', lambda *args, **kwargs: release.wait(5) and 'relatório')
+    job_id = main.submit_ai_report_job('Motorista', scored_df.head(0))
+    while main.get_ai_report_job(job_id)['status'] != 'running':
+        time.sleep(0.01)
+
+    cancelled_at = main.cancel_ai_report_job(job_id)['finished_at']
+    release.set()
+    job = wait_for(job_id)
+    assert job['status'] == 'cancelled' and job['result'] is None and job['finished_at'] == cancelled_at
+    # Um job encerrado não é cancelado de novo
+    assert main.cancel_ai_report_job(job_id)['finished_at'] == cancelled_at
+
+
+def test_llm_failure_ends_the_job_as_error(monkeypatch, scored_df):
+    def fail(*args, **kwargs):
+        raise main.LLMError('A API do modelo recusou a chamada (HTTP 500).')
+    monkeypatch.setattr(main, 'stream_llm_completion', fail)
+    driver = main.build_rankings(scored_df)['motorista']['Motorista'].iloc[0]
+    job = wait_for(main.submit_ai_report_job(driver, scored_df[scored_df['motorista'] == driver]))
+    assert job['status'] == 'error' and job['result'] == 'A API do modelo recusou a chamada (HTTP 500).'
+
+
+def test_html_export_does_not_call_the_llm(monkeypatch, scored_df):
+    monkeypatch.setattr(main, 'stream_llm_completion', lambda *args, **kwargs: pytest.fail('chamada ao LLM no callback'))
+    driver = main.build_rankings(scored_df)['motorista']['Motorista'].iloc[0]
+    handle = main.store_dataset('teste-export', main.DEFAULT_GRAVITY_CONFIG, scored_df, main.build_rankings(scored_df))
+    download, status = main.export_html(1, driver, handle, '')
+    assert download is main.dash.no_update and 'antes de exportar' in status
+    download, status = main.export_html(1, driver, handle, 'Texto revisado.')
+    assert 'Texto revisado.' in download['content'] and status is main.dash.no_update
+
+
+def test_fleet_jobs_do_not_take_the_single_report_slots():
+    assert main.FLEET_JOB_EXECUTOR is not main.AI_REPORT_EXECUTOR
@@ -0,0 +1,30 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+import pipeline
+
+
+def changed_config():
+    config = copy.deepcopy(pipeline.DEFAULT_GRAVITY_CONFIG)
+    config['Velocidade_Excessiva_Rodovia']['base_weight'] = 0.5
+    config['Velocidade_Excessiva_Rodovia']['speed_threshold_high'] = 90
+    return config
+
+
+def test_rescore_matches_a_full_score(scored_df):
+    new_config = changed_config()
+    assert pipeline.get_changed_violation_types(pipeline.DEFAULT_GRAVITY_CONFIG, new_config)
+    rescored = pipeline.rescore_violations(scored_df, pipeline.DEFAULT_GRAVITY_CONFIG, new_config)
+    expected = pipeline.score_violations(scored_df.drop(columns=['fator_gravidade_evento', 'score_final']), new_config)
+    np.testing.assert_allclose(rescored['fator_gravidade_evento'], expected['fator_gravidade_evento'])
+    np.testing.assert_allclose(rescored['score_final'], expected['score_final'])
+    assert not np.allclose(rescored['score_final'], scored_df['score_final'])
+    for name, ranking in pipeline.build_rankings(rescored).items():
+        pd.testing.assert_frame_equal(ranking, pipeline.build_rankings(expected)[name])
+
+
+def test_rescore_without_changes_keeps_the_dataset(scored_df):
+    config = copy.deepcopy(pipeline.DEFAULT_GRAVITY_CONFIG)
+    assert pipeline.rescore_violations(scored_df, pipeline.DEFAULT_GRAVITY_CONFIG, config) is scored_df
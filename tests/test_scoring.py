@@ -0,0 +1,65 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+
+
+def reference_scores(df, gravity_config):
+    """Pontuação linha a linha (calculate_event_gravity_factor/get_base_weight), a referência do motor vetorizado."""
+    factors = df.apply(pipeline.calculate_event_gravity_factor, axis=1, gravity_config=gravity_config).to_numpy(dtype=np.float64)
+    limits = df['valor_final_da_velocidade_configurada'] if 'valor_final_da_velocidade_configurada' in df.columns else pd.Series(0, index=df.index)
+    base_weights = np.array([pipeline.get_base_weight(viol_type, limit, gravity_config) for viol_type, limit in zip(df['violacao'], limits)], dtype=np.float64)
+    scores = base_weights * factors
+    scores[(df['violacao'] == 'Freada brusca').to_numpy()] = gravity_config['Freada_Brusca']['base_weight']
+    return factors, scores
+
+
+def assert_matches_reference(df, gravity_config):
+    factors, scores = reference_scores(df, gravity_config)
+    vectorized = pipeline.score_violations(df, gravity_config)
+    np.testing.assert_array_equal(vectorized['fator_gravidade_evento'].to_numpy(), factors)
+    np.testing.assert_array_equal(vectorized['score_final'].to_numpy(), scores)
+
+
+def edge_case_events():
+    limits = [10, 20, 20.5, 40, 40.5, 80, np.nan]
+    rows = [{'violacao': 'Velocidade excessiva', 'valor_final_da_velocidade_configurada': limit, 'velocidade_maxima': speed, 'duracao_seconds': duration}
+            for limit in limits for speed in [0, 15, 45, 99, 120] for duration in [0, 30]]
+    rows += [{'violacao': 'Marcha lenta', 'duracao_seconds': duration, 'pedal_de_freio': pedal}
+             for duration in [0, 599, 600, 1800] for pedal in ['Sim', 'SIM', 'Não', '']]
+    rows += [{'violacao': viol_type, 'duracao_seconds': duration}
+             for viol_type in ['RPM excessiva', 'Freio motor', 'Faixa verde', 'Freada brusca'] for duration in [0, 45]]
+    df = pd.DataFrame(rows)
+    df['valor_final_da_velocidade_configurada'] = df['valor_final_da_velocidade_configurada'].fillna(0)
+    df['velocidade_maxima'] = df['velocidade_maxima'].fillna(0)
+    df['pedal_de_freio'] = df['pedal_de_freio'].fillna('')
+    return df
+
+
+def test_vectorized_scoring_matches_row_wise_on_the_sample(scored_df):
+    assert_matches_reference(scored_df.drop(columns=['fator_gravidade_evento', 'score_final']), pipeline.DEFAULT_GRAVITY_CONFIG)
+
+
+@pytest.mark.parametrize('variant', ['padrao', 'sem_limiar_alto', 'sem_incrementos'])
+def test_vectorized_scoring_matches_row_wise_on_edge_cases(variant):
+    gravity_config = copy.deepcopy(pipeline.DEFAULT_GRAVITY_CONFIG)
+    for section in ['Velocidade_Excessiva_Patio', 'Velocidade_Excessiva_Serra', 'Velocidade_Excessiva_Rodovia']:
+        if variant == 'sem_limiar_alto':
+            gravity_config[section].pop('speed_threshold_high', None)
+            gravity_config[section].pop('speed_factor_high', None)
+        if variant == 'sem_incrementos':
+            gravity_config[section]['speed_increment'] = 0
+            gravity_config[section]['duration_increment'] = 0
+    df = edge_case_events()
+    assert_matches_reference(df, gravity_config)
+    # NaN no limite (linha a linha: nenhuma comparação é verdadeira, então cai na faixa Rodovia)
+    df.loc[df.index[:5], 'valor_final_da_velocidade_configurada'] = np.nan
+    assert_matches_reference(df, gravity_config)
+
+
+def test_vectorized_scoring_without_limit_and_speed_columns():
+    df = edge_case_events().drop(columns=['valor_final_da_velocidade_configurada', 'velocidade_maxima'])
+    assert_matches_reference(df, pipeline.DEFAULT_GRAVITY_CONFIG)
@@ -0,0 +1,50 @@
+import hashlib
+
+import pytest
+
+import main
+
+
+def start_upload(client, auth, **payload):
+    return client.post('/upload/chunked', json=payload, auth=auth)
+
+
+@pytest.mark.parametrize('payload', [
+    {'filename': 'maio.csv', 'size': 'abc'},
+    {'filename': 'maio.csv', 'size': [1]},
+    {'filename': 'maio.csv.exe', 'size': 10},
+    {'filename': 'csv_maio.xlsx', 'size': 10},
+])
+def test_invalid_upload_is_rejected(client, auth, payload):
+    response = start_upload(client, auth, **payload)
+    assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def test_upload_requires_login(client):
+    assert client.post('/upload/chunked', json={'filename': 'maio.csv', 'size': 10}).status_code == 401
+
+
+def test_chunked_upload_resumes_at_the_server_offset(client, auth, export_bytes):
+    data = export_bytes[:300_000]
+    upload_id = start_upload(client, auth, filename='MAIO.CSV', size=len(data)).get_json()['upload_id']
+    half = len(data) // 2
+
+    assert client.put(f'/upload/chunked/{upload_id}?offset=0', data=data[:half], auth=auth).get_json()['received'] == half
+    # Um bloco repetido (ex.: reenvio após timeout) é recusado e o cliente retoma de 'received'
+    conflict = client.put(f'/upload/chunked/{upload_id}?offset=0', data=data[:half], auth=auth)
+    assert conflict.status_code == 409 and conflict.get_json()['received'] == half
+    assert client.post(f'/upload/chunked/{upload_id}/complete', auth=auth).status_code == 409
+
+    received = client.get(f'/upload/chunked/{upload_id}', auth=auth).get_json()['received']
+    client.put(f'/upload/chunked/{upload_id}?offset={received}', data=data[received:], auth=auth)
+    state = client.post(f'/upload/chunked/{upload_id}/complete', auth=auth).get_json()
+    assert state['complete'] and main.get_upload_session(upload_id)['sha256'] == hashlib.sha256(data).hexdigest()
+
+    client.delete(f'/upload/chunked/{upload_id}', auth=auth)
+    assert client.get(f'/upload/chunked/{upload_id}', auth=auth).status_code == 404
+
+
+def test_chunk_beyond_declared_size_is_rejected(client, auth):
+    upload_id = start_upload(client, auth, filename='maio.csv', size=10).get_json()['upload_id']
+    assert client.put(f'/upload/chunked/{upload_id}?offset=0', data=b'x' * 11, auth=auth).status_code == 413
+    client.delete(f'/upload/chunked/{upload_id}', auth=auth)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import main
+import pipeline
+
+
+@pytest.fixture(scope='module')
+def table_dataset(scored_df):
+    violations_df = pipeline.compact_violations(scored_df)
+    handle = main.store_dataset('teste-tabela', pipeline.DEFAULT_GRAVITY_CONFIG, violations_df, pipeline.build_rankings(violations_df))
+    return handle, violations_df
+
+
+@pytest.mark.parametrize('filter_part, expected', [
+    ('{score_final} >= 0.5', ('score_final', 'ge', 0.5)),
+    ('{score_final} ne 3', ('score_final', 'ne', 3.0)),
+    ('{motorista} contains "Silva"', ('motorista', 'contains', 'Silva')),
+    ("{violacao} = 'Freada brusca'", ('violacao', 'eq', 'Freada brusca')),
+    ("{motorista} contains 'D\\'Ávila'", ('motorista', 'contains', "D'Ávila")),
+    ('{data_evento} datestartswith 15/05', ('data_evento', 'datestartswith', '15/05')),
+    ('texto sem operador', (None, None, None)),
+])
+def test_split_filter_part(filter_part, expected):
+    assert main.split_filter_part(filter_part) == expected
+
+
+def test_filter_positions_match_pandas_masks(table_dataset):
+    _, df = table_dataset
+    positions = main.build_filter_positions(df, '{violacao} contains velocidade && {score_final} > 0.1 && {coluna_desconhecida} = 1')
+    mask = df['violacao'].astype(str).str.contains('velocidade', case=False) & (df['score_final'] > 0.1)
+    np.testing.assert_array_equal(positions, np.flatnonzero(mask.to_numpy()))
+
+    day = df['data_evento'].iloc[0].strftime('%d/%m/%Y')
+    positions = main.build_filter_positions(df, f'{{data_evento}} datestartswith {day}')
+    np.testing.assert_array_equal(positions, np.flatnonzero((df['data_evento'].dt.strftime('%d/%m/%Y') == day).to_numpy()))
+
+    driver = df['motorista'].dropna().iloc[0]
+    positions = main.build_filter_positions(df, f'{{motorista}} = "{driver}"')
+    np.testing.assert_array_equal(positions, np.flatnonzero((df['motorista'] == driver).to_numpy(dtype=bool, na_value=False)))
+
+
+def test_paging_and_sorting(table_dataset):
+    handle, df = table_dataset
+    page_size = 20
+    rows, page_count = main.update_violations_table(handle, 0, page_size, [], '')
+    assert page_count == -(-len(df) // page_size) and len(rows) == page_size
+    assert [row['linha_csv'] for row in rows] == df['linha_csv'].iloc[:page_size].tolist()
+
+    last_rows, _ = main.update_violations_table(handle, page_count + 10, page_size, [], '')
+    assert len(last_rows) == len(df) - (page_count - 1) * page_size
+
+    sort_by = [{'column_id': 'score_final', 'direction': 'desc'}, {'column_id': 'linha_csv', 'direction': 'asc'}]
+    rows, _ = main.update_violations_table(handle, 1, page_size, sort_by, '{score_final} > 0')
+    expected = df[df['score_final'] > 0].sort_values(['score_final', 'linha_csv'], ascending=[False, True], kind='stable')
+    assert [row['linha_csv'] for row in rows] == expected['linha_csv'].iloc[page_size:2 * page_size].tolist()
+    assert all(set(row) == set(main.VIOLATIONS_TABLE_COLUMNS) | {'mapa_link'} for row in rows)